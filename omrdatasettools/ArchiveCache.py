@@ -0,0 +1,230 @@
+import hashlib
+import json
+import os
+import shutil
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional, Union, Dict
+
+from omrdatasettools.OmrDataset import ArchiveChecksum
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows, where concurrent jobs are not coordinated
+    fcntl = None
+
+
+class ArchiveCache:
+    """ A content-addressed cache for downloaded dataset archives that can be shared by many jobs on one host.
+
+        Archives are stored under the SHA-256 of their content, e.g. ``objects/3f/3fa1.../HOMUS-2.0.zip``, together
+        with an index that maps each url to the content it resolved to. Archives, whose expected size and hash are
+        passed to the Downloader, only enter the cache after they have been verified against them, so a cached archive
+        can be used without touching the network. Archives without an expected checksum are recorded as unverified:
+        the cache only guarantees that they did not change since they were downloaded. If a maximum size is given,
+        the least recently used archives are evicted once the cache grows beyond it, except for archives that are still
+        in use by any job (see :meth:`use`).
+
+        Examples
+        --------
+        >>> from omrdatasettools import ArchiveCache, Downloader, OmrDataset
+        >>> downloader = Downloader(ArchiveCache("/data/omr-cache", maximum_size=200 * 1024 ** 3))
+        >>> downloader.download_and_extract_dataset(OmrDataset.Homus_V2, "data")
+    """
+
+    def __init__(self, cache_directory: Union[str, Path] = None, maximum_size: Optional[int] = None) -> None:
+        """
+        :param cache_directory: The directory of the cache. Defaults to the environment variable OMR_DATASETS_CACHE
+                                or ~/.cache/omrdatasettools if that is not set
+        :param maximum_size: The optional maximum size of all cached archives in bytes
+        """
+        super().__init__()
+        if cache_directory is None:
+            cache_directory = os.environ.get("OMR_DATASETS_CACHE",
+                                             os.path.join(os.path.expanduser("~"), ".cache", "omrdatasettools"))
+        self.cache_directory = Path(cache_directory)
+        self.maximum_size = maximum_size
+        self.objects_directory = self.cache_directory / "objects"
+        self.downloads_directory = self.cache_directory / "downloads"
+        self.index_path = self.cache_directory / "index.json"
+        self.objects_directory.mkdir(parents=True, exist_ok=True)
+        self.downloads_directory.mkdir(parents=True, exist_ok=True)
+
+    def lookup(self, url: str, expected_checksum: Optional[ArchiveChecksum] = None, verify: bool = True) \
+            -> Optional[Path]:
+        """
+        Looks up the archive of an url in the cache. If an expected checksum is given, the archive with this content
+        is returned, regardless of the url it was originally downloaded from, and the url is recorded as verified.
+        Otherwise, the archive is compared with the size and hash that were recorded, when it was added.
+
+        :param verify: True, if the SHA-256 of the cached archive should be computed again, so archives that were
+                       corrupted on disk are not used, or False, if only its size should be compared, e.g., to learn
+                       whether an archive is present without reading it
+        :return: The path to the cached archive or None, if it is not in the cache or it does not match its checksum
+        """
+        entry = self.__read_index().get(url)
+        if expected_checksum is not None:
+            checksum = expected_checksum
+        elif entry is not None:
+            checksum = ArchiveChecksum(entry["size"], entry["sha256"])
+        else:
+            return None
+
+        candidates = list(self.get_archive_path(checksum.sha256, "").glob("*"))
+        if len(candidates) != 1 or candidates[0].stat().st_size != checksum.size:
+            return None
+
+        archive_path = candidates[0]
+        if verify and self.compute_checksum(archive_path) != checksum:
+            print("Cached archive {0} does not match its checksum anymore and is downloaded again".format(
+                archive_path))
+            return None
+
+        if verify and expected_checksum is not None and not (entry or {}).get("verified", False):
+            self.__record(url, archive_path, checksum, verified=True)
+        os.utime(archive_path)  # Mark as recently used
+        return archive_path
+
+    def add(self, url: str, downloaded_file: Path, checksum: ArchiveChecksum, verified: bool = False) -> Path:
+        """
+        Moves a download into the cache and evicts the least recently used archives, if necessary.
+
+        :param url: The url that the archive was downloaded from
+        :param downloaded_file: The downloaded archive, which must be on the same file system as the cache
+        :param checksum: The size and hash of the downloaded archive
+        :param verified: True, if the checksum was compared with the known checksum of the archive
+        :return: The path to the cached archive
+        """
+        # Each object holds exactly one file, so a corrupted copy of the same content is replaced, even if it was
+        # downloaded under another name
+        existing_archives = list(self.get_archive_path(checksum.sha256, "").glob("*"))
+        if existing_archives:
+            archive_path = existing_archives[0]
+        else:
+            archive_path = self.get_archive_path(checksum.sha256, downloaded_file.name)
+        archive_path.parent.mkdir(parents=True, exist_ok=True)
+        # The shared lock keeps the object from being evicted by another job, until it is recorded in the index
+        with self.__lock(self.__get_object_lock_path(archive_path), shared=True):
+            os.replace(downloaded_file, archive_path)
+            self.__record(url, archive_path, checksum, verified)
+
+        self.evict(keep=archive_path)
+        return archive_path
+
+    def is_verified(self, url: str) -> bool:
+        """ Returns True, if the archive of the url was verified against its known checksum, when it was cached """
+        return self.__read_index().get(url, {}).get("verified", False)
+
+    def get_archive_path(self, sha256: str, filename: str) -> Path:
+        return self.objects_directory / sha256[:2] / sha256 / filename
+
+    def get_download_path(self, url: str) -> Path:
+        """ Returns the path into which an url should be downloaded, before it is verified and added to the cache """
+        url_hash = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return self.downloads_directory / url_hash / self.__filename_from_url(url)
+
+    @contextmanager
+    def lock(self, url: str):
+        """ Prevents that multiple jobs on the same host download the same url into the cache at the same time """
+        download_path = self.get_download_path(url)
+        download_path.parent.mkdir(parents=True, exist_ok=True)
+        with self.__lock(download_path.parent / "download.lock"):
+            yield
+
+    @contextmanager
+    def use(self, archive_path: Path):
+        """ Prevents that a cached archive is evicted by any job on the same host, while it is used, e.g. extracted.
+            Raises an exception, if the archive was evicted, before it could be locked. """
+        with self.__lock(self.__get_object_lock_path(archive_path), shared=True):
+            if not archive_path.exists():
+                raise Exception("The archive {0} was evicted from the cache, before it could be used. Please try "
+                                "again".format(archive_path))
+            yield
+
+    def evict(self, keep: Optional[Path] = None) -> None:
+        """ Deletes the least recently used archives, until the cache is no larger than its maximum size. Archives
+            that are in use are skipped. """
+        if self.maximum_size is None:
+            return
+
+        archives = sorted((path for path in self.objects_directory.glob("*/*/*") if path.is_file()),
+                          key=lambda path: path.stat().st_mtime)
+        total_size = sum(path.stat().st_size for path in archives)
+        for archive in archives:
+            if total_size <= self.maximum_size:
+                break
+            if keep is not None and archive == keep:
+                continue
+            with self.__lock(self.__get_object_lock_path(archive), blocking=False) as locked:
+                if not locked:
+                    print("Not evicting {0} from the archive cache, because it is in use".format(archive.name))
+                    continue
+                total_size -= archive.stat().st_size
+                print("Evicting {0} from the archive cache".format(archive.name))
+                shutil.rmtree(archive.parent, ignore_errors=True)
+                self.__remove_from_index(archive.parent.name)
+
+    @staticmethod
+    def compute_checksum(archive: Union[str, Path]) -> ArchiveChecksum:
+        """ Computes the size and SHA-256 of an archive, e.g., to pass it as expected checksum to a Downloader """
+        sha256 = hashlib.sha256()
+        with open(archive, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                sha256.update(block)
+        return ArchiveChecksum(os.path.getsize(archive), sha256.hexdigest())
+
+    @staticmethod
+    def __filename_from_url(url: str) -> str:
+        filename = os.path.basename(url.split("?")[0])
+        return filename or "downloaded.file"
+
+    def __get_object_lock_path(self, archive_path: Path) -> Path:
+        # The lock is stored next to the directory of the object, so it survives the eviction of the object
+        return archive_path.parent.with_name(archive_path.parent.name + ".lock")
+
+    def __record(self, url: str, archive_path: Path, checksum: ArchiveChecksum, verified: bool) -> None:
+        with self.__lock(self.cache_directory / "index.lock"):
+            index = self.__read_index()
+            index[url] = {"size": checksum.size, "sha256": checksum.sha256, "filename": archive_path.name,
+                          "verified": verified}
+            self.__write_index(index)
+
+    def __remove_from_index(self, sha256: str) -> None:
+        """ Removes all urls from the index, whose archive has the given hash """
+        with self.__lock(self.cache_directory / "index.lock"):
+            index = self.__read_index()
+            self.__write_index({url: entry for url, entry in index.items() if entry["sha256"] != sha256})
+
+    def __read_index(self) -> Dict[str, Dict]:
+        if not self.index_path.exists():
+            return dict()
+        try:
+            with open(self.index_path, 'r') as index_file:
+                return json.load(index_file)
+        except ValueError:
+            return dict()
+
+    def __write_index(self, index: Dict[str, Dict]) -> None:
+        temporary_path = self.index_path.with_name(self.index_path.name + ".tmp")
+        with open(temporary_path, 'w') as index_file:
+            json.dump(index, index_file, indent=2)
+        os.replace(temporary_path, self.index_path)
+
+    @staticmethod
+    @contextmanager
+    def __lock(lock_path: Path, shared: bool = False, blocking: bool = True):
+        """ Locks a file exclusively or shared with other jobs and yields, whether the lock was acquired, which is
+            always the case, unless blocking is False """
+        with open(lock_path, 'a') as lock_file:
+            if fcntl is not None:
+                operation = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+                try:
+                    fcntl.flock(lock_file, operation if blocking else operation | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    yield False
+                    return
+            try:
+                yield True
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
@@ -0,0 +1,136 @@
+import gzip
+import io
+import json
+import os
+import tarfile
+import tempfile
+import threading
+from contextlib import contextmanager
+from fnmatch import fnmatch
+from pathlib import Path
+from typing import List, Union, BinaryIO, Dict, Tuple
+from zipfile import ZipFile
+
+from PIL import Image
+
+
+class ArchiveDataset:
+    """ A read-only view of a downloaded dataset archive, that allows to list, open and load the files of a dataset
+        directly from the archive without extracting it to disk first.
+
+        Zip archives are read through their central directory. Tar.gz archives have no such directory, so they are
+        scanned once and the position of each member is stored in an index file next to the archive, e.g.
+        ``deep-scores-v2-dense.tar.gz.index.json``. Since a gzip stream can not be accessed randomly, reading the
+        members of a tar.gz archive in the order in which they appear in the archive is much faster than reading
+        them in random order.
+
+        The image generators accept an ArchiveDataset in place of the raw_data_directory.
+
+        Examples
+        --------
+        >>> from omrdatasettools import ArchiveDataset, HomusImageGenerator
+        >>> with ArchiveDataset("HOMUS-2.0.zip") as dataset:
+        >>>     HomusImageGenerator.create_images(dataset, "homus_images", [3], 96, 192)
+    """
+
+    def __init__(self, archive: Union[str, Path]) -> None:
+        super().__init__()
+        self.archive = Path(archive)
+        self.lock = threading.Lock()
+        self.zip_file = None
+        self.gzip_file = None
+        self.tar_index = dict()  # type: Dict[str, Tuple[int, int]]
+
+        if self.archive.suffix == ".zip":
+            self.zip_file = ZipFile(self.archive, "r")
+            self.names = {member.filename for member in self.zip_file.infolist() if not member.is_dir()}
+        elif self.archive.suffix == ".gz":
+            self.tar_index = self.__load_or_build_tar_index()
+            self.names = set(self.tar_index.keys())
+        else:
+            raise Exception(f"Unrecognized dataset encountered: {str(self.archive)}")
+
+    def glob(self, pattern: str = "*") -> List[str]:
+        """
+        Returns the names of all files in the archive, that match the given glob pattern. Note that ``*`` also
+        matches the separator ``/``, so ``*.txt`` returns all text files, regardless of the folder they are in.
+        """
+        return sorted(name for name in self.names if fnmatch(name, pattern))
+
+    def exists(self, name: str) -> bool:
+        return name in self.names
+
+    def open(self, name: str) -> BinaryIO:
+        """ Opens a file from the archive for reading in binary mode """
+        if self.zip_file is not None:
+            return self.zip_file.open(name, "r")
+        return io.BytesIO(self.read_bytes(name))
+
+    def read_bytes(self, name: str) -> bytes:
+        if self.zip_file is not None:
+            return self.zip_file.read(name)
+
+        offset, size = self.tar_index[name]
+        with self.lock:
+            if self.gzip_file is None:
+                self.gzip_file = gzip.open(self.archive, "rb")
+            self.gzip_file.seek(offset)
+            return self.gzip_file.read(size)
+
+    def read_text(self, name: str, encoding: str = "utf-8") -> str:
+        return self.read_bytes(name).decode(encoding)
+
+    def load_image(self, name: str) -> Image.Image:
+        """ Loads an image from the archive into memory """
+        with self.open(name) as image_file:
+            image = Image.open(image_file)
+            image.load()
+        return image
+
+    @contextmanager
+    def materialize(self, name: str):
+        """
+        Writes a single file of the archive into a temporary file and yields its path. Only needed for libraries
+        that insist on reading from a path, such as mung. The temporary file is deleted afterwards.
+        """
+        suffix = os.path.splitext(name)[1]
+        temporary_file = tempfile.NamedTemporaryFile(suffix=suffix, delete=False)
+        try:
+            with temporary_file:
+                temporary_file.write(self.read_bytes(name))
+            yield temporary_file.name
+        finally:
+            os.remove(temporary_file.name)
+
+    def close(self) -> None:
+        if self.zip_file is not None:
+            self.zip_file.close()
+        if self.gzip_file is not None:
+            self.gzip_file.close()
+
+    def __enter__(self) -> 'ArchiveDataset':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    def __load_or_build_tar_index(self) -> Dict[str, Tuple[int, int]]:
+        index_path = self.archive.with_name(self.archive.name + ".index.json")
+        archive_stat = self.archive.stat()
+        if index_path.exists():
+            with open(index_path, 'r') as index_file:
+                index = json.load(index_file)
+            if index["archive_size"] == archive_stat.st_size and index["archive_mtime"] == archive_stat.st_mtime:
+                return {name: (offset, size) for name, (offset, size) in index["members"].items()}
+
+        print("Indexing {0}".format(self.archive))
+        members = dict()
+        with tarfile.open(self.archive, "r|gz") as tar:
+            for member in tar:
+                if member.isfile():
+                    members[member.name] = (member.offset_data, member.size)
+
+        with open(index_path, 'w') as index_file:
+            json.dump({"archive_size": archive_stat.st_size, "archive_mtime": archive_stat.st_mtime,
+                       "members": members}, index_file)
+        return members
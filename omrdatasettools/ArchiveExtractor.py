@@ -0,0 +1,113 @@
+import os
+import tarfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from fnmatch import fnmatch
+from pathlib import Path
+from typing import List, Optional, Union
+from zipfile import ZipFile
+
+from tqdm import tqdm
+
+
+class ArchiveExtractor:
+    """ Extracts the members of zip and tar.gz archives, optionally only those that match include and exclude glob
+        filters, e.g. ``include=["fulls/*"]`` to only extract the full images of MuscimaPlusPlus_Images.
+
+        Zip archives can be extracted with multiple threads. The members are spread across a thread pool, where
+        each worker opens its own ZipFile handle, so the workers do not share a file position. Since zlib releases
+        the GIL while decompressing, large archives are extracted several times faster on multi-core machines.
+        Tar.gz archives are a single compressed stream and are therefore always extracted sequentially.
+    """
+
+    @staticmethod
+    def extract(archive: Union[str, Path], destination_directory: Union[str, Path], number_of_threads: int = 1,
+                include: Optional[List[str]] = None, exclude: Optional[List[str]] = None) -> None:
+        """
+        Extracts an archive into the destination directory
+
+        :param archive: The path to the .zip or .tar.gz archive
+        :param destination_directory: The directory, where the members should be extracted into
+        :param number_of_threads: The number of threads that extract the members of zip archives concurrently
+        :param include: Optional glob patterns of member names. If provided, only members that match at least one of
+                        these patterns are extracted
+        :param exclude: Optional glob patterns of member names that should not be extracted
+        """
+        archive = Path(archive)
+        if archive.suffix == ".zip":
+            ArchiveExtractor.extract_zip(archive, destination_directory, number_of_threads, include, exclude)
+        elif archive.suffix == ".gz":
+            with tarfile.open(archive, "r:gz") as tar:
+                ArchiveExtractor.extract_tar(tar, destination_directory, include, exclude)
+        else:
+            raise Exception(f"Unrecognized dataset encountered: {str(archive)}")
+
+    @staticmethod
+    def matches_filters(member_name: str, include: Optional[List[str]] = None,
+                        exclude: Optional[List[str]] = None) -> bool:
+        """ Returns True, if a member should be extracted according to the include and exclude glob patterns """
+        if include and not any(fnmatch(member_name, pattern) for pattern in include):
+            return False
+        if exclude and any(fnmatch(member_name, pattern) for pattern in exclude):
+            return False
+        return True
+
+    @staticmethod
+    def extract_tar(tar: tarfile.TarFile, destination_directory: Union[str, Path],
+                    include: Optional[List[str]] = None, exclude: Optional[List[str]] = None) -> None:
+        """ Extracts the members of an opened tar archive. Also works for archives opened in stream mode. """
+        members = (member for member in tar if ArchiveExtractor.matches_filters(member.name, include, exclude))
+        tar.extractall(destination_directory, members=members)
+
+    @staticmethod
+    def extract_zip(archive: Path, destination_directory: Union[str, Path], number_of_threads: int = 1,
+                    include: Optional[List[str]] = None, exclude: Optional[List[str]] = None) -> None:
+        with ZipFile(archive, "r") as zip_file:
+            members = [member for member in zip_file.infolist()
+                       if ArchiveExtractor.matches_filters(member.filename, include, exclude)]
+
+            if number_of_threads <= 1:
+                zip_file.extractall(destination_directory, members=members)
+                return
+
+        ArchiveExtractor.__create_directories(members, destination_directory)
+
+        # Distribute the largest members first, so no worker ends up with a single huge member at the end
+        files = sorted((member for member in members if not member.is_dir()),
+                       key=lambda member: member.compress_size, reverse=True)
+        batches = [files[i::number_of_threads * 4] for i in range(number_of_threads * 4)]
+
+        thread_local = threading.local()
+        handles = []
+        handles_lock = threading.Lock()
+
+        def extract_batch(batch):
+            if not hasattr(thread_local, "zip_file"):
+                thread_local.zip_file = ZipFile(archive, "r")
+                with handles_lock:
+                    handles.append(thread_local.zip_file)
+            for member in batch:
+                thread_local.zip_file.extract(member.filename, destination_directory)
+                progress_bar.update(1)
+
+        try:
+            with tqdm(total=len(files), desc="Extracting files", mininterval=0.25) as progress_bar:
+                with ThreadPoolExecutor(max_workers=number_of_threads) as executor:
+                    for future in [executor.submit(extract_batch, batch) for batch in batches if batch]:
+                        future.result()
+        finally:
+            for handle in handles:
+                handle.close()
+
+    @staticmethod
+    def __create_directories(members, destination_directory: Union[str, Path]):
+        # Create all directories up front, because concurrent workers would otherwise race to create them
+        destination_directory = os.path.abspath(destination_directory)
+        directories = set()
+        for member in members:
+            member_path = os.path.normpath(os.path.join(destination_directory, member.filename))
+            directory = member_path if member.is_dir() else os.path.dirname(member_path)
+            if directory.startswith(destination_directory):
+                directories.add(directory)
+        for directory in sorted(directories):
+            os.makedirs(directory, exist_ok=True)
@@ -1,13 +1,17 @@
 import argparse
 import os
-from glob import glob
+from typing import Union, Optional
 from xml.etree import ElementTree
 
 from PIL import Image
 
+from omrdatasettools.ArchiveDataset import ArchiveDataset
+from omrdatasettools.DatasetIndex import DatasetIndex
 from omrdatasettools.Point2D import Point2D
 from omrdatasettools.ExportPath import ExportPath
+from omrdatasettools.ImageWriter import ImageWriter
 from omrdatasettools.Rectangle import Rectangle
+from omrdatasettools.ShardedImageWriter import ShardedImageWriter
 
 
 class AudiverisOmrSymbol(Rectangle):
@@ -20,28 +24,46 @@ class AudiverisOmrImageGenerator:
     def __init__(self) -> None:
         super().__init__()
 
-    def extract_symbols(self, raw_data_directory: str, destination_directory: str):
+    def extract_symbols(self, raw_data_directory: Union[str, ArchiveDataset], destination_directory: str,
+                        image_mode: Optional[str] = None, compress_level: Optional[int] = None,
+                        writer: ImageWriter = None):
         """
         Extracts the symbols from the raw XML documents and matching images of the Audiveris OMR dataset into
         individual symbols
 
-        :param raw_data_directory: The directory, that contains the xml-files and matching images
+        :param raw_data_directory: The directory, that contains the xml-files and matching images, or an
+                                   ArchiveDataset of the downloaded archive
         :param destination_directory: The directory, in which the symbols should be generated into. One sub-folder per
                                       symbol category will be generated automatically
+        :param image_mode: The optional mode of the generated images, e.g. '1' for black-and-white images with one bit
+                           per pixel. If None is provided, the images keep the mode of the scanned pages
+        :param compress_level: The optional PNG compression level from 0 (fastest) to 9 (smallest files)
+        :param writer: The writer that stores the images, e.g. a ShardedImageWriter. Defaults to an ImageWriter that
+                       saves every image immediately
         """
         print("Extracting Symbols from Audiveris OMR Dataset...")
+        if writer is None:
+            writer = ImageWriter()
 
-        all_xml_files = [y for x in os.walk(raw_data_directory) for y in glob(os.path.join(x[0], '*.xml'))]
-        all_image_files = [y for x in os.walk(raw_data_directory) for y in glob(os.path.join(x[0], '*.png'))]
-
-        data_pairs = []
-        for i in range(len(all_xml_files)):
-            data_pairs.append((all_xml_files[i], all_image_files[i]))
+        data_pairs, orphans = DatasetIndex.of(raw_data_directory).pair([".xml", ".png"])
+        if orphans:
+            print("Skipping {0} files without a unique matching xml-file or image: {1}".format(
+                len(orphans), ", ".join(orphans)))
 
         for data_pair in data_pairs:
-            self.__extract_symbols(data_pair[0], data_pair[1], destination_directory)
-
-    def __extract_symbols(self, xml_file: str, image_file: str, destination_directory: str):
+            if isinstance(raw_data_directory, ArchiveDataset):
+                with raw_data_directory.open(data_pair[0]) as xml_file, \
+                        raw_data_directory.open(data_pair[1]) as image_file:
+                    self.__extract_symbols(data_pair[0], xml_file, image_file, destination_directory, image_mode,
+                                           compress_level, writer)
+            else:
+                self.__extract_symbols(data_pair[0], data_pair[0], data_pair[1], destination_directory, image_mode,
+                                       compress_level, writer)
+
+        writer.flush()
+
+    def __extract_symbols(self, xml_file_name: str, xml_file, image_file, destination_directory: str,
+                          image_mode: Optional[str], compress_level: Optional[int], writer: ImageWriter):
         # xml_file, image_file = 'data/audiveris_omr_raw\\IMSLP06053p1.xml', 'data/audiveris_omr_raw\\IMSLP06053p1.png'
         # xml_file, image_file = 'data/audiveris_omr_raw\\mops-1.xml', 'data/audiveris_omr_raw\\mops-1.png'
         # xml_file, image_file = 'data/audiveris_omr_raw\\mtest1-1.xml', 'data/audiveris_omr_raw\\mtest1-1.png'
@@ -50,7 +72,7 @@ class AudiverisOmrImageGenerator:
         annotations = ElementTree.parse(xml_file).getroot()
         xml_symbols = annotations.findall("Symbol")
 
-        file_name_without_extension = os.path.splitext(os.path.basename(xml_file))[0]
+        file_name_without_extension = os.path.splitext(os.path.basename(xml_file_name))[0]
         symbols = []
 
         for xml_symbol in xml_symbols:
@@ -73,8 +95,9 @@ class AudiverisOmrImageGenerator:
             os.makedirs(target_directory, exist_ok=True)
 
             export_path = ExportPath(destination_directory, symbol_class,
-                                     file_name_without_extension + str(symbol_number))
-            symbol_image.save(export_path.get_full_path())
+                                     file_name_without_extension + str(symbol_number), image_mode=image_mode,
+                                     compress_level=compress_level)
+            export_path.save(symbol_image, writer=writer)
             symbol_number += 1
 
 
@@ -90,8 +113,21 @@ if __name__ == "__main__":
         type=str,
         default="../data/audiveris_omr",
         help="The directory, where the generated bitmaps will be created")
+    parser.add_argument("--image_mode", default=None, choices=["RGB", "L", "1"],
+                        help="Optional mode of the generated images: RGB, L for grayscale or 1 for black-and-white "
+                             "images with one bit per pixel")
+    parser.add_argument("--compress_level", default=None, type=int, choices=range(10),
+                        help="Optional PNG compression level from 0 (fastest) to 9 (smallest files)")
+    parser.add_argument("--shard_directory", default=None,
+                        help="Optional directory, into which the images are written as tar-shards, instead of writing "
+                             "one file per image into the image dataset directory")
 
     flags, unparsed = parser.parse_known_args()
 
+    image_writer = None
+    if flags.shard_directory is not None:
+        image_writer = ShardedImageWriter(flags.shard_directory)
+
     audiveris_omr_image_generator = AudiverisOmrImageGenerator()
-    audiveris_omr_image_generator.extract_symbols(flags.raw_dataset_directory, flags.image_dataset_directory)
+    audiveris_omr_image_generator.extract_symbols(flags.raw_dataset_directory, flags.image_dataset_directory,
+                                                  flags.image_mode, flags.compress_level, image_writer)
@@ -0,0 +1,35 @@
+import threading
+import time
+from typing import Optional
+
+
+class BandwidthLimiter:
+    """ Limits the combined throughput of all downloads that share it to a number of bytes per second.
+
+        Every thread reports the bytes it received via :meth:`consume` and is put to sleep for as long as it got
+        ahead of the allowed rate. A short burst of ``burst_seconds`` is tolerated, so small reads do not sleep
+        for every single buffer.
+    """
+
+    def __init__(self, bytes_per_second: Optional[float], burst_seconds: float = 0.25) -> None:
+        """
+        :param bytes_per_second: The maximum number of bytes per second across all threads or None for no limit
+        :param burst_seconds: How far, in seconds, the downloads may get ahead of the allowed rate without waiting
+        """
+        super().__init__()
+        self.bytes_per_second = bytes_per_second
+        self.burst_seconds = burst_seconds
+        self.next_available_time = 0.0
+        self.lock = threading.Lock()
+
+    def consume(self, number_of_bytes: int) -> None:
+        """ Accounts for the given number of received bytes and blocks, if the downloads are going too fast """
+        if not self.bytes_per_second or number_of_bytes <= 0:
+            return
+
+        with self.lock:
+            now = time.monotonic()
+            self.next_available_time = max(self.next_available_time, now) + number_of_bytes / self.bytes_per_second
+            delay = self.next_available_time - now - self.burst_seconds
+        if delay > 0:
+            time.sleep(delay)
@@ -0,0 +1,136 @@
+import hashlib
+import json
+import os
+from typing import Dict, Union, List, Iterable, Optional
+
+from omrdatasettools.ImageWriter import ImageWriter
+
+
+class BuildManifest:
+    """ Remembers, from which source and with which parameters each image in a destination directory was generated,
+        so an image generator can skip all images that are still up to date when it is run again.
+
+        Each output is identified by its path relative to the destination directory and stores the id of its source,
+        e.g. the name of the symbol file, a hash of the content of the source, a hash of all generation parameters
+        that affect the output and optionally further details, such as the bounding-box of the symbol. The manifest is
+        stored as a json-file in the destination directory.
+    """
+
+    FILE_NAME = "build-manifest.json"
+
+    def __init__(self, destination_directory: str, outputs: Dict[str, dict] = None) -> None:
+        """
+        :param destination_directory: The directory, that contains the outputs and the manifest
+        :param outputs: The entries of the outputs, indexed by their relative path
+        """
+        super().__init__()
+        self.destination_directory = destination_directory
+        self.outputs = outputs if outputs is not None else {}  # type: Dict[str, dict]
+
+    @staticmethod
+    def check_writer(writer: Optional[ImageWriter]) -> None:
+        """ Raises a ValueError, if the writer does not store the images as individual files, because the manifest
+            can only tell whether an image is up to date by finding its file in the destination directory """
+        if writer is not None and not writer.stores_individual_files:
+            raise ValueError("Incremental generation requires a writer that stores every image as an individual file, "
+                             "but {0} does not".format(type(writer).__name__))
+
+    @staticmethod
+    def load(destination_directory: str) -> 'BuildManifest':
+        """ Loads the manifest of the destination directory or returns an empty one, if there is none yet """
+        try:
+            with open(os.path.join(destination_directory, BuildManifest.FILE_NAME)) as manifest_file:
+                return BuildManifest(destination_directory, json.load(manifest_file)["outputs"])
+        except (OSError, ValueError, KeyError):
+            return BuildManifest(destination_directory)
+
+    def save(self) -> None:
+        os.makedirs(self.destination_directory, exist_ok=True)
+        manifest_path = os.path.join(self.destination_directory, BuildManifest.FILE_NAME)
+        # Write into a temporary file first, so an interrupted run never leaves a truncated manifest behind
+        with open(manifest_path + ".tmp", "w") as manifest_file:
+            json.dump({"outputs": self.outputs}, manifest_file, sort_keys=True)
+        os.replace(manifest_path + ".tmp", manifest_path)
+
+    @staticmethod
+    def hash_content(content: Union[str, bytes]) -> str:
+        """ Returns the hash of the content of a source """
+        if isinstance(content, str):
+            content = content.encode("utf-8")
+        return hashlib.sha1(content).hexdigest()
+
+    @staticmethod
+    def hash_parameters(**parameters) -> str:
+        """ Returns the hash of all generation parameters, that affect an output """
+        return BuildManifest.hash_content(json.dumps(parameters, sort_keys=True))
+
+    def get_relative_path(self, output_path: str) -> str:
+        """ Returns the platform-independent path of an output relative to the destination directory """
+        return os.path.relpath(output_path, self.destination_directory).replace(os.sep, "/")
+
+    def is_up_to_date(self, output_path: str, source_hash: str, parameters_hash: str) -> bool:
+        """ Returns True, if the output exists and was generated from the same source with the same parameters """
+        entry = self.outputs.get(self.get_relative_path(output_path))
+        return entry is not None and entry["source_hash"] == source_hash and \
+            entry["parameters_hash"] == parameters_hash and os.path.exists(output_path)
+
+    def record(self, output_path: str, source: str, source_hash: str, parameters_hash: str, **details) -> None:
+        """ Records, that the output was generated from the given source with the given parameters """
+        self.outputs[self.get_relative_path(output_path)] = dict(details, source=source, source_hash=source_hash,
+                                                                 parameters_hash=parameters_hash)
+
+    def keep_if_up_to_date(self, previous_manifest: 'BuildManifest', output_path: str, source: str, source_hash: str,
+                           parameters_hash: str) -> bool:
+        """
+        Records the output in this manifest and takes its entry from the previous manifest, if it is still up to date
+
+        :return: True, if the output is up to date and does not have to be generated again
+        """
+        if previous_manifest.is_up_to_date(output_path, source_hash, parameters_hash):
+            self.record(output_path, **previous_manifest.get(output_path))
+            return True
+        self.record(output_path, source, source_hash, parameters_hash)
+        return False
+
+    def get(self, output_path: str) -> dict:
+        return self.outputs[self.get_relative_path(output_path)]
+
+    def get_outputs_of_sources(self, sources: Iterable[str]) -> List[str]:
+        """ Returns the full paths of all outputs, that were generated from one of the given sources """
+        sources = set(sources)
+        return [os.path.join(self.destination_directory, relative_path)
+                for relative_path, entry in self.outputs.items() if entry["source"] in sources]
+
+    def split(self, sources_of_parts: List[Iterable[str]]) -> List['BuildManifest']:
+        """
+        Splits the manifest into smaller manifests, e.g. to hand each worker process only the entries it needs
+
+        :param sources_of_parts: The sources, whose outputs should be contained in each part
+        :return: One manifest per part
+        """
+        parts = [BuildManifest(self.destination_directory) for _ in sources_of_parts]
+        part_of_source = {source: part for part, sources in zip(parts, sources_of_parts) for source in sources}
+        for relative_path, entry in self.outputs.items():
+            part = part_of_source.get(entry["source"])
+            if part is not None:
+                part.outputs[relative_path] = entry
+        return parts
+
+    def update(self, manifest: 'BuildManifest') -> None:
+        """ Adds the outputs of another manifest of the same destination directory, e.g. of a worker process """
+        self.outputs.update(manifest.outputs)
+
+    def remove_orphans(self, previous_manifest: 'BuildManifest') -> int:
+        """
+        Deletes all outputs of the previous manifest, that are not part of this manifest anymore, e.g. because
+        their source was removed or the parameters changed, such that they are not generated anymore
+
+        :return: The number of deleted files
+        """
+        number_of_removed_files = 0
+        for relative_path in previous_manifest.outputs.keys() - self.outputs.keys():
+            output_path = os.path.join(self.destination_directory, relative_path)
+            if os.path.exists(output_path):
+                os.remove(output_path)
+                number_of_removed_files += 1
+        return number_of_removed_files
@@ -1,14 +1,21 @@
 import argparse
 import os
-from typing import List, Optional
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import List, Optional, Union, Tuple
 
 import numpy
-from PIL import Image, ImageDraw
+from PIL import Image
 from tqdm import tqdm
 
+from omrdatasettools.ArchiveDataset import ArchiveDataset
+from omrdatasettools.BuildManifest import BuildManifest
 from omrdatasettools.Point2D import Point2D
 from omrdatasettools.ExportPath import ExportPath
+from omrdatasettools.ImageWriter import ImageWriter
 from omrdatasettools.Rectangle import Rectangle
+from omrdatasettools.ShardedImageWriter import ShardedImageWriter
+from omrdatasettools.StrokeRasterizer import StrokeRasterizer
 
 
 class SimplePoint2D(object):
@@ -76,7 +83,7 @@ class CapitanSymbol:
         :param export_path: The path, where the symbols should be created on disk
         """
         with Image.fromarray(self.image_data, mode='L') as image:
-            image.save(export_path.get_full_path())
+            export_path.save(image)
 
     def draw_capitan_stroke_onto_canvas(self, export_path: ExportPath, stroke_thickness: int, margin: int):
         """
@@ -85,63 +92,276 @@ class CapitanSymbol:
         :param stroke_thickness:
         :param margin:
         """
-        width = int(self.dimensions.width + 2 * margin)
-        height = int(self.dimensions.height + 2 * margin)
-        offset = Point2D(self.dimensions.origin.x - margin, self.dimensions.origin.y - margin)
+        stroke = numpy.array([(point.x, point.y) for point in self.stroke], dtype=numpy.float64).reshape((-1, 2))
+        mode = "L" if export_path.image_mode in ("L", "1") else "RGB"
+        image = self.render_stroke(stroke, self.dimensions, stroke_thickness, margin, mode=mode)
+        export_path.save(image)
+        image.close()
 
-        image = Image.new('RGB', (width, height), "white")  # create a new white image
-        draw = ImageDraw.Draw(image)
-        black = (0, 0, 0)
+    @staticmethod
+    def get_dimensions(stroke: numpy.ndarray) -> Rectangle:
+        """ Computes the dimensions of a stroke of shape (number_of_points, 2) like initialize_from_string """
+        min_x, min_y = numpy.minimum(stroke.min(axis=0, initial=100000), 100000).tolist()
+        max_x, max_y = numpy.maximum(stroke.max(axis=0, initial=0), 0).tolist()
+        return Rectangle(Point2D(min_x, min_y), int(max_x - min_x + 1), int(max_y - min_y + 1))
 
-        for i in range(0, len(self.stroke) - 1):
-            start_point = self.__subtract_offset(self.stroke[i], offset)
-            end_point = self.__subtract_offset(self.stroke[i + 1], offset)
-            distance = self.__euclidean_distance(start_point, end_point)
-            if distance > 1600:  # User moved more than 40 pixels - probably we should not draw a line here
-                continue
-            draw.line((start_point.x, start_point.y, end_point.x, end_point.y), black, stroke_thickness)
+    @staticmethod
+    def render_stroke(stroke: numpy.ndarray, dimensions: Rectangle, stroke_thickness: int,
+                      margin: int, anti_aliasing: bool = False, mode: str = "RGB") -> Image.Image:
+        """
+        Draws a stroke of shape (number_of_points, 2) onto a canvas that fits the given dimensions plus the margin
 
-        del draw
+        :param anti_aliasing: True, if the stroke should be drawn with smooth edges
+        :param mode: The mode of the returned image, e.g. 'RGB' or 'L' for grayscale
+        :return: The rendered image
+        """
+        width = int(dimensions.width + 2 * margin)
+        height = int(dimensions.height + 2 * margin)
+        offset = numpy.array([dimensions.origin.x - margin, dimensions.origin.y - margin], dtype=numpy.float64)
 
-        image.save(export_path.get_full_path())
-        image.close()
+        canvas = numpy.full((height, width), 255, dtype=numpy.uint8)  # create a new white image
+        # If the user moved more than 40 pixels between two points, we should probably not draw a line there
+        StrokeRasterizer.draw_strokes(canvas, [stroke - offset], stroke_thickness, anti_aliasing,
+                                      maximum_squared_segment_length=1600)
+        image = Image.fromarray(canvas)
+        if mode == 'L':
+            return image
+        return image.convert(mode)
+
+
+class CapitanSymbolArrays:
+    """ All symbols of the Capitan dataset in a few contiguous arrays, instead of one CapitanSymbol per symbol.
+
+        The images of all symbols are stored in an uint8 array of shape (N, 30, 30) and the symbol classes in an array
+        of shape (N,). The points of all strokes are stored in a single float64 array of shape (number_of_points, 2),
+        where the stroke of the i-th symbol consists of the points
+        ``stroke_coordinates[stroke_offsets[i]:stroke_offsets[i + 1]]``.
+
+        The arrays can be saved into a directory of .npy files, which can be memory-mapped when loading them again,
+        so later runs neither have to parse the dataset nor read it entirely into memory.
+    """
+
+    FILE_NAMES = ["images", "labels", "stroke_coordinates", "stroke_offsets"]
+
+    def __init__(self, images: numpy.ndarray, labels: numpy.ndarray, stroke_coordinates: numpy.ndarray,
+                 stroke_offsets: numpy.ndarray) -> None:
+        super().__init__()
+        self.images = images
+        self.labels = labels
+        self.stroke_coordinates = stroke_coordinates
+        self.stroke_offsets = stroke_offsets
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def get_stroke(self, index: int) -> numpy.ndarray:
+        """ Returns the stroke of a symbol as an array of shape (number_of_points, 2) """
+        return self.stroke_coordinates[self.stroke_offsets[index]:self.stroke_offsets[index + 1]]
 
     @staticmethod
-    def __euclidean_distance(a: SimplePoint2D, b: SimplePoint2D) -> float:
-        return (a.x - b.x) * (a.x - b.x) + abs(a.y - b.y) * abs(a.y - b.y)
+    def parse(data: str) -> 'CapitanSymbolArrays':
+        """
+        Parses the content of the data file of the Capitan dataset, where each line contains a symbol in the form
+        <label>:<sequence>:<image>. All numbers are converted at once, instead of line by line.
+        """
+        labels = []
+        sequences = []
+        image_strings = []
+        for line in data.splitlines():
+            if line == "":
+                continue
+            label, sequence, image_string = line.split(":")
+            labels.append(label)
+            sequences.append(sequence.strip().strip(";"))
+            image_strings.append(image_string)
+
+        images = numpy.fromstring(",".join(image_strings), dtype=numpy.uint8, sep=",").reshape((len(labels), 30, 30))
+        # Each point is written as x,y; so the number of commas is the number of points in a stroke
+        stroke_offsets = numpy.cumsum([0] + [sequence.count(",") for sequence in sequences], dtype=numpy.int64)
+        numbers = ",".join(sequence for sequence in sequences if sequence != "").replace(";", ",")
+        stroke_coordinates = numpy.fromstring(numbers, dtype=numpy.float64, sep=",").reshape((-1, 2))
+        return CapitanSymbolArrays(images, numpy.array(labels, dtype=str), stroke_coordinates, stroke_offsets)
+
+    def save(self, cache_directory: Union[str, Path]) -> None:
+        """ Saves the arrays as .npy files into the given directory """
+        cache_directory = Path(cache_directory)
+        cache_directory.mkdir(parents=True, exist_ok=True)
+        for file_name in self.FILE_NAMES:
+            # Write into a temporary file first, so an interrupted run never leaves a truncated cache behind
+            temporary_path = cache_directory / (file_name + ".tmp.npy")
+            numpy.save(temporary_path, getattr(self, file_name))
+            os.replace(temporary_path, cache_directory / (file_name + ".npy"))
 
     @staticmethod
-    def __manhatten_distance(a: SimplePoint2D, b: SimplePoint2D) -> float:
-        return abs(a.x - b.x) + abs(a.y - b.y)
+    def exists(cache_directory: Union[str, Path]) -> bool:
+        return all((Path(cache_directory) / (file_name + ".npy")).exists()
+                   for file_name in CapitanSymbolArrays.FILE_NAMES)
 
     @staticmethod
-    def __subtract_offset(a: SimplePoint2D, b: SimplePoint2D) -> SimplePoint2D:
-        return SimplePoint2D(a.x - b.x, a.y - b.y)
+    def load(cache_directory: Union[str, Path], memory_map: bool = True) -> 'CapitanSymbolArrays':
+        """
+        Loads the arrays that were saved with :meth:`save`
+
+        :param cache_directory: The directory that contains the .npy files
+        :param memory_map: If True, the arrays are memory-mapped read-only instead of being read into memory
+        """
+        mmap_mode = "r" if memory_map else None
+        arrays = [numpy.load(Path(cache_directory) / (file_name + ".npy"), mmap_mode=mmap_mode)
+                  for file_name in CapitanSymbolArrays.FILE_NAMES]
+        return CapitanSymbolArrays(*arrays)
 
 
 class CapitanImageGenerator:
-    def create_capitan_images(self, raw_data_directory: str,
+    def create_capitan_images(self, raw_data_directory: Union[str, ArchiveDataset],
                               destination_directory: str,
-                              stroke_thicknesses: List[int]) -> None:
+                              stroke_thicknesses: List[int],
+                              workers: int = 1,
+                              writer: ImageWriter = None,
+                              image_mode: str = "RGB",
+                              compress_level: Optional[int] = None,
+                              incremental: bool = False) -> None:
         """
         Creates a visual representation of the Capitan strokes by parsing all text-files and the symbols as specified
-        by the parameters by drawing lines that connect the points from each stroke of each symbol.
+        by the parameters by drawing lines that connect the points from each stroke of each symbol. Additionally,
+        the image data of each symbol (the score) is stored as an image.
 
-        :param raw_data_directory: The directory, that contains the raw capitan dataset
+        Both kinds of images are rendered in a single pass over the symbols, which can be split into shards that
+        are rendered in parallel by multiple processes.
+
+        :param raw_data_directory: The directory, that contains the raw capitan dataset, or an ArchiveDataset of the
+                                   downloaded archive
         :param destination_directory: The directory, in which the symbols should be generated into. One sub-folder per
                                       symbol category will be generated automatically
         :param stroke_thicknesses: The thickness of the pen, used for drawing the lines in pixels. If multiple are
                                    specified, multiple images will be generated that have a different suffix, e.g.
                                    1-16-3.png for the 3-px version and 1-16-2.png for the 2-px version of the image 1-16
+        :param workers: The number of processes that render the images
+        :param writer: The writer that stores the images, e.g. a BatchedImageWriter. Defaults to an ImageWriter that
+                       saves every image immediately
+        :param image_mode: The mode of the stroke images: 'RGB' (default), 'L' for grayscale images or '1' for
+                           black-and-white images with one bit per pixel. The scores are always stored as grayscale
+                           images, because they contain the shades of gray of the scanned symbols
+        :param compress_level: The optional PNG compression level from 0 (fastest) to 9 (smallest files)
+        :param incremental: True, if images that were generated by a previous run from the same symbol with the same
+                            parameters should be kept instead of being drawn again. The sources and parameters of all
+                            images are stored in a :class:`BuildManifest` in the destination directory and images of
+                            previous runs that are not generated anymore are deleted. Requires a writer that stores
+                            individual files, e.g. no ShardedImageWriter, otherwise a ValueError is raised.
         """
-        symbols = self.load_capitan_symbols(raw_data_directory)
-        self.draw_capitan_stroke_images(symbols, destination_directory, stroke_thicknesses)
-        self.draw_capitan_score_images(symbols, destination_directory)
+        if incremental:
+            BuildManifest.check_writer(writer)
+        if writer is None:
+            writer = ImageWriter()
+
+        arrays = self.load_capitan_arrays(raw_data_directory)
+        total_number_of_images = len(arrays) * (len(stroke_thicknesses) + 1)
+        print("Generating {0} images from {1} Capitan symbols with strokes in {2} different stroke thicknesses ({3}) "
+              "and their scores".format(total_number_of_images, len(arrays), len(stroke_thicknesses),
+                                        stroke_thicknesses))
+        print("In directory {0}".format(os.path.abspath(destination_directory)), flush=True)
 
-    def load_capitan_symbols(self, raw_data_directory: str) -> List[CapitanSymbol]:
-        data_path = os.path.join(raw_data_directory, "BimodalHandwrittenSymbols", "data")
-        with open(data_path) as file:
-            data = file.read()
+        for symbol_class in numpy.unique(arrays.labels):
+            os.makedirs(os.path.join(destination_directory, symbol_class), exist_ok=True)
+
+        # Many small shards keep all workers busy until the end and the progress bar moving
+        shard_size = max(1, min(256, len(arrays) // (max(1, workers) * 8)))
+        shards = []
+        for start in range(0, len(arrays), shard_size):
+            end = min(start + shard_size, len(arrays))
+            strokes = [numpy.array(arrays.get_stroke(index)) for index in range(start, end)]
+            shards.append((start, numpy.array(arrays.images[start:end]), arrays.labels[start:end].tolist(), strokes))
+
+        previous_manifest = BuildManifest.load(destination_directory) if incremental else None
+        manifest = BuildManifest(destination_directory)
+        shard_manifests = [None] * len(shards)
+        if incremental:
+            # Each shard only receives the entries of its own symbols
+            shard_manifests = previous_manifest.split([[str(start + index + 1) for index in range(len(labels))]
+                                                       for start, images, labels, strokes in shards])
+
+        progress_bar = tqdm(total=total_number_of_images, mininterval=0.25, desc="Rendering strokes and scores")
+        if workers <= 1:
+            for shard, shard_manifest in zip(shards, shard_manifests):
+                number_of_images, shard_manifest = self.render_capitan_shard(*shard, destination_directory,
+                                                                             stroke_thicknesses, writer, image_mode,
+                                                                             compress_level, shard_manifest)
+                progress_bar.update(number_of_images)
+                if shard_manifest is not None:
+                    manifest.update(shard_manifest)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(CapitanImageGenerator.render_capitan_shard, *shard, destination_directory,
+                                           stroke_thicknesses, writer, image_mode, compress_level, shard_manifest)
+                           for shard, shard_manifest in zip(shards, shard_manifests)]
+                for future in as_completed(futures):
+                    number_of_images, shard_manifest = future.result()
+                    progress_bar.update(number_of_images)
+                    if shard_manifest is not None:
+                        manifest.update(shard_manifest)
+        progress_bar.close()
+
+        if incremental:
+            number_of_removed_images = manifest.remove_orphans(previous_manifest)
+            manifest.save()
+            print("Removed {0} images of previous runs, that are not generated anymore".format(
+                number_of_removed_images))
+
+    @staticmethod
+    def render_capitan_shard(first_index: int, images: numpy.ndarray, labels: List[str], strokes: List[numpy.ndarray],
+                             destination_directory: str, stroke_thicknesses: List[int], writer: ImageWriter,
+                             image_mode: str = "RGB", compress_level: Optional[int] = None,
+                             previous_manifest: BuildManifest = None) -> Tuple[int, Optional[BuildManifest]]:
+        """
+        Renders the stroke images and score images of consecutive symbols, see :meth:`create_capitan_images`. Runs
+        in the worker processes, if multiple workers are used.
+
+        :param first_index: The index of the first symbol of the shard within the dataset
+        :param previous_manifest: The manifest of a previous run with the entries of these symbols. If provided,
+                                  images that are still up to date are not drawn again
+        :return: The number of generated images and the manifest of the generated images or None, if no previous
+                 manifest was provided
+        """
+        stroke_mode = "L" if image_mode in ("L", "1") else "RGB"
+        stroke_parameters_hash = BuildManifest.hash_parameters(image_mode=image_mode, compress_level=compress_level)
+        score_parameters_hash = BuildManifest.hash_parameters(compress_level=compress_level)
+        manifest = None
+        if previous_manifest is not None:
+            manifest = BuildManifest(previous_manifest.destination_directory)
+
+        number_of_images = 0
+        for index, (image_data, symbol_class, stroke) in enumerate(zip(images, labels, strokes)):
+            capitan_file_name_counter = first_index + index + 1
+            source = str(capitan_file_name_counter)
+            source_hash = BuildManifest.hash_content(symbol_class.encode("utf-8") + image_data.tobytes() +
+                                                     stroke.tobytes())
+
+            dimensions = CapitanSymbol.get_dimensions(stroke)
+            raw_file_name_without_extension = "capitan-{0}-{1}-stroke".format(symbol_class, capitan_file_name_counter)
+            for stroke_thickness in stroke_thicknesses:
+                number_of_images += 1
+                export_path = ExportPath(destination_directory, symbol_class, raw_file_name_without_extension,
+                                         'png', stroke_thickness, image_mode, compress_level)
+                if manifest is not None and manifest.keep_if_up_to_date(previous_manifest, export_path.get_full_path(),
+                                                                        source, source_hash, stroke_parameters_hash):
+                    continue
+                with CapitanSymbol.render_stroke(stroke, dimensions, stroke_thickness, 0, mode=stroke_mode) as image:
+                    export_path.save(image, writer=writer)
+
+            number_of_images += 1
+            raw_file_name_without_extension = "capitan-{0}-{1}-score".format(symbol_class, capitan_file_name_counter)
+            export_path = ExportPath(destination_directory, symbol_class, raw_file_name_without_extension, 'png',
+                                     compress_level=compress_level)
+            if manifest is not None and manifest.keep_if_up_to_date(previous_manifest, export_path.get_full_path(),
+                                                                    source, source_hash, score_parameters_hash):
+                continue
+            with Image.fromarray(image_data, mode='L') as image:
+                export_path.save(image, writer=writer)
+
+        writer.flush()
+        return number_of_images, manifest
+
+    def load_capitan_symbols(self, raw_data_directory: Union[str, ArchiveDataset]) -> List[CapitanSymbol]:
+        data = self.__read_data_file(raw_data_directory)
 
         symbol_strings = data.splitlines()
         symbols = []
@@ -151,9 +371,41 @@ class CapitanImageGenerator:
 
         return symbols
 
+    def load_capitan_arrays(self, raw_data_directory: Union[str, ArchiveDataset],
+                            cache_directory: Union[str, Path] = None) -> CapitanSymbolArrays:
+        """
+        Loads all symbols of the Capitan dataset into contiguous arrays, see :class:`CapitanSymbolArrays`. This is
+        much faster and requires much less memory than :meth:`load_capitan_symbols`.
+
+        :param raw_data_directory: The directory, that contains the raw capitan dataset, or an ArchiveDataset of the
+                                   downloaded archive
+        :param cache_directory: An optional directory, where the parsed arrays are stored. If the directory already
+                                contains them, they are memory-mapped from there instead of parsing the dataset again.
+                                Delete the directory, if the dataset changes.
+        """
+        if cache_directory is not None and CapitanSymbolArrays.exists(cache_directory):
+            return CapitanSymbolArrays.load(cache_directory)
+
+        arrays = CapitanSymbolArrays.parse(self.__read_data_file(raw_data_directory))
+        if cache_directory is not None:
+            arrays.save(cache_directory)
+            return CapitanSymbolArrays.load(cache_directory)
+        return arrays
+
+    @staticmethod
+    def __read_data_file(raw_data_directory: Union[str, ArchiveDataset]) -> str:
+        if isinstance(raw_data_directory, ArchiveDataset):
+            return raw_data_directory.read_text(raw_data_directory.glob("*BimodalHandwrittenSymbols/data")[0])
+
+        data_path = os.path.join(raw_data_directory, "BimodalHandwrittenSymbols", "data")
+        with open(data_path) as file:
+            return file.read()
+
     def draw_capitan_stroke_images(self, symbols: List[CapitanSymbol],
                                    destination_directory: str,
-                                   stroke_thicknesses: List[int]) -> None:
+                                   stroke_thicknesses: List[int],
+                                   image_mode: str = "RGB",
+                                   compress_level: Optional[int] = None) -> None:
         """
         Creates a visual representation of the Capitan strokes by drawing lines that connect the points
         from each stroke of each symbol.
@@ -164,6 +416,9 @@ class CapitanImageGenerator:
         :param stroke_thicknesses: The thickness of the pen, used for drawing the lines in pixels. If multiple are
                                    specified, multiple images will be generated that have a different suffix, e.g.
                                    1-16-3.png for the 3-px version and 1-16-2.png for the 2-px version of the image 1-16
+        :param image_mode: The mode of the generated images: 'RGB' (default), 'L' for grayscale images or '1' for
+                           black-and-white images with one bit per pixel
+        :param compress_level: The optional PNG compression level from 0 (fastest) to 9 (smallest files)
         """
 
         total_number_of_symbols = len(symbols) * len(stroke_thicknesses)
@@ -173,26 +428,28 @@ class CapitanImageGenerator:
         print(output)
         print("In directory {0}".format(os.path.abspath(destination_directory)), flush=True)
 
+        for symbol_class in {symbol.symbol_class for symbol in symbols}:
+            os.makedirs(os.path.join(destination_directory, symbol_class), exist_ok=True)
+
         progress_bar = tqdm(total=total_number_of_symbols, mininterval=0.25, desc="Rendering strokes")
         capitan_file_name_counter = 0
         for symbol in symbols:
             capitan_file_name_counter += 1
-            target_directory = os.path.join(destination_directory, symbol.symbol_class)
-            os.makedirs(target_directory, exist_ok=True)
 
             raw_file_name_without_extension = "capitan-{0}-{1}-stroke".format(symbol.symbol_class,
                                                                               capitan_file_name_counter)
 
             for stroke_thickness in stroke_thicknesses:
                 export_path = ExportPath(destination_directory, symbol.symbol_class, raw_file_name_without_extension,
-                                         'png', stroke_thickness)
+                                         'png', stroke_thickness, image_mode, compress_level)
                 symbol.draw_capitan_stroke_onto_canvas(export_path, stroke_thickness, 0)
                 progress_bar.update(1)
 
         progress_bar.close()
 
     def draw_capitan_score_images(self, symbols: List[CapitanSymbol],
-                                  destination_directory: str) -> None:
+                                  destination_directory: str,
+                                  compress_level: Optional[int] = None) -> None:
         """
         Draws the image data contained in each symbol
 
@@ -202,6 +459,7 @@ class CapitanImageGenerator:
         :param stroke_thicknesses: The thickness of the pen, used for drawing the lines in pixels. If multiple are
                                    specified, multiple images will be generated that have a different suffix, e.g.
                                    1-16-3.png for the 3-px version and 1-16-2.png for the 2-px version of the image 1-16
+        :param compress_level: The optional PNG compression level from 0 (fastest) to 9 (smallest files)
         """
 
         total_number_of_symbols = len(symbols)
@@ -210,17 +468,19 @@ class CapitanImageGenerator:
         print(output)
         print("In directory {0}".format(os.path.abspath(destination_directory)), flush=True)
 
+        for symbol_class in {symbol.symbol_class for symbol in symbols}:
+            os.makedirs(os.path.join(destination_directory, symbol_class), exist_ok=True)
+
         progress_bar = tqdm(total=total_number_of_symbols, mininterval=0.25, desc="Rendering images")
         capitan_file_name_counter = 0
         for symbol in symbols:
             capitan_file_name_counter += 1
-            target_directory = os.path.join(destination_directory, symbol.symbol_class)
-            os.makedirs(target_directory, exist_ok=True)
 
             raw_file_name_without_extension = "capitan-{0}-{1}-score".format(symbol.symbol_class,
                                                                              capitan_file_name_counter)
 
-            export_path = ExportPath(destination_directory, symbol.symbol_class, raw_file_name_without_extension, 'png')
+            export_path = ExportPath(destination_directory, symbol.symbol_class, raw_file_name_without_extension, 'png',
+                                     compress_level=compress_level)
             symbol.draw_capitan_score_bitmap(export_path)
             progress_bar.update(1)
 
@@ -231,6 +491,18 @@ class CapitanImageGenerator:
         parser.add_argument("-s", "--stroke_thicknesses", dest="stroke_thicknesses", default="3",
                             help="Stroke thicknesses for drawing the generated bitmaps. May define comma-separated list"
                                  " of multiple stroke thicknesses, e.g. '1,2,3'")
+        parser.add_argument("--image_mode", default="RGB", choices=["RGB", "L", "1"],
+                            help="Mode of the generated stroke images: RGB (default), L for grayscale or 1 for "
+                                 "black-and-white images with one bit per pixel")
+        parser.add_argument("--compress_level", default=None, type=int, choices=range(10),
+                            help="Optional PNG compression level from 0 (fastest) to 9 (smallest files)")
+        parser.add_argument("--shard_directory", default=None,
+                            help="Optional directory, into which the images are written as tar-shards, instead of "
+                                 "writing one file per image into the image dataset directory")
+        parser.add_argument("--incremental", dest="incremental", action="store_true",
+                            help="Provide this flag, to only draw images whose symbol or parameters changed since the "
+                                 "last run into the same image dataset directory")
+        parser.set_defaults(incremental=False)
 
 
 if __name__ == "__main__":
@@ -245,11 +517,21 @@ if __name__ == "__main__":
         type=str,
         default="../data/images",
         help="The directory, where the generated bitmaps will be created")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="The number of processes, that render the images")
 
     image_generator = CapitanImageGenerator()
     image_generator.add_arguments_for_homus_image_generator(parser)
 
     flags, unparsed = parser.parse_known_args()
 
+    image_writer = None
+    if flags.shard_directory is not None:
+        image_writer = ShardedImageWriter(flags.shard_directory)
+
     image_generator.create_capitan_images(flags.raw_dataset_directory, flags.image_dataset_directory,
-                                          [int(s) for s in flags.stroke_thicknesses.split(',')])
+                                          [int(s) for s in flags.stroke_thicknesses.split(',')], flags.workers,
+                                          image_writer, flags.image_mode, flags.compress_level, flags.incremental)
@@ -0,0 +1,368 @@
+import argparse
+import os
+import shutil
+import sys
+import threading
+import time
+import urllib.request as urllib2
+from concurrent.futures import ThreadPoolExecutor, Future
+from pathlib import Path
+from typing import List, Optional, Union, NamedTuple
+
+from omrdatasettools.ArchiveCache import ArchiveCache
+from omrdatasettools.BandwidthLimiter import BandwidthLimiter
+from omrdatasettools.Downloader import Downloader
+from omrdatasettools.OmrDataset import OmrDataset
+
+
+class DatasetDownloadReport(NamedTuple):
+    """ The outcome of downloading and extracting a single dataset with the :class:`DatasetDownloadScheduler` """
+    dataset: str
+    downloaded_bytes: int
+    download_seconds: float
+    extraction_seconds: float
+    error: Optional[str] = None
+
+    def throughput(self) -> float:
+        """ Returns the download throughput in bytes per second """
+        if self.download_seconds <= 0:
+            return 0.0
+        return self.downloaded_bytes / self.download_seconds
+
+
+class DiskSpaceReservation:
+    """ An internal helper class that keeps track of the disk space that was reserved for a dataset and of how much
+        of it the dataset has written already. Written bytes are already missing from the free disk space, so only
+        the part of the reservation that has not been written yet must be held back from other datasets.
+
+        The reservation is passed to the downloader of the dataset in place of the bandwidth limiter, so it counts
+        the downloaded bytes, before it hands them on to the limiter that is shared by all downloads. The extracted
+        bytes are measured by the growth of the directory that the dataset is extracted into.
+    """
+
+    def __init__(self, reserved_bytes: int, bandwidth_limiter: BandwidthLimiter) -> None:
+        super().__init__()
+        self.reserved_bytes = reserved_bytes
+        self.bandwidth_limiter = bandwidth_limiter
+        self.downloaded_bytes = 0
+        self.extraction_directory = None  # type: Optional[Path]
+        self.initial_size_of_extraction_directory = 0
+        self.lock = threading.Lock()
+
+    def consume(self, number_of_bytes: int) -> None:
+        with self.lock:
+            self.downloaded_bytes += number_of_bytes
+        self.bandwidth_limiter.consume(number_of_bytes)
+
+    def start_extraction(self, extraction_directory: Path) -> None:
+        self.initial_size_of_extraction_directory = self.get_directory_size(extraction_directory)
+        self.extraction_directory = extraction_directory
+
+    def get_unwritten_bytes(self) -> int:
+        written_bytes = self.downloaded_bytes
+        if self.extraction_directory is not None:
+            written_bytes += (self.get_directory_size(self.extraction_directory) -
+                              self.initial_size_of_extraction_directory)
+        return max(self.reserved_bytes - written_bytes, 0)
+
+    @staticmethod
+    def get_directory_size(directory: Path) -> int:
+        size = 0
+        for root, _, file_names in os.walk(directory):
+            for file_name in file_names:
+                try:
+                    size += os.lstat(os.path.join(root, file_name)).st_size
+                except OSError:
+                    pass  # Files can disappear, while the directory is being extracted
+        return size
+
+
+class DatasetDownloadScheduler:
+    """ Downloads and extracts many datasets in one go, e.g., to provision a fresh machine.
+
+        Several archives are downloaded at the same time and each archive is handed over to a separate pool of
+        extraction workers as soon as it is complete, so extracting one dataset overlaps with downloading the next
+        ones. The combined throughput of all downloads can be capped and a download is only started, if the archive
+        and its extracted content are expected to fit onto the disk while leaving the requested amount of space free.
+        Since the extracted size of a dataset is not known up front, it is estimated by the size of its archive.
+
+        Examples
+        --------
+        >>> from omrdatasettools import DatasetDownloadScheduler, OmrDataset
+        >>> scheduler = DatasetDownloadScheduler(maximum_concurrent_downloads=4, bandwidth_limit=50 * 1024 ** 2,
+        >>>                                      minimum_free_disk_space=20 * 1024 ** 3)
+        >>> scheduler.download_and_extract_datasets([OmrDataset.Homus_V2, OmrDataset.Capitan, OmrDataset.Printed],
+        >>>                                         "data")
+
+        or from the command line
+
+        >>> python -m omrdatasettools.DatasetDownloadScheduler Homus_V2 Capitan Printed --bandwidth_limit 50
+    """
+
+    def __init__(self, maximum_concurrent_downloads: int = 3, maximum_concurrent_extractions: int = 1,
+                 bandwidth_limit: Optional[float] = None, minimum_free_disk_space: int = 0,
+                 archive_cache: Optional[ArchiveCache] = None) -> None:
+        """
+        :param maximum_concurrent_downloads: The number of archives that are downloaded at the same time
+        :param maximum_concurrent_extractions: The number of archives that are extracted at the same time
+        :param bandwidth_limit: The optional maximum throughput of all downloads together in bytes per second
+        :param minimum_free_disk_space: The number of bytes that should remain free on the disk of the destination
+                                        directory. Downloads are postponed, until enough space is available
+        :param archive_cache: An optional cache for the downloaded archives, see :class:`ArchiveCache`
+        """
+        super().__init__()
+        self.maximum_concurrent_downloads = maximum_concurrent_downloads
+        self.maximum_concurrent_extractions = maximum_concurrent_extractions
+        self.minimum_free_disk_space = minimum_free_disk_space
+        self.downloader = Downloader(archive_cache, BandwidthLimiter(bandwidth_limit))
+        self.reservations = []  # type: List[DiskSpaceReservation]
+        self.disk_space_condition = threading.Condition()
+        self.archive_locks = dict()  # Maps the url of each archive to the lock of its download
+        self.archive_locks_lock = threading.Lock()
+
+    def download_and_extract_datasets(self, datasets: List[OmrDataset], destination_directory: Union[str, Path],
+                                      tmp_directory: Optional[Path] = None, number_of_connections: int = 1,
+                                      number_of_threads: int = 1) -> List[DatasetDownloadReport]:
+        """
+        Downloads all datasets and extracts each of them into a sub-directory of the destination directory that is
+        named after the dataset, e.g. data/Homus_V2. Datasets that fail do not stop the others, but are reported
+        with their error message.
+
+        :param datasets: The datasets that should be downloaded
+        :param destination_directory: The directory, where the datasets should be extracted into
+        :param tmp_directory: The optional directory where the archives will be downloaded to
+        :param number_of_connections: The number of connections that are used for each download, see
+                                      :meth:`Downloader.download_file`
+        :param number_of_threads: The number of threads that are used for extracting each zip archive
+        :return: A report for each dataset, in the order of the given datasets
+        """
+        destination_directory = Path(destination_directory)
+        destination_directory.mkdir(parents=True, exist_ok=True)
+        if tmp_directory is not None:
+            Path(tmp_directory).mkdir(parents=True, exist_ok=True)
+
+        with ThreadPoolExecutor(max_workers=self.maximum_concurrent_downloads) as download_executor, \
+                ThreadPoolExecutor(max_workers=self.maximum_concurrent_extractions) as extraction_executor:
+            download_futures = [download_executor.submit(self.__download_dataset, dataset, destination_directory,
+                                                         tmp_directory, number_of_connections, number_of_threads,
+                                                         extraction_executor)
+                                for dataset in datasets]
+            reports = [download_future.result().result() for download_future in download_futures]
+
+        self.print_summary(reports)
+        return reports
+
+    @staticmethod
+    def print_summary(reports: List[DatasetDownloadReport]) -> None:
+        print("{0:<36} {1:>12} {2:>12} {3:>10} {4:>12}".format("Dataset", "Downloaded", "Download", "Speed",
+                                                               "Extraction"))
+        for report in reports:
+            if report.error is not None:
+                print("{0:<36} FAILED: {1}".format(report.dataset, report.error))
+                continue
+            print("{0:<36} {1:>9.1f} MB {2:>10.1f} s {3:>5.1f} MB/s {4:>10.1f} s".format(
+                report.dataset, report.downloaded_bytes / 1024 ** 2, report.download_seconds,
+                report.throughput() / 1024 ** 2, report.extraction_seconds))
+
+    def __download_dataset(self, dataset: OmrDataset, destination_directory: Path, tmp_directory: Optional[Path],
+                           number_of_connections: int, number_of_threads: int,
+                           extraction_executor: ThreadPoolExecutor) -> Future:
+        """ Downloads the archives of a dataset and schedules its extraction """
+        archives = [dataset]
+        if dataset in [OmrDataset.MuscimaPlusPlus_V1, OmrDataset.MuscimaPlusPlus_V2]:
+            archives.append(OmrDataset.MuscimaPlusPlus_Images)
+
+        reservation = None
+        try:
+            reservation = self.__reserve_disk_space(dataset, archives, destination_directory, tmp_directory)
+            # The downloader of this dataset counts the downloaded bytes in the reservation
+            downloader = Downloader(self.downloader.archive_cache, reservation)
+
+            start_time = time.monotonic()
+            downloaded_bytes = 0
+            for archive in archives:
+                downloaded_bytes += self.__download_archive(downloader, archive, tmp_directory,
+                                                            number_of_connections)
+            download_seconds = time.monotonic() - start_time
+        except Exception as exception:
+            self.__release_disk_space(reservation)
+            return self.__completed_future(DatasetDownloadReport(dataset.name, 0, 0.0, 0.0, str(exception)))
+
+        return extraction_executor.submit(self.__extract_dataset, dataset, destination_directory, tmp_directory,
+                                          number_of_threads, downloaded_bytes, download_seconds, reservation)
+
+    def __extract_dataset(self, dataset: OmrDataset, destination_directory: Path, tmp_directory: Optional[Path],
+                          number_of_threads: int, downloaded_bytes: int, download_seconds: float,
+                          reservation: DiskSpaceReservation) -> DatasetDownloadReport:
+        start_time = time.monotonic()
+        try:
+            reservation.start_extraction(destination_directory / dataset.name)
+            # All archives are present at this point, so the downloader only extracts and post-processes them
+            self.downloader.download_and_extract_dataset(dataset, destination_directory / dataset.name, tmp_directory,
+                                                         number_of_threads=number_of_threads)
+            error = None
+        except Exception as exception:
+            error = str(exception)
+        finally:
+            self.__release_disk_space(reservation)
+
+        return DatasetDownloadReport(dataset.name, downloaded_bytes, download_seconds, time.monotonic() - start_time,
+                                     error)
+
+    def __download_archive(self, downloader: Downloader, dataset: OmrDataset, tmp_directory: Optional[Path],
+                           number_of_connections: int) -> int:
+        """ Downloads a single archive, unless it is present already, and returns the number of downloaded bytes """
+        url = dataset.get_dataset_download_url()
+        with self.archive_locks_lock:
+            archive_lock = self.archive_locks.setdefault(url, threading.Lock())
+
+        # MUSCIMA++ V1 and V2 share the same image archive, which must not be downloaded twice at the same time
+        with archive_lock:
+            if self.__get_present_archive(dataset, tmp_directory) is not None:
+                return 0
+            archive = downloader.download_archive(url, dataset.get_dataset_filename(), tmp_directory,
+                                                  number_of_connections)
+            return archive.stat().st_size
+
+    def __get_present_archive(self, dataset: OmrDataset, tmp_directory: Optional[Path]) -> Optional[Path]:
+        """ Returns the path of the archive of a dataset, if it has been downloaded already, or None otherwise """
+        if self.downloader.archive_cache is not None:
+            return self.downloader.archive_cache.lookup(dataset.get_dataset_download_url(), verify=False)
+        if tmp_directory:
+            archive = Path(tmp_directory) / dataset.get_dataset_filename()
+        else:
+            archive = Path(dataset.get_dataset_filename())
+        return archive if archive.exists() else None
+
+    def __reserve_disk_space(self, dataset: OmrDataset, archives: List[OmrDataset], destination_directory: Path,
+                             tmp_directory: Optional[Path]) -> DiskSpaceReservation:
+        """ Blocks until the estimated space for downloading and extracting a dataset is available and reserves it """
+        required_disk_space = 0
+        for archive in archives:
+            # The extracted files take about as much space as the archive, which itself might be present already
+            present_archive = self.__get_present_archive(archive, tmp_directory)
+            if present_archive is not None:
+                required_disk_space += present_archive.stat().st_size
+                continue
+
+            archive_size = self.__estimate_archive_size(archive)
+            if archive_size is None:
+                print(f"The size of {archive.get_dataset_filename()} is unknown, so it is downloaded without reserving "
+                      f"disk space for it")
+            else:
+                required_disk_space += 2 * archive_size
+
+        with self.disk_space_condition:
+            while True:
+                # Bytes that the running datasets have written already are missing from the free disk space
+                unwritten_disk_space = sum(reservation.get_unwritten_bytes() for reservation in self.reservations)
+                available_disk_space = (shutil.disk_usage(destination_directory).free - unwritten_disk_space -
+                                        self.minimum_free_disk_space)
+                if required_disk_space <= available_disk_space:
+                    reservation = DiskSpaceReservation(required_disk_space, self.downloader.bandwidth_limiter)
+                    self.reservations.append(reservation)
+                    return reservation
+                if not self.reservations:
+                    raise Exception(f"Not enough disk space for {dataset.name}. It requires about "
+                                    f"{required_disk_space} bytes, but only {max(available_disk_space, 0)} bytes "
+                                    f"are available")
+                # Wait for another dataset to finish, which might free up some of the reserved space
+                self.disk_space_condition.wait()
+
+    def __release_disk_space(self, reservation: Optional[DiskSpaceReservation]) -> None:
+        if reservation is None:
+            return
+        with self.disk_space_condition:
+            self.reservations.remove(reservation)
+            self.disk_space_condition.notify_all()
+
+    @staticmethod
+    def __estimate_archive_size(dataset: OmrDataset) -> Optional[int]:
+        """ Returns the size of the archive as reported by the server or None, if the server could not tell """
+        # Request only the first byte, because the size of the entire file is part of the Content-Range header
+        request = urllib2.Request(dataset.get_dataset_download_url(), headers={"Range": "bytes=0-0"})
+        try:
+            with urllib2.urlopen(request) as response:
+                content_range = response.headers.get("Content-Range", "")
+                if response.status == 206 and content_range.split("/")[-1].isdigit():
+                    return int(content_range.split("/")[-1])
+                content_length = response.headers.get("Content-Length")
+                return int(content_length) if content_length else None
+        except (OSError, ValueError):
+            # The download itself reports, if the server is really unreachable
+            return None
+
+    @staticmethod
+    def __completed_future(report: DatasetDownloadReport) -> Future:
+        future = Future()
+        future.set_result(report)
+        return future
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Downloads and extracts multiple datasets concurrently.")
+    parser.add_argument(
+        "datasets",
+        type=str,
+        nargs="+",
+        choices=[dataset.name for dataset in OmrDataset],
+        help="The names of the datasets that should be downloaded, e.g. Homus_V2 Capitan")
+    parser.add_argument(
+        "--destination_directory",
+        type=str,
+        default="data",
+        help="The directory, where the datasets will be extracted into (one sub-directory per dataset)")
+    parser.add_argument(
+        "--tmp_directory",
+        type=str,
+        default=None,
+        help="The directory, where the archives will be downloaded to")
+    parser.add_argument(
+        "--cache_directory",
+        type=str,
+        default=None,
+        help="An optional directory of an archive cache that is shared with other jobs")
+    parser.add_argument(
+        "--concurrent_downloads",
+        type=int,
+        default=3,
+        help="The number of datasets that are downloaded at the same time")
+    parser.add_argument(
+        "--concurrent_extractions",
+        type=int,
+        default=1,
+        help="The number of datasets that are extracted at the same time")
+    parser.add_argument(
+        "--connections",
+        type=int,
+        default=1,
+        help="The number of connections per download")
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=1,
+        help="The number of threads for extracting a single zip archive")
+    parser.add_argument(
+        "--bandwidth_limit",
+        type=float,
+        default=None,
+        help="The maximum combined download speed in MB/s")
+    parser.add_argument(
+        "--minimum_free_disk_space",
+        type=float,
+        default=0,
+        help="The amount of disk space in GB that should remain free")
+
+    flags, unparsed = parser.parse_known_args()
+
+    scheduler = DatasetDownloadScheduler(
+        flags.concurrent_downloads, flags.concurrent_extractions,
+        flags.bandwidth_limit * 1024 ** 2 if flags.bandwidth_limit else None,
+        int(flags.minimum_free_disk_space * 1024 ** 3),
+        ArchiveCache(flags.cache_directory) if flags.cache_directory else None)
+    reports = scheduler.download_and_extract_datasets([OmrDataset[name] for name in flags.datasets],
+                                                      flags.destination_directory,
+                                                      Path(flags.tmp_directory) if flags.tmp_directory else None,
+                                                      flags.connections, flags.threads)
+    if any(report.error is not None for report in reports):
+        sys.exit(1)
@@ -0,0 +1,123 @@
+import os
+import posixpath
+from typing import List, Tuple, Union, Optional
+
+from omrdatasettools.ArchiveDataset import ArchiveDataset
+
+
+class DatasetIndex:
+    """ Lists all files of a dataset in a single walk over its directory and pairs the files that belong to the same
+        document by the name of the document, e.g. the annotations 'IMSLP06053p1.xml' with the image
+        'IMSLP06053p1.png'. Files that have no partner are reported as orphans instead of shifting all pairs after them.
+
+        The indices of directories are cached, so all generators that read the same dataset walk its directory only
+        once. A cached index is only used as long as none of the walked directories was replaced or modified, which
+        only requires a stat of each directory instead of listing all files again. Use refresh=True to walk the
+        directory in any case.
+
+        Examples
+        --------
+        >>> pairs, orphans = DatasetIndex.of("data/audiveris_omr_raw").pair([".xml", ".png"])
+        >>> for xml_file, image_file in pairs:
+        >>>     print(xml_file, image_file)
+    """
+
+    # Maps the real path of a dataset to the status of all its directories and the paths of its files
+    __cache = {}
+
+    def __init__(self, root_directory: Optional[str], relative_paths: List[str]) -> None:
+        """
+        :param root_directory: The directory of the dataset or None, if the paths are names of files in an archive
+        :param relative_paths: The paths of all files relative to the root directory, separated by '/'
+        """
+        super().__init__()
+        self.root_directory = root_directory
+        self.relative_paths = relative_paths
+
+    @staticmethod
+    def of(dataset: Union[str, ArchiveDataset], refresh: bool = False) -> 'DatasetIndex':
+        """
+        Returns the index of all files of the dataset
+
+        :param dataset: The directory of the dataset or an ArchiveDataset of the downloaded archive
+        :param refresh: True, if the directory should be walked again, even if it was indexed before
+        """
+        if isinstance(dataset, ArchiveDataset):
+            return DatasetIndex(None, dataset.glob("*"))
+
+        key = os.path.realpath(dataset)
+        directory_status, relative_paths = DatasetIndex.__cache.get(key, (None, None))
+        if refresh or relative_paths is None or not DatasetIndex.__is_unchanged(key, directory_status):
+            directory_status, relative_paths = DatasetIndex.__list_files(dataset)
+            DatasetIndex.__cache[key] = (directory_status, relative_paths)
+        return DatasetIndex(dataset, relative_paths)
+
+    def pair(self, extensions: List[str], sub_directory: Union[str, List[str]] = "") \
+            -> Tuple[List[Tuple[str, ...]], List[str]]:
+        """
+        Pairs the files with the given extensions by the name of their document
+
+        :param extensions: The extensions of the files of each document, e.g. ['.xml', '.png']
+        :param sub_directory: The optional directory relative to the root directory, e.g. 'v2.0/data', to which the
+                              search should be restricted, or one directory per extension, e.g.
+                              ['v2.0/data/annotations', 'v2.0/data/images']
+        :return: The pairs of each document with one path per extension in the order of the extensions, sorted by the
+                 name of their document, and the paths of all orphans: files of documents that miss a file with one of
+                 the extensions or contain multiple files with the same extension
+        """
+        position_of_extension = {extension: position for position, extension in enumerate(extensions)}
+        sub_directories = [sub_directory] * len(extensions) if isinstance(sub_directory, str) else sub_directory
+        prefixes = [directory.strip("/") + "/" if directory else "" for directory in sub_directories]
+        files_of_documents = {}  # Maps the name of a document to its files, grouped by extension
+        for relative_path in self.relative_paths:
+            document, extension = posixpath.splitext(posixpath.basename(relative_path))
+            if extension in position_of_extension and \
+                    relative_path.startswith(prefixes[position_of_extension[extension]]):
+                files = files_of_documents.setdefault(document, [[] for _ in extensions])
+                files[position_of_extension[extension]].append(self.get_full_path(relative_path))
+
+        pairs, orphans = [], []
+        for document in sorted(files_of_documents.keys()):
+            files = files_of_documents[document]
+            if all(len(files_with_extension) == 1 for files_with_extension in files):
+                pairs.append(tuple(files_with_extension[0] for files_with_extension in files))
+            else:
+                orphans.extend(path for files_with_extension in files for path in files_with_extension)
+        return pairs, orphans
+
+    def get_full_path(self, relative_path: str) -> str:
+        if self.root_directory is None:
+            return relative_path
+        return os.path.join(self.root_directory, *relative_path.split("/"))
+
+    @staticmethod
+    def __list_files(root_directory: str) -> Tuple[dict, List[str]]:
+        """ Returns the status of all walked directories by their relative path and the paths of all files """
+        directory_status, relative_paths = {}, []
+        for directory, sub_directories, file_names in os.walk(root_directory):
+            sub_directories.sort()
+            relative_directory = os.path.relpath(directory, root_directory).replace(os.sep, "/")
+            directory_status[relative_directory] = DatasetIndex.__get_directory_status(directory)
+            for file_name in sorted(file_names):
+                # Hidden files are skipped, just like glob does
+                if file_name.startswith("."):
+                    continue
+                relative_paths.append(file_name if relative_directory == "." else relative_directory + "/" + file_name)
+        return directory_status, relative_paths
+
+    @staticmethod
+    def __is_unchanged(root_directory: str, directory_status: dict) -> bool:
+        """ Adding, removing or renaming a file or directory modifies the directory that contains it, so it suffices to
+            compare the status of all directories that were walked before """
+        if not directory_status:
+            return False
+        return all(DatasetIndex.__get_directory_status(os.path.join(root_directory, *relative_directory.split("/")))
+                   == status for relative_directory, status in directory_status.items())
+
+    @staticmethod
+    def __get_directory_status(directory: str) -> Optional[tuple]:
+        try:
+            status = os.stat(directory)
+        except OSError:
+            return None
+        return status.st_ino, status.st_mtime_ns
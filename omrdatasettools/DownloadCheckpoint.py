@@ -0,0 +1,92 @@
+import json
+import os
+import threading
+from pathlib import Path
+from typing import List, Optional
+
+
+class DownloadCheckpoint:
+    """ An internal helper class that records which byte ranges of a partial download have already been written to
+        disk. The record is stored as a small JSON file next to the partial download, so an interrupted download can
+        be continued with a range request instead of being fetched again from the start.
+    """
+
+    def __init__(self, checkpoint_path: Path, url: str, file_size: Optional[int] = None,
+                 completed_ranges: List[List[int]] = None) -> None:
+        super().__init__()
+        self.checkpoint_path = checkpoint_path
+        self.url = url
+        self.file_size = file_size
+        self.completed_ranges = completed_ranges or []  # Sorted, non-overlapping [start, stop) pairs
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def load(checkpoint_path: Path, url: str, file_size: Optional[int] = None) -> 'DownloadCheckpoint':
+        """
+        Loads the checkpoint of a previous download attempt. If there is none, or it belongs to a different url or
+        a file of a different size, an empty checkpoint is returned instead.
+
+        :param checkpoint_path: The path of the sidecar file
+        :param url: The url that is being downloaded
+        :param file_size: The total size of the file in bytes, if known
+        """
+        if not checkpoint_path.exists():
+            return DownloadCheckpoint(checkpoint_path, url, file_size)
+
+        try:
+            with open(checkpoint_path, 'r') as checkpoint_file:
+                record = json.load(checkpoint_file)
+        except (OSError, ValueError):
+            return DownloadCheckpoint(checkpoint_path, url, file_size)
+
+        recorded_file_size = record.get("file_size")
+        if record.get("url") != url or (file_size is not None and recorded_file_size not in (None, file_size)):
+            return DownloadCheckpoint(checkpoint_path, url, file_size)
+
+        if file_size is None:
+            file_size = recorded_file_size
+        return DownloadCheckpoint(checkpoint_path, url, file_size, record.get("completed_ranges", []))
+
+    def completed_bytes(self) -> int:
+        return sum(stop - start for start, stop in self.completed_ranges)
+
+    def completed_prefix(self) -> int:
+        """ :return: The number of bytes from the beginning of the file that have been written without a gap """
+        if self.completed_ranges and self.completed_ranges[0][0] == 0:
+            return self.completed_ranges[0][1]
+        return 0
+
+    def is_completed(self, start: int, stop: int) -> bool:
+        return any(completed_start <= start and stop <= completed_stop
+                   for completed_start, completed_stop in self.completed_ranges)
+
+    def add_completed_range(self, start: int, stop: int) -> None:
+        """ Marks the bytes [start, stop) as written and stores the checkpoint on disk. """
+        with self.lock:
+            merged_ranges = []
+            for completed_start, completed_stop in sorted(self.completed_ranges + [[start, stop]]):
+                if merged_ranges and completed_start <= merged_ranges[-1][1]:
+                    merged_ranges[-1][1] = max(merged_ranges[-1][1], completed_stop)
+                else:
+                    merged_ranges.append([completed_start, completed_stop])
+            self.completed_ranges = merged_ranges
+            self.save()
+
+    def reset(self) -> None:
+        """ Forgets all completed ranges and removes the stored checkpoint. A new checkpoint is only stored once the
+            first range was written again, so failed attempts never leave an empty checkpoint behind. """
+        with self.lock:
+            self.completed_ranges = []
+            self.delete()
+
+    def save(self) -> None:
+        # Write to a temporary file first, so a killed process never leaves a half-written checkpoint behind
+        temporary_path = self.checkpoint_path.with_name(self.checkpoint_path.name + ".tmp")
+        with open(temporary_path, 'w') as checkpoint_file:
+            json.dump({"url": self.url, "file_size": self.file_size, "completed_ranges": self.completed_ranges},
+                      checkpoint_file)
+        os.replace(temporary_path, self.checkpoint_path)
+
+    def delete(self) -> None:
+        if self.checkpoint_path.exists():
+            os.remove(self.checkpoint_path)
@@ -1,35 +1,133 @@
+import hashlib
 import os
 import shutil
-import urllib
+import threading
 import urllib.parse as urlparse
 import urllib.request as urllib2
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import nullcontext
 from glob import glob
 from pathlib import Path
-from typing import Union, Optional
-from zipfile import ZipFile
+from typing import Union, Optional, Tuple, List
 
 from lxml import etree
 from tqdm import tqdm
 
-from omrdatasettools.OmrDataset import OmrDataset
+from omrdatasettools.ArchiveCache import ArchiveCache
+from omrdatasettools.ArchiveDataset import ArchiveDataset
+from omrdatasettools.ArchiveExtractor import ArchiveExtractor
+from omrdatasettools.BandwidthLimiter import BandwidthLimiter
+from omrdatasettools.DownloadCheckpoint import DownloadCheckpoint
+from omrdatasettools.EdiromImageCrawler import EdiromImageCrawler
+from omrdatasettools.OmrDataset import OmrDataset, ArchiveChecksum
 import tarfile
 
+try:
+    import fcntl
+except ImportError:  # Not available on Windows, where files are hard-linked or copied instead of reflinked
+    fcntl = None
+
+FICLONE = 0x40049409
+""" The ioctl request of Linux to clone the content of a file (reflink) on file systems such as Btrfs or XFS """
+
+
+class ContiguousPrefixHasher:
+    """ An internal helper class that feeds a partially downloaded file into a hash object in order. The byte ranges
+        of a download with multiple connections complete out of order, so each time the contiguous prefix of the file
+        grows, only the new part is read back (usually straight from the page cache) and hashed.
+    """
+
+    def __init__(self, filename: Path, hash_object) -> None:
+        super().__init__()
+        self.filename = filename
+        self.hash_object = hash_object
+        self.hashed_size = 0
+        self.lock = threading.Lock()
+
+    def update(self, completed_prefix: int) -> None:
+        if self.hash_object is None:
+            return
+
+        with self.lock:
+            if completed_prefix <= self.hashed_size:
+                return
+
+            with open(self.filename, 'rb') as f:
+                f.seek(self.hashed_size)
+                remaining_bytes = completed_prefix - self.hashed_size
+                while remaining_bytes > 0:
+                    block = f.read(min(remaining_bytes, 1024 * 1024))
+                    if not block:
+                        break
+                    self.hash_object.update(block)
+                    remaining_bytes -= len(block)
+            self.hashed_size = completed_prefix
+
+
+class HashingReader:
+    """ An internal helper class that wraps a stream, e.g., an HTTP response, and updates a hash object and a
+        progress bar with every block that is read from it.
+    """
+
+    def __init__(self, stream, hash_object, progress_bar: tqdm,
+                 bandwidth_limiter: Optional[BandwidthLimiter] = None) -> None:
+        super().__init__()
+        self.stream = stream
+        self.hash_object = hash_object
+        self.progress_bar = progress_bar
+        self.bandwidth_limiter = bandwidth_limiter
+
+    def read(self, size: int = -1) -> bytes:
+        buffer = self.stream.read(size)
+        self.hash_object.update(buffer)
+        self.progress_bar.update(len(buffer))
+        if self.bandwidth_limiter is not None:
+            self.bandwidth_limiter.consume(len(buffer))
+        return buffer
+
 
 class Downloader:
     """ The class for downloading OMR datasets. It downloads the selected dataset from Github and extracts it to
         a specified directory.
     """
 
+    def __init__(self, archive_cache: Optional[ArchiveCache] = None,
+                 bandwidth_limiter: Optional[BandwidthLimiter] = None) -> None:
+        """
+        :param archive_cache: An optional cache for the downloaded archives that can be shared by multiple jobs. If
+                              provided, archives are downloaded into the cache and extracted from there, instead of
+                              being downloaded into the current working directory or the tmp_directory.
+        :param bandwidth_limiter: An optional limiter that caps the combined throughput of all downloads of this
+                                  downloader and of any other downloader that shares the same limiter
+        """
+        super().__init__()
+        self.archive_cache = archive_cache
+        self.bandwidth_limiter = bandwidth_limiter
+
     def download_and_extract_dataset(
             self,
             dataset: OmrDataset,
             destination_directory: Union[str, Path],
-            tmp_directory: Optional[Path] = None):
+            tmp_directory: Optional[Path] = None,
+            number_of_connections: int = 1,
+            streaming: bool = False,
+            number_of_threads: int = 1,
+            include: Optional[List[str]] = None,
+            exclude: Optional[List[str]] = None):
         """ Starts the download of the dataset and extracts it into the specified directory.
 
         :param dataset: The dataset that should be downloaded
         :param destination_directory: The target directory, where the dataset should be extracted into
         :param tmp_directory: The optional directory where the compressed dataset will be downloaded to
+        :param number_of_connections: The number of concurrent connections that are used for downloading large
+                                      datasets in parallel byte ranges, if the server supports it
+        :param streaming: If True, .tar.gz datasets such as DeepScores_V2_Complete are extracted while they are
+                          being downloaded, without storing the archive on disk. See
+                          :meth:`download_and_extract_tar_archive_streaming`. Other datasets ignore this flag.
+        :param number_of_threads: The number of threads that are used for extracting zip archives
+        :param include: Optional glob patterns of archive members, e.g. ["*/annotations/*"]. If provided, only
+                        matching members are extracted
+        :param exclude: Optional glob patterns of archive members that should not be extracted
 
         Examples
         --------
@@ -41,16 +139,25 @@ class Downloader:
         destination_directory = Path(destination_directory)
 
         self.download_and_extract_custom_dataset(dataset.name, dataset.get_dataset_download_url(),
-                                                 dataset.get_dataset_filename(), destination_directory, tmp_directory)
+                                                 dataset.get_dataset_filename(), destination_directory, tmp_directory,
+                                                 number_of_connections, streaming=streaming,
+                                                 number_of_threads=number_of_threads, include=include, exclude=exclude)
 
         if dataset is OmrDataset.Fornes:
             self.__fix_capital_file_endings(os.path.join(os.path.abspath(destination_directory), "Music_Symbols"))
 
         if dataset in [OmrDataset.MuscimaPlusPlus_V1, OmrDataset.MuscimaPlusPlus_V2]:
-            self.__download_muscima_pp_images(dataset, destination_directory, tmp_directory)
+            self.__download_muscima_pp_images(dataset, destination_directory, tmp_directory, number_of_connections,
+                                              number_of_threads)
 
     def download_and_extract_custom_dataset(self, dataset_name: str, dataset_url: str, dataset_filename: str,
-                                            destination_directory: Path, tmp_directory: Path):
+                                            destination_directory: Path, tmp_directory: Path,
+                                            number_of_connections: int = 1,
+                                            expected_checksum: Optional[ArchiveChecksum] = None,
+                                            streaming: bool = False,
+                                            number_of_threads: int = 1,
+                                            include: Optional[List[str]] = None,
+                                            exclude: Optional[List[str]] = None):
         """ Starts the download of a custom dataset and extracts it into the specified directory.
 
         Examples
@@ -61,22 +168,181 @@ class Downloader:
         >>>     "dataset.zip", "data/MyNewOmrDataset")
 
         """
+        if streaming and dataset_filename.endswith((".tar.gz", ".tgz")):
+            self.download_and_extract_tar_archive_streaming(dataset_url, destination_directory, expected_checksum,
+                                                            include, exclude, self.bandwidth_limiter)
+            return
+
+        dataset_download_path = self.download_archive(dataset_url, dataset_filename, tmp_directory,
+                                                      number_of_connections, expected_checksum)
+
+        print(f"Extracting {str(dataset_download_path)} dataset...")
+        with self.__use_archive(dataset_download_path):
+            self.extract_dataset(destination_directory, dataset_download_path, number_of_threads, include, exclude)
+
+    @staticmethod
+    def download_and_extract_tar_archive_streaming(dataset_url: str, destination_directory: Union[str, Path],
+                                                   expected_checksum: Optional[ArchiveChecksum] = None,
+                                                   include: Optional[List[str]] = None,
+                                                   exclude: Optional[List[str]] = None,
+                                                   bandwidth_limiter: Optional[BandwidthLimiter] = None):
+        """ Downloads a .tar.gz archive and extracts its members while the download is still running, by feeding the
+        HTTP response directly into tarfile in stream mode. The archive itself is never written to disk, which
+        avoids reading it a second time and temporary space of the size of the archive. Consequently, the download
+        can neither be resumed nor be served from an archive cache.
+
+        :param dataset_url: The url of the .tar.gz archive
+        :param destination_directory: The target directory, where the dataset should be extracted into
+        :param expected_checksum: The optional expected size and SHA-256 of the archive, which is verified after all
+                                  members have been extracted
+        :param include: Optional glob patterns of archive members that should be extracted
+        :param exclude: Optional glob patterns of archive members that should not be extracted
+        :param bandwidth_limiter: An optional limiter for the throughput of the download
+        """
+        destination_directory = Path(destination_directory)
+        print(f"Downloading and extracting {dataset_url} dataset...")
+        sha256 = hashlib.sha256()
+
+        with urllib2.urlopen(dataset_url) as response:
+            content_length = response.headers.get("Content-Length")
+            file_size = int(content_length) if content_length else None
+            with tqdm(total=file_size, desc="Downloading (bytes)") as progress_bar:
+                reader = HashingReader(response, sha256, progress_bar, bandwidth_limiter)
+                with tarfile.open(fileobj=reader, mode="r|gz") as tar:
+                    ArchiveExtractor.extract_tar(tar, destination_directory, include, exclude)
+                # Consume the padding after the end of the tar archive, so the checksum covers all bytes
+                while reader.read(65536):
+                    pass
+                actual_size = progress_bar.n
+
+        if expected_checksum is None:
+            print(f"No checksum is known for {dataset_url}, so the integrity of the extracted files could not be "
+                  f"verified")
+        elif ArchiveChecksum(actual_size, sha256.hexdigest()) != expected_checksum:
+            raise Exception(f"Integrity check of {dataset_url} failed. The extracted files in "
+                            f"{str(destination_directory)} should not be used. Expected {expected_checksum.size} "
+                            f"bytes with SHA-256 {expected_checksum.sha256}, but received {actual_size} bytes with "
+                            f"SHA-256 {sha256.hexdigest()}")
+
+        Downloader.__remove_macos_system_directory(destination_directory)
+
+    def download_archive(self, dataset_url: str, dataset_filename: str, tmp_directory: Optional[Path] = None,
+                         number_of_connections: int = 1,
+                         expected_checksum: Optional[ArchiveChecksum] = None) -> Path:
+        """ Downloads the archive of a dataset, unless it is already present, and returns its path.
+
+        The SHA-256 of the archive is computed while it is being downloaded and compared with the expected checksum,
+        if one is provided. If this downloader has an archive cache, the archive is served from the cache, if it has
+        been downloaded and verified before, and the tmp_directory is ignored.
+
+        :param dataset_url: The url of the archive
+        :param dataset_filename: The name of the archive on disk
+        :param tmp_directory: The optional directory where the archive will be downloaded to
+        :param number_of_connections: The number of concurrent connections that are used for downloading
+        :param expected_checksum: The optional expected size and SHA-256 of the archive
+        :return: The path to the downloaded archive
+        """
+        if self.archive_cache is not None:
+            return self.__download_archive_into_cache(dataset_url, number_of_connections, expected_checksum)
+
         if tmp_directory:
             dataset_download_path = tmp_directory / dataset_filename
         else:
             dataset_download_path = Path(dataset_filename)
 
+        # Partial downloads are kept in a .part file, so an existing archive is always complete
         if not dataset_download_path.exists():
             print(f"Downloading {str(dataset_download_path)} dataset...")
-            self.download_file(dataset_url, dataset_download_path)
+            sha256 = hashlib.sha256()
+            self.download_file(dataset_url, dataset_download_path, number_of_connections, hash_object=sha256,
+                               bandwidth_limiter=self.bandwidth_limiter)
+            checksum = ArchiveChecksum(dataset_download_path.stat().st_size, sha256.hexdigest())
+            self.__verify_checksum(dataset_download_path, checksum, expected_checksum)
+
+        return dataset_download_path
+
+    def __download_archive_into_cache(self, dataset_url: str, number_of_connections: int,
+                                      expected_checksum: Optional[ArchiveChecksum]) -> Path:
+        cached_archive = self.archive_cache.lookup(dataset_url, expected_checksum)
+        if cached_archive is not None:
+            if expected_checksum is not None or self.archive_cache.is_verified(dataset_url):
+                print(f"Using cached archive {str(cached_archive)}")
+            else:
+                print(f"Using cached archive {str(cached_archive)}, which could not be verified, because no checksum "
+                      f"is known for it")
+            return cached_archive
+
+        with self.archive_cache.lock(dataset_url):
+            # Another job might have downloaded the archive while we were waiting for the lock
+            cached_archive = self.archive_cache.lookup(dataset_url, expected_checksum)
+            if cached_archive is not None:
+                return cached_archive
+
+            download_path = self.archive_cache.get_download_path(dataset_url)
+            print(f"Downloading {dataset_url} into the archive cache...")
+            sha256 = hashlib.sha256()
+            self.download_file(dataset_url, download_path, number_of_connections, hash_object=sha256,
+                               bandwidth_limiter=self.bandwidth_limiter)
+            checksum = ArchiveChecksum(download_path.stat().st_size, sha256.hexdigest())
+            verified = self.__verify_checksum(download_path, checksum, expected_checksum)
+            return self.archive_cache.add(dataset_url, download_path, checksum, verified)
+
+    def __use_archive(self, archive: Path):
+        """ Keeps a downloaded archive from being evicted from the archive cache, while it is being extracted """
+        if self.archive_cache is None:
+            return nullcontext()
+        return self.archive_cache.use(archive)
 
-        print(f"Extracting {str(dataset_download_path)} dataset...")
-        self.extract_dataset(destination_directory, dataset_download_path)
+    @staticmethod
+    def __verify_checksum(archive: Path, actual_checksum: ArchiveChecksum,
+                          expected_checksum: Optional[ArchiveChecksum]) -> bool:
+        """ Raises an exception, if the archive does not match the expected checksum
+
+        :return: True, if the archive was verified, or False, if no checksum is known for it
+        """
+        if expected_checksum is None:
+            print(f"No checksum is known for {str(archive)}, so its integrity could not be verified")
+            return False
+        if actual_checksum == expected_checksum:
+            return True
+
+        os.remove(archive)
+        raise Exception(f"Integrity check of {str(archive)} failed. Expected {expected_checksum.size} bytes with "
+                        f"SHA-256 {expected_checksum.sha256}, but received {actual_checksum.size} bytes with SHA-256 "
+                        f"{actual_checksum.sha256}")
+
+    def open_dataset_archive(self, dataset: OmrDataset, tmp_directory: Optional[Path] = None,
+                             number_of_connections: int = 1) -> ArchiveDataset:
+        """ Downloads the archive of a dataset, but instead of extracting it, returns a read-only view that reads the
+        files straight from the archive. The view can be passed to the image generators in place of the
+        raw_data_directory.
+
+        Examples
+        --------
+        >>> from omrdatasettools import Downloader, OmrDataset, HomusImageGenerator
+        >>> downloader = Downloader()
+        >>> with downloader.open_dataset_archive(OmrDataset.Homus_V2) as dataset:
+        >>>     HomusImageGenerator.create_images(dataset, "homus_images", [3], 96, 192)
 
-    def download_images_from_mei_annotation(self, dataset: OmrDataset, dataset_directory: str, base_url: str):
+        """
+        archive = self.download_archive(dataset.get_dataset_download_url(), dataset.get_dataset_filename(),
+                                        tmp_directory, number_of_connections)
+        return ArchiveDataset(archive)
+
+    def download_images_from_mei_annotation(self, dataset: OmrDataset, dataset_directory: str, base_url: str,
+                                            number_of_workers: int = 8, requests_per_second: Optional[float] = None):
         """ Crawls the images of an Edirom dataset, if provided with the respective URL. To avoid repetitive crawling,
             this URL has to be provided manually. If you are interested in these datasets, please contact the authors.
 
+            The images are downloaded concurrently over persistent connections by an :class:`EdiromImageCrawler`.
+            Images that have been downloaded before are skipped.
+
+            :param dataset: The Edirom dataset
+            :param dataset_directory: The directory, where the MEI annotations of the dataset were extracted to
+            :param base_url: The url of the server that hosts the images
+            :param number_of_workers: The number of images that are downloaded concurrently
+            :param requests_per_second: The optional maximum number of requests per second
+
             Examples
             --------
             >>> from omrdatasettools import Downloader, OmrDataset
@@ -98,42 +364,50 @@ class Downloader:
             print(
                 f"Could not find MEI (XML) files in {dataset_directory}/ directory. Can't download images.")
 
+        crawler = EdiromImageCrawler(number_of_workers, requests_per_second)
         for source in glob(f'{dataset_directory}/*.xml'):
             base = os.path.splitext(source)[0]
             os.makedirs(base, exist_ok=True)
             print("Downloading dataset for " + base)
-            self.__download_edirom_images(base, base_url, source)
+            self.__download_edirom_images(crawler, base, base_url, source)
 
-    def __download_edirom_images(self, base, base_url, source):
+    def __download_edirom_images(self, crawler: EdiromImageCrawler, base, base_url, source):
         xml = etree.parse(source).getroot()
 
-        for graphic in tqdm(xml.xpath('//*[local-name()="graphic"]'), desc="Downloading images"):
+        downloads = []
+        for graphic in xml.xpath('//*[local-name()="graphic"]'):
             url = graphic.get('target')
             filename = os.path.basename(url)
             width = graphic.get('width')
-            if os.path.exists(os.path.join(base, filename)):
-                pass  # Skipping download, because it has been downloaded already
-            else:
-                urllib.request.urlretrieve(f"{base_url}/{url}?dw={width}&amp;mo=fit", os.path.join(base, filename))
+            downloads.append((f"{base_url}/{url}?dw={width}&amp;mo=fit", os.path.join(base, filename)))
 
-    def __download_muscima_pp_images(self, dataset: OmrDataset, destination_directory: Path, tmp_directory: Path):
-        # Automatically download the images and measure annotations with the MUSCIMA++ dataset
-        if tmp_directory:
-            muscima_pp_images_filename = tmp_directory / OmrDataset.MuscimaPlusPlus_Images.get_dataset_filename()
-        else:
-            muscima_pp_images_filename = OmrDataset.MuscimaPlusPlus_Images.get_dataset_filename()
+        crawler.crawl(downloads)
 
-        if not os.path.exists(muscima_pp_images_filename):
-            print("Downloading MUSCIMA++ images")
-            self.download_file(dataset.dataset_download_urls()["MuscimaPlusPlus_Images"], muscima_pp_images_filename)
-        absolute_path_to_temp_folder = Path('MuscimaPpImages')
-        self.extract_dataset(absolute_path_to_temp_folder, muscima_pp_images_filename)
+    def __download_muscima_pp_images(self, dataset: OmrDataset, destination_directory: Path, tmp_directory: Path,
+                                     number_of_connections: int, number_of_threads: int):
+        # Automatically download the images and measure annotations with the MUSCIMA++ dataset
+        print("Downloading MUSCIMA++ images")
+        muscima_pp_images = OmrDataset.MuscimaPlusPlus_Images
+        muscima_pp_images_filename = self.download_archive(muscima_pp_images.get_dataset_download_url(),
+                                                           muscima_pp_images.get_dataset_filename(), tmp_directory,
+                                                           number_of_connections)
         target_folder = None
         if dataset is OmrDataset.MuscimaPlusPlus_V1:
             target_folder = destination_directory / "v1.0" / "data" / "images"
         if dataset is OmrDataset.MuscimaPlusPlus_V2:
             target_folder = destination_directory / "v2.0" / "data" / "images"
-        self.copytree(absolute_path_to_temp_folder / "fulls", target_folder)
+
+        # Only the full images are needed. They are extracted next to the target folder, so they are on the same
+        # file system and can be moved into place without copying them.
+        absolute_path_to_temp_folder = destination_directory / "MuscimaPpImages"
+        with self.__use_archive(muscima_pp_images_filename):
+            self.extract_dataset(absolute_path_to_temp_folder, muscima_pp_images_filename, number_of_threads,
+                                 include=["fulls/*"])
+        if not target_folder.exists():
+            target_folder.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(absolute_path_to_temp_folder / "fulls", target_folder)
+        else:
+            self.copytree(absolute_path_to_temp_folder / "fulls", target_folder, move=True)
         self.clean_up_temp_directory(absolute_path_to_temp_folder)
 
     def __fix_capital_file_endings(self, absolute_path_to_temp_folder):
@@ -143,33 +417,76 @@ class Downloader:
             os.rename(image, image[:-3] + "bmp")
 
     @staticmethod
-    def copytree(src: Path, dst: Path):
+    def copytree(src: Path, dst: Path, move: bool = False, link: bool = False):
+        """ Recursively copies the files of one directory into another one, skipping files that are up to date.
+
+        :param src: The source directory
+        :param dst: The destination directory, which will be created if necessary
+        :param move: If True, the files are moved instead, which is a cheap rename on the same file system
+        :param link: If True, the files are not copied byte by byte, if the file system allows for something cheaper:
+                     They are reflinked (copy-on-write clones on file systems such as Btrfs or XFS), or hard-linked,
+                     if both directories are on the same file system. Hard-linked files share their content with the
+                     source, so modifying one modifies the other. Existing files in the destination are replaced by
+                     the links instead of being overwritten.
+        """
         if not os.path.exists(dst):
             os.makedirs(dst)
         for item in os.listdir(src):
             s = os.path.join(src, item)
             d = os.path.join(dst, item)
             if os.path.isdir(s):
-                Downloader.copytree(Path(s), Path(d))
+                Downloader.copytree(Path(s), Path(d), move, link)
             else:
                 if not os.path.exists(d) or os.stat(s).st_mtime - os.stat(d).st_mtime > 1:
-                    shutil.copy2(s, d)
+                    if move:
+                        shutil.move(s, d)
+                    elif link:
+                        if os.path.exists(d):
+                            os.remove(d)  # Links can not replace existing files and would modify them through the link
+                        Downloader.__link_or_copy_file(s, d)
+                    else:
+                        shutil.copy2(s, d)
 
     @staticmethod
-    def extract_dataset(absolute_path_to_folder: Path, dataset_filename: Union[str, Path]):
-        dataset_filename = Path(dataset_filename)
-
-        if dataset_filename.suffix == ".zip":
-            archive = ZipFile(dataset_filename, "r")
-            archive.extractall(absolute_path_to_folder)
-            archive.close()
-        elif dataset_filename.suffix == ".gz":
-            tar = tarfile.open(dataset_filename, "r:gz")
-            tar.extractall(absolute_path_to_folder)
-            tar.close()
-        else:
-            raise Exception(f"Unrecognized dataset encountered: {str(dataset_filename)}")
+    def __link_or_copy_file(src: str, dst: str):
+        if Downloader.__reflink_file(src, dst):
+            return
+        try:
+            os.link(src, dst)
+        except OSError:  # Different file systems or no support for hard links
+            shutil.copy2(src, dst)
+
+    @staticmethod
+    def __reflink_file(src: str, dst: str) -> bool:
+        if fcntl is None:
+            return False
+        try:
+            with open(src, 'rb') as source_file, open(dst, 'wb') as destination_file:
+                fcntl.ioctl(destination_file.fileno(), FICLONE, source_file.fileno())
+        except OSError:
+            if os.path.exists(dst):
+                os.remove(dst)
+            return False
+        shutil.copystat(src, dst)
+        return True
+
+    @staticmethod
+    def extract_dataset(absolute_path_to_folder: Path, dataset_filename: Union[str, Path], number_of_threads: int = 1,
+                        include: Optional[List[str]] = None, exclude: Optional[List[str]] = None):
+        """ Extracts a downloaded .zip or .tar.gz archive, see :class:`ArchiveExtractor` for details.
+
+        :param absolute_path_to_folder: The directory, where the archive should be extracted into
+        :param dataset_filename: The path to the archive
+        :param number_of_threads: The number of threads that are used for extracting zip archives
+        :param include: Optional glob patterns of archive members that should be extracted
+        :param exclude: Optional glob patterns of archive members that should not be extracted
+        """
+        ArchiveExtractor.extract(dataset_filename, absolute_path_to_folder, number_of_threads, include, exclude)
+
+        Downloader.__remove_macos_system_directory(Path(absolute_path_to_folder))
 
+    @staticmethod
+    def __remove_macos_system_directory(absolute_path_to_folder: Path):
         macos_system_directory = absolute_path_to_folder / "__MACOSX"
         if macos_system_directory.exists():
             # This pesky directory breaks the tests on MacOS machines after unzipping
@@ -181,8 +498,29 @@ class Downloader:
         shutil.rmtree(temp_directory, ignore_errors=True)
 
     @staticmethod
-    def download_file(url, destination_filename=None) -> Path:
-        u = urllib2.urlopen(url)
+    def download_file(url, destination_filename=None, number_of_connections: int = 1,
+                      chunk_size: int = 16 * 1024 * 1024, hash_object=None,
+                      bandwidth_limiter: Optional[BandwidthLimiter] = None) -> Path:
+        """ Downloads a file from the given url.
+
+        The file is first downloaded into a ``.part`` file next to the destination, accompanied by a small
+        ``.part.json`` checkpoint that records which byte ranges have already been written. If the download gets
+        interrupted, calling this method again continues where the previous attempt stopped by using range requests.
+        The destination file only appears, once the download has completed, by renaming the ``.part`` file.
+
+        :param url: The url of the file that should be downloaded
+        :param destination_filename: The optional path, where the file should be stored. If omitted, the name of the
+                                     file will be derived from the url
+        :param number_of_connections: The number of connections that are used concurrently. If larger than one and
+                                      the server supports range requests, the file is split into byte ranges of
+                                      ``chunk_size`` that are fetched at the same time into a preallocated file.
+                                      Otherwise, the file is downloaded in a single stream.
+        :param chunk_size: The size of the byte ranges in bytes, if multiple connections are used
+        :param hash_object: An optional hash object from hashlib, that will be updated with the content of the file
+                            while it is being downloaded, to avoid a second pass over large files
+        :param bandwidth_limiter: An optional limiter for the combined throughput of all connections
+        :return: The path to the downloaded file
+        """
         scheme, netloc, path, query, fragment = urlparse.urlsplit(url)
         filename = os.path.basename(path)
         if not filename:
@@ -192,28 +530,195 @@ class Downloader:
 
         filename = Path(filename)
         filename.parent.mkdir(parents=True, exist_ok=True)
+        part_filename = filename.with_name(filename.name + ".part")
+        checkpoint_path = filename.with_name(filename.name + ".part.json")
+
+        file_size = None
+        if number_of_connections > 1:
+            resolved_url, file_size = Downloader.__probe_range_support(url)
+
+        checkpoint = DownloadCheckpoint.load(checkpoint_path, url, file_size)
+        if not part_filename.exists():
+            checkpoint.reset()
+        elif checkpoint.completed_bytes() > 0:
+            print("Resuming download of {0} after {1} bytes".format(filename, checkpoint.completed_bytes()))
+
+        if file_size is not None:
+            print("Downloading: {0} Bytes: {1} into {2} with {3} connections".format(url, file_size, filename,
+                                                                                     number_of_connections))
+            Downloader.__download_file_in_ranges(resolved_url, part_filename, file_size, number_of_connections,
+                                                 chunk_size, checkpoint, hash_object, bandwidth_limiter)
+        else:
+            Downloader.__download_file_in_single_stream(url, part_filename, checkpoint, hash_object,
+                                                        bandwidth_limiter)
+
+        os.replace(part_filename, filename)
+        checkpoint.delete()
+        return filename
+
+    @staticmethod
+    def __download_file_in_single_stream(url, filename: Path, checkpoint: DownloadCheckpoint, hash_object,
+                                         bandwidth_limiter: Optional[BandwidthLimiter] = None):
+        u, resume_position, file_size = Downloader.__open_stream_at_checkpoint(url, checkpoint)
+
+        # The part that was downloaded in a previous attempt has to be hashed before the new bytes
+        ContiguousPrefixHasher(filename, hash_object).update(resume_position)
+
+        with u, open(filename, 'r+b' if resume_position > 0 else 'wb') as f:
+            f.seek(resume_position)
+            f.truncate()
+            print("Downloading: {0} Bytes: {1} into {2}".format(url, file_size, filename))
+
+            with tqdm(total=file_size, initial=resume_position, desc="Downloading (bytes)") as progress_bar:
+                file_size_dl = Downloader.__copy_stream_to_file(u, f, resume_position, file_size, checkpoint,
+                                                                hash_object, progress_bar, bandwidth_limiter)
+                if file_size is not None and file_size_dl != file_size:
+                    raise Exception("Received {0} bytes instead of {1} bytes of {2}"
+                                    .format(file_size_dl, file_size, url))
+            print()
+
+    @staticmethod
+    def __open_stream_at_checkpoint(url, checkpoint: DownloadCheckpoint) -> tuple:
+        """ Requests the file from the end of the contiguous prefix, that was downloaded in previous attempts, and
+        starts over, if the server ignores the range request or the file changed on the server in the meantime.
+
+        :return: The response, the position in the file from which the response starts and the size of the entire file
+                 or None, if the server does not send it
+        """
+        while True:
+            resume_position = checkpoint.completed_prefix()
+            request = urllib2.Request(url)
+            if resume_position > 0:
+                request.add_header("Range", "bytes={0}-".format(resume_position))
+            u = urllib2.urlopen(request)
+
+            if resume_position > 0 and u.status != 206:
+                # The server ignored the range request and sends the entire file again
+                resume_position = 0
+                checkpoint.reset()
 
-        with open(filename, 'wb') as f:
             meta = u.info()
             meta_func = meta.getheaders if hasattr(meta, 'getheaders') else meta.get_all
             meta_length = meta_func("Content-Length")
             file_size = None
             if meta_length:
-                file_size = int(meta_length[0])
-            print("Downloading: {0} Bytes: {1} into {2}".format(url, file_size, filename))
+                file_size = int(meta_length[0]) + resume_position
 
-            with tqdm(total=file_size, desc="Downloading (bytes)") as progress_bar:
-                file_size_dl = 0
-                block_sz = 8192
-                while True:
-                    buffer = u.read(block_sz)
-                    if not buffer:
-                        break
+            if resume_position > 0 and checkpoint.file_size is not None and file_size != checkpoint.file_size:
+                # The file changed on the server since the last attempt, so we have to start over
+                u.close()
+                checkpoint.reset()
+                continue
 
-                    file_size_dl += len(buffer)
-                    f.write(buffer)
-                    if file_size:
-                        progress_bar.update(len(buffer))
-            print()
+            checkpoint.file_size = file_size
+            return u, resume_position, file_size
 
-        return filename
+    @staticmethod
+    def __copy_stream_to_file(u, f, resume_position: int, file_size: Optional[int], checkpoint: DownloadCheckpoint,
+                              hash_object, progress_bar: tqdm, bandwidth_limiter: Optional[BandwidthLimiter]) -> int:
+        """ Writes the response into the file and records the written bytes in the checkpoint regularly and once more,
+        if the connection was closed before the entire file was sent, so the next attempt can resume from there.
+
+        :return: The number of bytes of the file, that were written in total
+        """
+        file_size_dl = resume_position
+        checkpointed_size = resume_position
+        block_sz = 8192
+        checkpoint_interval = 8 * 1024 * 1024
+        while True:
+            buffer = u.read(block_sz)
+            if not buffer:
+                break
+
+            file_size_dl += len(buffer)
+            f.write(buffer)
+            if hash_object is not None:
+                hash_object.update(buffer)
+            if file_size:
+                progress_bar.update(len(buffer))
+            if bandwidth_limiter is not None:
+                bandwidth_limiter.consume(len(buffer))
+
+            if file_size_dl - checkpointed_size >= checkpoint_interval:
+                # Only record bytes that actually made it into the file
+                f.flush()
+                checkpoint.add_completed_range(checkpointed_size, file_size_dl)
+                checkpointed_size = file_size_dl
+
+        if file_size is not None and file_size_dl != file_size and file_size_dl > checkpointed_size:
+            # Keep what was received of a truncated download
+            f.flush()
+            checkpoint.add_completed_range(checkpointed_size, file_size_dl)
+        return file_size_dl
+
+    @staticmethod
+    def __probe_range_support(url) -> Tuple[str, Optional[int]]:
+        """ Requests the first byte of the file to find out whether the server supports range requests.
+
+        :return: The url after following all redirects and the total size of the file in bytes or None, if the
+                 server does not advertise support for range requests
+        """
+        request = urllib2.Request(url, headers={"Range": "bytes=0-0"})
+        with urllib2.urlopen(request) as response:
+            resolved_url = response.geturl()
+            accept_ranges = response.headers.get("Accept-Ranges", "none").lower()
+            content_range = response.headers.get("Content-Range", "")
+            if response.status != 206 or accept_ranges == "none" or "/" not in content_range:
+                return resolved_url, None
+
+            total_size = content_range.split("/")[-1]
+            if not total_size.isdigit():
+                return resolved_url, None
+            return resolved_url, int(total_size)
+
+    @staticmethod
+    def __download_file_in_ranges(url, filename: Path, file_size: int, number_of_connections: int,
+                                  chunk_size: int, checkpoint: DownloadCheckpoint, hash_object,
+                                  bandwidth_limiter: Optional[BandwidthLimiter]):
+        with open(filename, 'r+b' if filename.exists() else 'wb') as f:
+            f.truncate(file_size)  # Preallocate the file, so every range can be written at its own position
+
+        byte_ranges = [(start, min(start + chunk_size, file_size) - 1) for start in range(0, file_size, chunk_size)]
+        pending_byte_ranges = [(start, end) for start, end in byte_ranges
+                               if not checkpoint.is_completed(start, end + 1)]
+        already_downloaded = file_size - sum(end - start + 1 for start, end in pending_byte_ranges)
+        hasher = ContiguousPrefixHasher(filename, hash_object)
+
+        with tqdm(total=file_size, initial=already_downloaded, desc="Downloading (bytes)") as progress_bar:
+            with ThreadPoolExecutor(max_workers=number_of_connections) as executor:
+                futures = [executor.submit(Downloader.__download_range, url, filename, start, end, progress_bar,
+                                           checkpoint, hasher, bandwidth_limiter)
+                           for start, end in pending_byte_ranges]
+                for future in as_completed(futures):
+                    future.result()
+
+        hasher.update(file_size)
+
+    @staticmethod
+    def __download_range(url, filename: Path, start: int, end: int, progress_bar: tqdm,
+                         checkpoint: DownloadCheckpoint, hasher: ContiguousPrefixHasher,
+                         bandwidth_limiter: Optional[BandwidthLimiter]):
+        request = urllib2.Request(url, headers={"Range": "bytes={0}-{1}".format(start, end)})
+        with urllib2.urlopen(request) as response, open(filename, 'r+b') as f:
+            if response.status != 206:
+                raise Exception(f"Server ignored the range request for bytes {start}-{end} of {url}")
+
+            f.seek(start)
+            received_bytes = 0
+            block_sz = 65536
+            while True:
+                buffer = response.read(block_sz)
+                if not buffer:
+                    break
+
+                received_bytes += len(buffer)
+                f.write(buffer)
+                progress_bar.update(len(buffer))
+                if bandwidth_limiter is not None:
+                    bandwidth_limiter.consume(len(buffer))
+
+        if received_bytes != end - start + 1:
+            raise Exception(f"Received {received_bytes} bytes instead of {end - start + 1} bytes for the range "
+                            f"{start}-{end} of {url}")
+        checkpoint.add_completed_range(start, end + 1)
+        hasher.update(checkpoint.completed_prefix())
@@ -0,0 +1,146 @@
+import http.client
+import os
+import threading
+import time
+import urllib.parse as urlparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import List, Tuple, Optional, Union
+
+from tqdm import tqdm
+
+
+class RateLimiter:
+    """ An internal helper class that spaces out requests of multiple threads, so that no more than the given
+        number of requests per second are started. """
+
+    def __init__(self, requests_per_second: Optional[float]) -> None:
+        super().__init__()
+        self.interval = 1.0 / requests_per_second if requests_per_second else 0.0
+        self.next_request_time = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self) -> None:
+        if self.interval == 0.0:
+            return
+
+        with self.lock:
+            now = time.monotonic()
+            request_time = max(now, self.next_request_time)
+            self.next_request_time = request_time + self.interval
+        if request_time > now:
+            time.sleep(request_time - now)
+
+
+class EdiromImageCrawler:
+    """ Downloads many small files, such as the pages of the Edirom datasets, from the same server concurrently.
+
+        A bounded pool of workers fetches the files, where each worker keeps its HTTP connection to the server
+        alive and reuses it for all of its requests, instead of opening a new connection per file. The requests of
+        all workers can be limited to a number of requests per second to go easy on the server. Failed requests are
+        retried with exponential backoff and files that are already present are skipped, so an interrupted crawl can
+        simply be started again.
+    """
+
+    def __init__(self, number_of_workers: int = 8, requests_per_second: Optional[float] = None,
+                 maximum_retries: int = 3, backoff_factor: float = 1.0, timeout: float = 60.0) -> None:
+        """
+        :param number_of_workers: The number of files that are downloaded concurrently
+        :param requests_per_second: The optional maximum number of requests per second across all workers
+        :param maximum_retries: How often a failed request is retried, before the crawl is aborted
+        :param backoff_factor: The waiting time before the n-th retry is backoff_factor * 2 ^ (n-1) seconds
+        :param timeout: The timeout of a single request in seconds
+        """
+        super().__init__()
+        self.number_of_workers = number_of_workers
+        self.rate_limiter = RateLimiter(requests_per_second)
+        self.maximum_retries = maximum_retries
+        self.backoff_factor = backoff_factor
+        self.timeout = timeout
+        self.thread_local = threading.local()
+        self.open_connections = []  # type: List[http.client.HTTPConnection]
+        self.open_connections_lock = threading.Lock()
+
+    def crawl(self, downloads: List[Tuple[str, Union[str, Path]]]) -> int:
+        """
+        Downloads all files that are not yet present
+
+        :param downloads: A list of pairs of the url and the path where the file should be stored
+        :return: The number of files that were downloaded
+        """
+        pending_downloads = [(url, Path(destination)) for url, destination in downloads
+                             if not os.path.exists(destination)]
+
+        try:
+            with tqdm(total=len(downloads), initial=len(downloads) - len(pending_downloads),
+                      desc="Downloading images") as progress_bar:
+                with ThreadPoolExecutor(max_workers=self.number_of_workers) as executor:
+                    futures = [executor.submit(self.__download_with_retries, url, destination)
+                               for url, destination in pending_downloads]
+                    for future in as_completed(futures):
+                        future.result()
+                        progress_bar.update(1)
+        finally:
+            self.__close_connections()
+
+        return len(pending_downloads)
+
+    def __download_with_retries(self, url: str, destination: Path):
+        for attempt in range(self.maximum_retries + 1):
+            try:
+                self.__download(url, destination)
+                return
+            except (OSError, http.client.HTTPException) as exception:
+                self.__reset_connection(url)
+                if attempt == self.maximum_retries:
+                    raise Exception(f"Could not download {url} after {attempt + 1} attempts") from exception
+                time.sleep(self.backoff_factor * (2 ** attempt))
+
+    def __download(self, url: str, destination: Path, remaining_redirects: int = 5):
+        scheme, netloc, path, query, fragment = urlparse.urlsplit(url)
+        self.rate_limiter.wait()
+        connection = self.__get_connection(scheme, netloc)
+        connection.request("GET", path + ("?" + query if query else ""))
+        response = connection.getresponse()
+        content = response.read()  # Always read the full body, otherwise the connection can not be reused
+
+        if response.status in (301, 302, 303, 307, 308) and remaining_redirects > 0:
+            redirect_url = urlparse.urljoin(url, response.getheader("Location"))
+            return self.__download(redirect_url, destination, remaining_redirects - 1)
+        if response.status == 429 or response.status >= 500:
+            # Temporary problems of the server, that are worth retrying
+            raise http.client.HTTPException(f"Server responded with {response.status} {response.reason} for {url}")
+        if response.status != 200:
+            raise Exception(f"Server responded with {response.status} {response.reason} for {url}")
+
+        # Write into a temporary file first, so an interrupted crawl never leaves a truncated image behind
+        temporary_destination = destination.with_name(destination.name + ".part")
+        with open(temporary_destination, 'wb') as f:
+            f.write(content)
+        os.replace(temporary_destination, destination)
+
+    def __get_connection(self, scheme: str, netloc: str) -> http.client.HTTPConnection:
+        connections = self.thread_local.__dict__.setdefault("connections", dict())
+        if (scheme, netloc) not in connections:
+            if scheme == "https":
+                connection = http.client.HTTPSConnection(netloc, timeout=self.timeout)
+            else:
+                connection = http.client.HTTPConnection(netloc, timeout=self.timeout)
+            connections[(scheme, netloc)] = connection
+            with self.open_connections_lock:
+                self.open_connections.append(connection)
+        return connections[(scheme, netloc)]
+
+    def __reset_connection(self, url: str):
+        scheme, netloc, path, query, fragment = urlparse.urlsplit(url)
+        connections = self.thread_local.__dict__.get("connections", dict())
+        connection = connections.pop((scheme, netloc), None)
+        if connection is not None:
+            connection.close()
+
+    def __close_connections(self):
+        with self.open_connections_lock:
+            for connection in self.open_connections:
+                connection.close()
+            self.open_connections = []
+        self.thread_local = threading.local()
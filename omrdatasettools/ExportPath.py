@@ -1,12 +1,27 @@
 import os
 
+from PIL import Image
+
+from omrdatasettools.Point2D import Point2D
+from omrdatasettools.Rectangle import Rectangle
+
 
 class ExportPath:
     """ An internal helper class to automatically build path names when generating images from annotations with variations """
 
     def __init__(self, destination_directory: str, symbol_class: str, raw_file_name_without_extension: str,
-                 extension: str = "png", stroke_thickness: int = None) -> None:
+                 extension: str = "png", stroke_thickness: int = None, image_mode: str = None,
+                 compress_level: int = None) -> None:
+        """
+        :param image_mode: The optional mode, into which images are converted before saving them, e.g. 'RGB', 'L' for
+                           grayscale or '1' for black-and-white images, that are stored with one bit per pixel.
+                           If None is provided, images are saved in the mode they were created in
+        :param compress_level: The optional PNG compression level from 0 (no compression) to 9 (best compression).
+                               If None is provided, the default of Pillow is used
+        """
         super().__init__()
+        self.compress_level = compress_level
+        self.image_mode = image_mode
         self.stroke_thickness = stroke_thickness
         self.extension = extension
         self.raw_file_name_without_extension = raw_file_name_without_extension
@@ -44,3 +59,50 @@ class ExportPath:
         return os.path.join(self.symbol_class, "{0}_{1}{2}.{3}".format(self.raw_file_name_without_extension,
                                                                        self.stroke_thickness, staffline_offset,
                                                                        self.extension))
+
+    def save(self, image: Image.Image, offset: int = None, writer=None, bounding_box: Rectangle = None) -> None:
+        """
+        Converts the image into the image mode of this path and saves it at the full path for the given offset
+
+        :param image: The image that should be saved
+        :param offset: The optional staff-line offset, see :meth:`get_full_path`
+        :param writer: The optional :class:`ImageWriter`, that writes the image together with the metadata of
+                       :meth:`get_metadata`. If None is provided, the image is saved directly
+        :param bounding_box: The optional bounding-box of the symbol within the image. If None is provided, the
+                             symbol is assumed to fill the whole image
+        """
+        converted_image = self.convert(image)
+        save_options = {}
+        if self.compress_level is not None:
+            save_options["compress_level"] = self.compress_level
+
+        if writer is None:
+            converted_image.save(self.get_full_path(offset), **save_options)
+        else:
+            if bounding_box is None:
+                bounding_box = Rectangle(Point2D(0, 0), image.width, image.height)
+            writer.write(converted_image, self.get_full_path(offset), self.get_metadata(offset, bounding_box),
+                         **save_options)
+
+        if converted_image is not image:
+            converted_image.close()
+
+    def get_metadata(self, offset: int, bounding_box: Rectangle) -> dict:
+        """
+        :return: The symbol class, the source id (the raw file name), the stroke thickness and the staff-line offset,
+                 that the image was generated with, as well as the bounding-box of the symbol within the image as
+                 left, top, right and bottom
+        """
+        return {"class": self.symbol_class,
+                "source_id": self.raw_file_name_without_extension,
+                "stroke_thickness": self.stroke_thickness,
+                "offset": offset,
+                "bounding_box": [bounding_box.left, bounding_box.top, bounding_box.right, bounding_box.bottom]}
+
+    def convert(self, image: Image.Image) -> Image.Image:
+        """ Returns the image in the image mode of this path. Black-and-white images are thresholded at 50% """
+        if self.image_mode is None or image.mode == self.image_mode:
+            return image
+        if self.image_mode == "1":
+            return image.convert("L").point(lambda value: 255 if value >= 128 else 0, mode="1")
+        return image.convert(self.image_mode)
@@ -0,0 +1,219 @@
+import math
+import multiprocessing
+import random
+import traceback
+from queue import Empty
+from typing import List, Optional, Tuple, NamedTuple, Iterator
+
+import numpy
+
+from omrdatasettools.HomusImageGenerator import HomusSymbol
+
+
+class HomusAugmentationSettings(NamedTuple):
+    """ The settings of a :class:`HomusAugmentationStream`, that are shared with its background workers """
+    symbols: List[HomusSymbol]
+    canvas_width: int
+    canvas_height: int
+    stroke_thicknesses: List[int]
+    staff_line_spacing: int
+    staff_line_vertical_offsets: Optional[List[int]]
+    scale_range: Optional[Tuple[float, float]]
+    rotation_range: Optional[Tuple[float, float]]
+    jitter: float
+    random_position_on_canvas: bool
+
+
+class HomusAugmentationStream:
+    """ An endless stream of randomly augmented HOMUS samples for online training, that renders every sample on
+        demand instead of writing all combinations of stroke thicknesses and staff-line offsets to disk.
+
+        Each sample is a randomly chosen symbol that is drawn with a random stroke thickness, at a random position on
+        the canvas and with staff-lines at a random one of the given offsets. Optionally, the strokes are scaled,
+        rotated and their points jittered randomly before drawing. The images are the same as the ones of
+        :meth:`HomusImageGenerator.render_to_array`.
+
+        All random choices are derived from the seed, so the stream yields the same samples for the same seed and
+        number of workers. With workers, the samples are rendered ahead of time in background processes, each with
+        its own generator, and the stream takes turns in reading from them.
+
+        Examples
+        --------
+        >>> symbols = HomusImageGenerator.load_symbols("data/homus_raw")
+        >>> with HomusAugmentationStream(symbols, 96, 192, staff_line_vertical_offsets=list(range(60, 100)),
+        >>>                              rotation_range=(-10, 10), seed=42, number_of_workers=4) as stream:
+        >>>     images, labels, bounding_boxes = stream.next_batch(64)
+    """
+
+    def __init__(self, symbols: List[HomusSymbol], canvas_width: int, canvas_height: int,
+                 stroke_thicknesses: List[int] = (1, 2, 3, 4), staff_line_spacing: int = 14,
+                 staff_line_vertical_offsets: Optional[List[int]] = None,
+                 scale_range: Optional[Tuple[float, float]] = None,
+                 rotation_range: Optional[Tuple[float, float]] = None, jitter: float = 0.0,
+                 random_position_on_canvas: bool = True, seed: Optional[int] = None, number_of_workers: int = 0,
+                 prefetch: int = 64) -> None:
+        """
+        :param symbols: The symbols that the samples are drawn from, see :meth:`HomusImageGenerator.load_symbols`
+        :param canvas_width: The width of the rendered images
+        :param canvas_height: The height of the rendered images
+        :param stroke_thicknesses: The stroke thicknesses in pixels, that are randomly chosen from
+        :param staff_line_spacing: Number of pixels spacing between each of the five staff-lines
+        :param staff_line_vertical_offsets: The vertical offsets of the staff-lines, that are randomly chosen from.
+                                            If None is provided, no staff-lines are drawn
+        :param scale_range: The optional minimum and maximum factor, by which the symbol is randomly scaled
+        :param rotation_range: The optional minimum and maximum angle in degrees, by which the symbol is randomly
+                               rotated around its center
+        :param jitter: The standard deviation in pixels of the random noise, that is added to each point
+        :param random_position_on_canvas: True, if the symbols should be randomly placed on the canvas, False to
+                                          center them
+        :param seed: The optional seed of the stream. If None is provided, the seed is drawn from the global random
+                     module
+        :param number_of_workers: The number of background processes that render samples. If zero, samples are
+                                  rendered when they are requested
+        :param prefetch: The number of samples, that each worker renders ahead of time
+        """
+        super().__init__()
+        if seed is None:
+            seed = random.randrange(2 ** 32)
+
+        self.settings = HomusAugmentationSettings(symbols, canvas_width, canvas_height, list(stroke_thicknesses),
+                                                  staff_line_spacing, staff_line_vertical_offsets, scale_range,
+                                                  rotation_range, jitter, random_position_on_canvas)
+        self.workers = []
+        self.queues = []
+        self.next_queue = 0
+        self.samples = None  # type: Optional[Iterator]
+
+        if number_of_workers <= 0:
+            self.samples = HomusAugmentationStream.generate_samples(self.settings, numpy.random.SeedSequence(seed))
+            return
+
+        context = multiprocessing.get_context()
+        for seed_sequence in numpy.random.SeedSequence(seed).spawn(number_of_workers):
+            queue = context.Queue(maxsize=prefetch)
+            worker = context.Process(target=HomusAugmentationStream.produce_samples,
+                                     args=(self.settings, seed_sequence, queue), daemon=True)
+            worker.start()
+            self.queues.append(queue)
+            self.workers.append(worker)
+
+    def __iter__(self) -> 'HomusAugmentationStream':
+        return self
+
+    def __next__(self) -> Tuple[numpy.ndarray, str, numpy.ndarray]:
+        """
+        :return: The image as uint8 array of shape (canvas_height, canvas_width), the symbol class and the
+                 bounding-box of the symbol as float32 array with left, top, right and bottom
+        """
+        if self.samples is not None:
+            return next(self.samples)
+
+        queue = self.queues[self.next_queue]
+        worker = self.workers[self.next_queue]
+        self.next_queue = (self.next_queue + 1) % len(self.queues)
+        while True:
+            try:
+                sample = queue.get(timeout=1)
+            except Empty:
+                # A worker that was killed, e.g. by running out of memory, would otherwise block the stream forever
+                if not worker.is_alive():
+                    raise Exception("The worker {0} of the augmentation stream stopped unexpectedly with exit code {1}"
+                                    .format(worker.name, worker.exitcode))
+                continue
+            if isinstance(sample, Exception):
+                raise sample
+            return sample
+
+    def next_batch(self, batch_size: int) -> Tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]:
+        """
+        :return: The images as uint8 array of shape (batch_size, canvas_height, canvas_width), the symbol classes as
+                 array of shape (batch_size,) and the bounding-boxes as float32 array of shape (batch_size, 4)
+        """
+        samples = [next(self) for _ in range(batch_size)]
+        return (numpy.stack([image for image, label, bounding_box in samples]),
+                numpy.array([label for image, label, bounding_box in samples], dtype=str),
+                numpy.stack([bounding_box for image, label, bounding_box in samples]))
+
+    def close(self) -> None:
+        """ Stops the background workers """
+        for worker in self.workers:
+            worker.terminate()
+        for worker in self.workers:
+            worker.join()
+        for queue in self.queues:
+            queue.close()
+        self.workers = []
+        self.queues = []
+
+    def __enter__(self) -> 'HomusAugmentationStream':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    @staticmethod
+    def produce_samples(settings: HomusAugmentationSettings, seed_sequence: numpy.random.SeedSequence,
+                        queue: multiprocessing.Queue) -> None:
+        """ The main loop of the background workers, that puts rendered samples into the queue forever. If rendering
+            fails, the error is put into the queue instead, so the stream can raise it in the main process. """
+        try:
+            for sample in HomusAugmentationStream.generate_samples(settings, seed_sequence):
+                queue.put(sample)
+        except Exception:
+            queue.put(Exception("A worker of the augmentation stream failed:\n" + traceback.format_exc()))
+
+    @staticmethod
+    def generate_samples(settings: HomusAugmentationSettings, seed_sequence: numpy.random.SeedSequence
+                         ) -> Iterator[Tuple[numpy.ndarray, str, numpy.ndarray]]:
+        """ Renders randomly augmented samples forever """
+        random_generator = numpy.random.default_rng(seed_sequence)
+        while True:
+            symbol = settings.symbols[random_generator.integers(len(settings.symbols))]
+            symbol = HomusAugmentationStream.augment(symbol, random_generator, settings.scale_range,
+                                                     settings.rotation_range, settings.jitter)
+            stroke_thickness = int(random_generator.choice(settings.stroke_thicknesses))
+            staff_line_vertical_offsets = None
+            if settings.staff_line_vertical_offsets:
+                staff_line_vertical_offsets = [int(random_generator.choice(settings.staff_line_vertical_offsets))]
+
+            # The position on the canvas is chosen by the random module, just like in HomusImageGenerator
+            position_generator = random.Random(int(random_generator.integers(2 ** 63)))
+            images, bounding_box = symbol.render_onto_canvas(stroke_thickness, 0, settings.canvas_width,
+                                                             settings.canvas_height, settings.staff_line_spacing,
+                                                             staff_line_vertical_offsets,
+                                                             settings.random_position_on_canvas, position_generator,
+                                                             mode="L")
+            image = numpy.asarray(images[0]).copy()
+            images[0].close()
+            yield image, symbol.symbol_class, numpy.array([bounding_box.left, bounding_box.top, bounding_box.right,
+                                                           bounding_box.bottom], dtype=numpy.float32)
+
+    @staticmethod
+    def augment(symbol: HomusSymbol, random_generator: numpy.random.Generator,
+                scale_range: Optional[Tuple[float, float]] = None,
+                rotation_range: Optional[Tuple[float, float]] = None, jitter: float = 0.0) -> HomusSymbol:
+        """
+        Returns a copy of the symbol, whose points are randomly scaled and rotated around the center of the symbol
+        and jittered with gaussian noise. Returns the symbol itself, if no augmentation is requested.
+        """
+        if scale_range is None and rotation_range is None and jitter <= 0:
+            return symbol
+
+        coordinates = symbol.coordinates.astype(numpy.float64)
+        center = numpy.array([symbol.dimensions.origin.x + (symbol.dimensions.width - 1) / 2,
+                              symbol.dimensions.origin.y + (symbol.dimensions.height - 1) / 2])
+        transformation = numpy.eye(2)
+        if scale_range is not None:
+            transformation *= random_generator.uniform(scale_range[0], scale_range[1])
+        if rotation_range is not None:
+            angle = math.radians(random_generator.uniform(rotation_range[0], rotation_range[1]))
+            rotation = numpy.array([[math.cos(angle), -math.sin(angle)], [math.sin(angle), math.cos(angle)]])
+            transformation = rotation @ transformation
+
+        coordinates = (coordinates - center) @ transformation.T + center
+        if jitter > 0:
+            coordinates += random_generator.normal(0, jitter, coordinates.shape)
+
+        coordinates = numpy.round(coordinates).astype(numpy.int16)
+        return HomusSymbol(symbol.content, coordinates, symbol.symbol_class, HomusSymbol.get_bounding_box(coordinates),
+                           symbol.stroke_offsets)
@@ -1,25 +1,61 @@
 import argparse
 import os
 import random
-import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import lru_cache
 from glob import glob
-from typing import List
+from typing import List, Union, Optional, Tuple, Iterator
 
+import numpy
 from PIL import Image, ImageDraw
 from tqdm import tqdm
 
+from omrdatasettools.ArchiveDataset import ArchiveDataset
+from omrdatasettools.BuildManifest import BuildManifest
 from omrdatasettools.Point2D import Point2D
 from omrdatasettools.ExportPath import ExportPath
+from omrdatasettools.ImageWriter import ImageWriter
 from omrdatasettools.Rectangle import Rectangle
+from omrdatasettools.ShardedImageWriter import ShardedImageWriter
+from omrdatasettools.StrokeRasterizer import StrokeRasterizer
 
 
 class HomusSymbol:
-    def __init__(self, content: str, strokes: List[List[Point2D]], symbol_class: str, dimensions: Rectangle) -> None:
+    """ A handwritten symbol of the HOMUS dataset. The points of all strokes are stored in a single int16 array of
+        shape (number_of_points, 2) with x and y in its columns. The i-th stroke consists of the points
+        ``coordinates[stroke_offsets[i]:stroke_offsets[i + 1]]``.
+    """
+
+    def __init__(self, content: str, strokes: Union[List[List[Point2D]], numpy.ndarray], symbol_class: str,
+                 dimensions: Rectangle, stroke_offsets: numpy.ndarray = None) -> None:
+        """
+        :param content: The content of the symbol as read from the text-file
+        :param strokes: Either the strokes as lists of points or the coordinates of all points as an array of shape
+                        (number_of_points, 2), in which case the stroke_offsets have to be provided as well
+        :param symbol_class: The name of the symbol class
+        :param dimensions: The bounding box of the symbol
+        :param stroke_offsets: The index of the first point of each stroke, followed by the total number of points
+        """
         super().__init__()
         self.dimensions = dimensions
         self.symbol_class = symbol_class
         self.content = content
-        self.strokes = strokes
+        if stroke_offsets is None:
+            self.coordinates = numpy.array([(point.x, point.y) for stroke in strokes for point in stroke],
+                                           dtype=numpy.int16).reshape(-1, 2)
+            self.stroke_offsets = numpy.cumsum([0] + [len(stroke) for stroke in strokes], dtype=numpy.int32)
+        else:
+            self.coordinates = strokes
+            self.stroke_offsets = stroke_offsets
+
+    @property
+    def strokes(self) -> List[List[Point2D]]:
+        """ The strokes of the symbol as lists of points, created on demand from the coordinates """
+        return [[Point2D(x, y) for x, y in stroke.tolist()] for stroke in self.get_stroke_arrays()]
+
+    def get_stroke_arrays(self) -> List[numpy.ndarray]:
+        """ Returns the strokes of the symbol as views into the coordinates of shape (number_of_points, 2) """
+        return [self.coordinates[start:end] for start, end in zip(self.stroke_offsets[:-1], self.stroke_offsets[1:])]
 
     @staticmethod
     def initialize_from_string(content: str) -> 'HomusSymbol':
@@ -35,54 +71,50 @@ class HomusSymbol:
             return None
 
         lines = content.splitlines()
-        min_x = sys.maxsize
-        max_x = 0
-        min_y = sys.maxsize
-        max_y = 0
-
         symbol_name = lines[0]
-        strokes = []
+        stroke_strings = lines[1:]
 
-        for stroke_string in lines[1:]:
-            stroke = []
+        # Each point is written as x,y; so the number of commas is the number of points in a stroke
+        stroke_offsets = numpy.cumsum([0] + [stroke_string.count(",") for stroke_string in stroke_strings],
+                                      dtype=numpy.int32)
+        numbers = " ".join(stroke_strings).replace(";", " ").replace(",", " ")
+        coordinates = numpy.fromstring(numbers, dtype=numpy.int16, sep=" ").reshape(-1, 2)
 
-            for point_string in stroke_string.split(";"):
-                if point_string == "":
-                    continue  # Skip the last element, that is due to a trailing ; in each line
+        dimensions = HomusSymbol.get_bounding_box(coordinates)
+        return HomusSymbol(content, coordinates, symbol_name, dimensions, stroke_offsets)
 
-                point_x, point_y = point_string.split(",")
-                x = int(point_x)
-                y = int(point_y)
-                stroke.append(Point2D(x, y))
-
-                max_x = max(max_x, x)
-                min_x = min(min_x, x)
-                max_y = max(max_y, y)
-                min_y = min(min_y, y)
-
-            strokes.append(stroke)
+    @staticmethod
+    def get_bounding_box(coordinates: numpy.ndarray) -> Rectangle:
+        """ Computes the bounding box of the points in an array of shape (number_of_points, 2) """
+        if len(coordinates) == 0:
+            return Rectangle(Point2D(0, 0), 0, 0)
 
-        dimensions = Rectangle(Point2D(min_x, min_y), max_x - min_x + 1, max_y - min_y + 1)
-        return HomusSymbol(content, strokes, symbol_name, dimensions)
+        min_x, min_y = coordinates.min(axis=0).tolist()
+        max_x, max_y = coordinates.max(axis=0).tolist()
+        return Rectangle(Point2D(min_x, min_y), max_x - min_x + 1, max_y - min_y + 1)
 
-    def draw_into_bitmap(self, export_path: ExportPath, stroke_thickness: int, margin: int = 0) -> None:
+    def draw_into_bitmap(self, export_path: ExportPath, stroke_thickness: int, margin: int = 0,
+                         writer: ImageWriter = None) -> None:
         """
         Draws the symbol in the original size that it has plus an optional margin
 
         :param export_path: The path, where the symbols should be created on disk
         :param stroke_thickness: Pen-thickness for drawing the symbol in pixels
         :param margin: An optional margin for each symbol
+        :param writer: The optional writer that stores the image. If None is provided, the image is saved directly
         """
         self.draw_onto_canvas(export_path,
                               stroke_thickness,
                               margin,
                               self.dimensions.width + 2 * margin,
-                              self.dimensions.height + 2 * margin)
+                              self.dimensions.height + 2 * margin,
+                              writer=writer)
 
     def draw_onto_canvas(self, export_path: ExportPath, stroke_thickness: int, margin: int, destination_width: int,
                          destination_height: int, staff_line_spacing: int = 14,
                          staff_line_vertical_offsets: List[int] = None,
-                         bounding_boxes: dict = None, random_position_on_canvas: bool = False) -> None:
+                         bounding_boxes: dict = None, random_position_on_canvas: bool = False,
+                         random_generator: random.Random = None, writer: ImageWriter = None) -> None:
         """
         Draws the symbol onto a canvas with a fixed size
 
@@ -95,46 +127,20 @@ class HomusSymbol:
         :param staff_line_spacing:
         :param staff_line_vertical_offsets: Offsets used for drawing staff-lines. If None provided,
             no staff-lines will be drawn if multiple integers are provided, multiple images will be generated
+        :param random_generator: The optional random number generator for the random position on the canvas.
+            If None is provided, the global generator of the random module is used.
+        :param writer: The optional writer that stores the images. If None is provided, the images are saved directly
         """
-        width = self.dimensions.width + 2 * margin
-        height = self.dimensions.height + 2 * margin
-        if random_position_on_canvas:
-            # max is required for elements that are larger than the canvas,
-            # where the possible range for the random value would be negative
-            random_horizontal_offset = random.randint(0, max(0, destination_width - width))
-            random_vertical_offset = random.randint(0, max(0, destination_height - height))
-            offset = Point2D(self.dimensions.origin.x - margin - random_horizontal_offset,
-                             self.dimensions.origin.y - margin - random_vertical_offset)
-        else:
-            width_offset_for_centering = (destination_width - width) / 2
-            height_offset_for_centering = (destination_height - height) / 2
-            offset = Point2D(self.dimensions.origin.x - margin - width_offset_for_centering,
-                             self.dimensions.origin.y - margin - height_offset_for_centering)
-
-        image_without_staff_lines = Image.new('RGB', (destination_width, destination_height),
-                                              "white")  # create a new white image
-        draw = ImageDraw.Draw(image_without_staff_lines)
-        black = (0, 0, 0)
-
-        for stroke in self.strokes:
-            for i in range(0, len(stroke) - 1):
-                start_point = self.__subtract_offset(stroke[i], offset)
-                end_point = self.__subtract_offset(stroke[i + 1], offset)
-                draw.line((start_point.x, start_point.y, end_point.x, end_point.y), black, stroke_thickness)
-
-        location = self.__subtract_offset(self.dimensions.origin, offset)
-        bounding_box_in_image = Rectangle(location, self.dimensions.width, self.dimensions.height)
-        # self.draw_bounding_box(draw, location)
-
-        del draw
+        # Grayscale and black-and-white images are rendered in grayscale right away, instead of converting from RGB
+        mode = "L" if export_path.image_mode in ("L", "1") else "RGB"
+        images, bounding_box_in_image = self.render_onto_canvas(stroke_thickness, margin, destination_width,
+                                                                destination_height, staff_line_spacing,
+                                                                staff_line_vertical_offsets,
+                                                                random_position_on_canvas, random_generator, mode)
 
         if staff_line_vertical_offsets is not None and staff_line_vertical_offsets:
-            for staff_line_vertical_offset in staff_line_vertical_offsets:
-                image_with_staff_lines = image_without_staff_lines.copy()
-                self.__draw_staff_lines_into_image(image_with_staff_lines, stroke_thickness,
-                                                   staff_line_spacing, staff_line_vertical_offset)
-                file_name_with_offset = export_path.get_full_path(staff_line_vertical_offset)
-                image_with_staff_lines.save(file_name_with_offset)
+            for staff_line_vertical_offset, image_with_staff_lines in zip(staff_line_vertical_offsets, images):
+                export_path.save(image_with_staff_lines, staff_line_vertical_offset, writer, bounding_box_in_image)
                 image_with_staff_lines.close()
 
                 if bounding_boxes is not None:
@@ -143,14 +149,90 @@ class HomusSymbol:
                     class_and_file_name = export_path.get_class_name_and_file_path(staff_line_vertical_offset)
                     bounding_boxes[class_and_file_name] = bounding_box_in_image
         else:
-            image_without_staff_lines.save(export_path.get_full_path())
+            image_without_staff_lines = images[0]
+            export_path.save(image_without_staff_lines, writer=writer, bounding_box=bounding_box_in_image)
             if bounding_boxes is not None:
                 # Note that the ImageDatasetGenerator does not yield the full path, but only the class_name and
                 # the file_name, e.g. '3-4-Time\\1-13_3_offset_74.png', so we store only that part in the dictionary
                 class_and_file_name = export_path.get_class_name_and_file_path()
                 bounding_boxes[class_and_file_name] = bounding_box_in_image
+            image_without_staff_lines.close()
+
+    def render_onto_canvas(self, stroke_thickness: int, margin: int, destination_width: int,
+                           destination_height: int, staff_line_spacing: int = 14,
+                           staff_line_vertical_offsets: List[int] = None, random_position_on_canvas: bool = False,
+                           random_generator: random.Random = None,
+                           mode: str = "RGB", anti_aliasing: bool = False) -> Tuple[List[Image.Image], Rectangle]:
+        """
+        Renders the symbol onto a canvas with a fixed size in memory, see :meth:`draw_onto_canvas`
 
-        image_without_staff_lines.close()
+        :param mode: The mode of the rendered images, either "RGB" or "L" for grayscale
+        :param anti_aliasing: True, if the strokes should be drawn with smooth edges
+        :return: One image per staff-line offset or a single image without staff-lines, if no offsets are provided,
+                 and the bounding-box of the symbol in these images
+        """
+        offset = self.get_offset_on_canvas(margin, destination_width, destination_height, random_position_on_canvas,
+                                           random_generator)
+
+        # All strokes are drawn at once into a white grayscale canvas
+        symbol_raster = numpy.full((destination_height, destination_width), 255, dtype=numpy.uint8)
+        origin = numpy.array([offset.x, offset.y], dtype=numpy.float64)
+        StrokeRasterizer.draw_strokes(symbol_raster, [stroke - origin for stroke in self.get_stroke_arrays()],
+                                      stroke_thickness, anti_aliasing)
+
+        location = self.__subtract_offset(self.dimensions.origin, offset)
+        bounding_box_in_image = Rectangle(location, self.dimensions.width, self.dimensions.height)
+
+        if staff_line_vertical_offsets is None or not staff_line_vertical_offsets:
+            return [Image.fromarray(symbol_raster).convert(mode)], bounding_box_in_image
+
+        # Instead of drawing the staff-lines into a copy of the image for each offset, the cached staff-lines of
+        # all offsets are combined with the symbol at once: Both are black on white, so the darker pixel wins.
+        staff_lines = numpy.stack([self.get_staff_line_overlay(destination_width, destination_height,
+                                                               staff_line_spacing, stroke_thickness, offset)
+                                   for offset in staff_line_vertical_offsets])
+        rasters_with_staff_lines = numpy.minimum(symbol_raster, staff_lines)
+        images = [Image.fromarray(raster).convert(mode) for raster in rasters_with_staff_lines]
+        return images, bounding_box_in_image
+
+    def get_offset_on_canvas(self, margin: int, destination_width: int, destination_height: int,
+                             random_position_on_canvas: bool = False,
+                             random_generator: random.Random = None) -> Point2D:
+        """
+        Returns the offset, that is subtracted from all points of the symbol to place it onto the canvas, see
+        :meth:`render_onto_canvas`. Draws two random numbers from the random generator, if the symbol is placed at a
+        random position.
+        """
+        randint = random.randint if random_generator is None else random_generator.randint
+
+        width = self.dimensions.width + 2 * margin
+        height = self.dimensions.height + 2 * margin
+        if random_position_on_canvas:
+            # max is required for elements that are larger than the canvas,
+            # where the possible range for the random value would be negative
+            random_horizontal_offset = randint(0, max(0, destination_width - width))
+            random_vertical_offset = randint(0, max(0, destination_height - height))
+            return Point2D(self.dimensions.origin.x - margin - random_horizontal_offset,
+                           self.dimensions.origin.y - margin - random_vertical_offset)
+
+        width_offset_for_centering = (destination_width - width) / 2
+        height_offset_for_centering = (destination_height - height) / 2
+        return Point2D(self.dimensions.origin.x - margin - width_offset_for_centering,
+                       self.dimensions.origin.y - margin - height_offset_for_centering)
+
+    @staticmethod
+    @lru_cache(maxsize=1024)
+    def get_staff_line_overlay(width: int, height: int, staff_line_spacing: int, stroke_thickness: int,
+                               vertical_offset: int) -> numpy.ndarray:
+        """
+        Returns a cached grayscale image of five black staff-lines on white background as a read-only uint8 array
+        of shape (height, width)
+        """
+        image = Image.new("L", (width, height), "white")
+        HomusSymbol.__draw_staff_lines_into_image(image, stroke_thickness, staff_line_spacing, vertical_offset)
+        overlay = numpy.asarray(image).copy()
+        overlay.setflags(write=False)
+        return overlay
 
     def draw_bounding_box(self, draw, location):
         red = (255, 0, 0)
@@ -163,7 +245,7 @@ class HomusSymbol:
                                       stroke_thickness: int,
                                       staff_line_spacing: int = 14,
                                       vertical_offset=88):
-        black = (0, 0, 0)
+        black = HomusSymbol.__black(image)
         width = image.width
         draw = ImageDraw.Draw(image)
 
@@ -172,6 +254,10 @@ class HomusSymbol:
             draw.line((0, y, width, y), black, stroke_thickness)
         del draw
 
+    @staticmethod
+    def __black(image: Image.Image):
+        return (0, 0, 0) if image.mode == "RGB" else 0
+
     @staticmethod
     def __subtract_offset(a: Point2D, b: Point2D) -> Point2D:
         return Point2D(a.x - b.x, a.y - b.y)
@@ -179,14 +265,20 @@ class HomusSymbol:
 
 class HomusImageGenerator:
     @staticmethod
-    def create_images(raw_data_directory: str,
+    def create_images(raw_data_directory: Union[str, ArchiveDataset],
                       destination_directory: str,
                       stroke_thicknesses: List[int],
                       canvas_width: int = None,
                       canvas_height: int = None,
                       staff_line_spacing: int = 14,
                       staff_line_vertical_offsets: List[int] = None,
-                      random_position_on_canvas: bool = False) -> dict:
+                      random_position_on_canvas: bool = False,
+                      workers: int = 1,
+                      seed: Optional[int] = None,
+                      image_mode: str = "RGB",
+                      compress_level: Optional[int] = None,
+                      writer: ImageWriter = None,
+                      incremental: bool = False) -> dict:
         """
         Creates a visual representation of the Homus Dataset by parsing all text-files and the symbols as specified
         by the parameters by drawing lines that connect the points from each stroke of each symbol.
@@ -194,7 +286,7 @@ class HomusImageGenerator:
         Each symbol will be drawn in the center of a fixed canvas, specified by width and height.
 
         :param raw_data_directory: The directory, that contains the text-files that contain the textual representation
-                                    of the music symbols
+                                    of the music symbols, or an ArchiveDataset of the downloaded archive
         :param destination_directory: The directory, in which the symbols should be generated into. One sub-folder per
                                       symbol category will be generated automatically
         :param stroke_thicknesses: The thickness of the pen, used for drawing the lines in pixels. If multiple are
@@ -216,18 +308,82 @@ class HomusImageGenerator:
         :param random_position_on_canvas: True, if the symbols should be randomly placed on the fixed canvas.
                                           False, if the symbols should be centered in the fixed canvas.
                                           Note that this flag only has an effect, if fixed canvas sizes are used.
+        :param workers: The number of processes that render the symbols. The symbol files are split into shards
+                        that are rendered in parallel and the bounding-boxes of all shards are merged afterwards.
+        :param seed: The seed for the random positions on the canvas. Each symbol draws its position from its own
+                     generator that is seeded with this seed and the name of the symbol file, so the images are the
+                     same, regardless of the number of workers. If None is provided, the seed is drawn from the
+                     global random module, so calling random.seed beforehand also makes the result reproducible.
+        :param image_mode: The mode of the generated images: 'RGB' (default), 'L' for grayscale images or '1' for
+                           black-and-white images with one bit per pixel, which are considerably smaller on disk
+        :param compress_level: The optional PNG compression level from 0 (fastest) to 9 (smallest files)
+        :param writer: The writer that stores the images, e.g. a ShardedImageWriter. Defaults to an ImageWriter that
+                       saves every image immediately
+        :param incremental: True, if images that were generated by a previous run from the same symbol file with the
+                            same parameters should be kept instead of being drawn again. The sources and parameters
+                            of all images are stored in a :class:`BuildManifest` in the destination directory and
+                            images of previous runs that are not generated anymore are deleted. Requires a writer
+                            that stores individual files, e.g. no ShardedImageWriter, otherwise a ValueError is
+                            raised, and a seed, if the symbols are placed randomly.
         :return: A dictionary that contains the file-names of all generated symbols and the respective bounding-boxes
                  of each symbol.
         """
-        all_symbol_files = [y for x in os.walk(raw_data_directory) for y in glob(os.path.join(x[0], '*.txt'))]
+        if incremental:
+            BuildManifest.check_writer(writer)
+        all_symbol_files = HomusImageGenerator.__get_symbol_files(raw_data_directory)
+        total_number_of_symbols = HomusImageGenerator.__print_summary(
+            destination_directory, len(all_symbol_files), stroke_thicknesses, canvas_width, canvas_height,
+            staff_line_vertical_offsets, random_position_on_canvas)
+
+        if seed is None:
+            seed = random.randrange(2 ** 32)
+        if writer is None:
+            writer = ImageWriter()
+
+        # Archives can not be shared with other processes, so their content is read up front
+        if isinstance(raw_data_directory, ArchiveDataset):
+            symbol_files = [(symbol_file, raw_data_directory.read_text(symbol_file))
+                            for symbol_file in all_symbol_files]
+        else:
+            symbol_files = [(symbol_file, None) for symbol_file in all_symbol_files]
 
+        rendering_arguments = (destination_directory, stroke_thicknesses, canvas_width, canvas_height,
+                               staff_line_spacing, staff_line_vertical_offsets, random_position_on_canvas, seed,
+                               image_mode, compress_level, writer)
+
+        bounding_boxes = dict()
+        previous_manifest = BuildManifest.load(destination_directory) if incremental else None
+        manifest = BuildManifest(destination_directory)
+        progress_bar = tqdm(total=total_number_of_symbols, mininterval=0.25)
+
+        for shard_bounding_boxes, number_of_images, shard_manifest in HomusImageGenerator.__render_shards(
+                symbol_files, rendering_arguments, workers, previous_manifest):
+            bounding_boxes.update(shard_bounding_boxes)
+            progress_bar.update(number_of_images)
+            if shard_manifest is not None:
+                manifest.update(shard_manifest)
+
+        progress_bar.close()
+
+        if incremental:
+            number_of_removed_images = manifest.remove_orphans(previous_manifest)
+            manifest.save()
+            print("Removed {0} images of previous runs, that are not generated anymore".format(
+                number_of_removed_images))
+        return bounding_boxes
+
+    @staticmethod
+    def __print_summary(destination_directory: str, number_of_symbol_files: int, stroke_thicknesses: List[int],
+                        canvas_width: Optional[int], canvas_height: Optional[int],
+                        staff_line_vertical_offsets: Optional[List[int]], random_position_on_canvas: bool) -> int:
+        """ Prints the parameters of :meth:`create_images` and returns the number of images that will be generated """
         staff_line_multiplier = 1
         if staff_line_vertical_offsets is not None and staff_line_vertical_offsets:
             staff_line_multiplier = len(staff_line_vertical_offsets)
 
-        total_number_of_symbols = len(all_symbol_files) * len(stroke_thicknesses) * staff_line_multiplier
+        total_number_of_symbols = number_of_symbol_files * len(stroke_thicknesses) * staff_line_multiplier
         output = "Generating {0} images with {1} symbols in {2} different stroke thicknesses ({3})".format(
-            total_number_of_symbols, len(all_symbol_files), len(stroke_thicknesses), stroke_thicknesses)
+            total_number_of_symbols, number_of_symbol_files, len(stroke_thicknesses), stroke_thicknesses)
 
         if staff_line_vertical_offsets is not None:
             output += " and with staff-lines with {0} different offsets from the top ({1})".format(
@@ -243,35 +399,255 @@ class HomusImageGenerator:
 
         print(output)
         print("In directory {0}".format(os.path.abspath(destination_directory)), flush=True)
+        return total_number_of_symbols
 
-        bounding_boxes = dict()
+    @staticmethod
+    def __render_shards(symbol_files: List[Tuple[str, Optional[str]]], rendering_arguments: tuple, workers: int,
+                        previous_manifest: Optional[BuildManifest]) \
+            -> Iterator[Tuple[dict, int, Optional[BuildManifest]]]:
+        """
+        Splits the symbol files into shards and renders them with :meth:`create_images_for_symbol_files`, either in
+        this process or in a pool of worker processes
 
-        progress_bar = tqdm(total=total_number_of_symbols, mininterval=0.25)
-        for symbol_file in all_symbol_files:
-            with open(symbol_file) as file:
-                content = file.read()
+        :return: The results of the shards in the order they complete
+        """
+        # Many small shards keep all workers busy until the end and the progress bar moving
+        shard_size = max(1, min(64, len(symbol_files) // (max(1, workers) * 8)))
+        shards = [symbol_files[i:i + shard_size] for i in range(0, len(symbol_files), shard_size)]
+        shard_manifests = [None] * len(shards)
+        if previous_manifest is not None:
+            # Each shard only receives the entries of its own symbol files
+            shard_manifests = previous_manifest.split([[HomusImageGenerator.__get_source(symbol_file)
+                                                        for symbol_file, content in shard] for shard in shards])
+
+        if workers <= 1:
+            for shard, shard_manifest in zip(shards, shard_manifests):
+                yield HomusImageGenerator.create_images_for_symbol_files(shard, *rendering_arguments, shard_manifest)
+            return
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(HomusImageGenerator.create_images_for_symbol_files, shard,
+                                       *rendering_arguments, shard_manifest)
+                       for shard, shard_manifest in zip(shards, shard_manifests)]
+            for future in as_completed(futures):
+                yield future.result()
+
+    @staticmethod
+    def create_images_for_symbol_files(symbol_files: List[Tuple[str, Optional[str]]],
+                                       destination_directory: str,
+                                       stroke_thicknesses: List[int],
+                                       canvas_width: Optional[int],
+                                       canvas_height: Optional[int],
+                                       staff_line_spacing: int,
+                                       staff_line_vertical_offsets: Optional[List[int]],
+                                       random_position_on_canvas: bool,
+                                       seed: int,
+                                       image_mode: str = "RGB",
+                                       compress_level: Optional[int] = None,
+                                       writer: ImageWriter = None,
+                                       previous_manifest: BuildManifest = None
+                                       ) -> Tuple[dict, int, Optional[BuildManifest]]:
+        """
+        Renders a shard of the symbol files, see :meth:`create_images`. Runs in the worker processes, if multiple
+        workers are used. The writer is flushed after the shard was rendered.
+
+        :param symbol_files: Pairs of the path of a symbol file and its content or None, if it should be read from
+                             the path
+        :param previous_manifest: The manifest of a previous run with the entries of these symbol files. If provided,
+                                  images that are still up to date are not drawn again
+        :return: The bounding-boxes of the generated images, the number of generated images and the manifest of
+                 the generated images or None, if no previous manifest was provided
+        """
+        staff_line_multiplier = 1
+        offsets_of_images = [None]
+        if staff_line_vertical_offsets is not None and staff_line_vertical_offsets:
+            staff_line_multiplier = len(staff_line_vertical_offsets)
+            if canvas_width is not None or canvas_height is not None:
+                offsets_of_images = staff_line_vertical_offsets
+
+        bounding_boxes = dict()
+        number_of_images = 0
+        manifest = None
+        if previous_manifest is not None:
+            manifest = BuildManifest(previous_manifest.destination_directory)
+        for symbol_file, content in symbol_files:
+            if content is None:
+                with open(symbol_file) as file:
+                    content = file.read()
 
             symbol = HomusSymbol.initialize_from_string(content)
 
             target_directory = os.path.join(destination_directory, symbol.symbol_class)
             os.makedirs(target_directory, exist_ok=True)
 
-            raw_file_name_without_extension = os.path.splitext(os.path.basename(symbol_file))[0]
+            raw_file_name_without_extension = HomusImageGenerator.__get_source(symbol_file)
+            random_generator = random.Random("{0}-{1}".format(seed, raw_file_name_without_extension))
+            source_hash = BuildManifest.hash_content(content)
 
-            for stroke_thickness in stroke_thicknesses:
+            for stroke_thickness_index, stroke_thickness in enumerate(stroke_thicknesses):
+                number_of_images += 1 * staff_line_multiplier
                 export_path = ExportPath(destination_directory, symbol.symbol_class, raw_file_name_without_extension,
-                                         'png', stroke_thickness)
+                                         'png', stroke_thickness, image_mode, compress_level)
+                # All stroke thicknesses draw their random position from the same generator one after the other
+                random_position = [seed, stroke_thickness_index] if random_position_on_canvas else None
+                parameters_hash = BuildManifest.hash_parameters(canvas_width=canvas_width,
+                                                                canvas_height=canvas_height,
+                                                                staff_line_spacing=staff_line_spacing,
+                                                                random_position=random_position,
+                                                                image_mode=image_mode, compress_level=compress_level)
+                outdated_offsets = offsets_of_images
+                if previous_manifest is not None:
+                    outdated_offsets = HomusImageGenerator.__keep_up_to_date_images(
+                        export_path, offsets_of_images, previous_manifest, manifest, source_hash, parameters_hash,
+                        bounding_boxes)
+
                 if canvas_width is None and canvas_height is None:
-                    symbol.draw_into_bitmap(export_path, stroke_thickness, margin=2)
-                else:
-                    symbol.draw_onto_canvas(export_path, stroke_thickness, 0, canvas_width,
-                                            canvas_height, staff_line_spacing, staff_line_vertical_offsets,
-                                            bounding_boxes, random_position_on_canvas)
+                    if outdated_offsets:
+                        symbol.draw_into_bitmap(export_path, stroke_thickness, margin=2, writer=writer)
+                elif outdated_offsets:
+                    symbol.draw_onto_canvas(export_path, stroke_thickness, 0, canvas_width, canvas_height,
+                                            staff_line_spacing,
+                                            None if outdated_offsets == [None] else outdated_offsets,
+                                            bounding_boxes, random_position_on_canvas, random_generator, writer)
+                elif random_position_on_canvas:
+                    # Skipped images still draw their position, so the following ones are placed as before
+                    symbol.get_offset_on_canvas(0, canvas_width, canvas_height, True, random_generator)
+
+                if manifest is not None:
+                    for offset in outdated_offsets:
+                        bounding_box = bounding_boxes.get(export_path.get_class_name_and_file_path(offset))
+                        if bounding_box is not None:
+                            bounding_box = [bounding_box.origin.x, bounding_box.origin.y, bounding_box.width,
+                                            bounding_box.height]
+                        manifest.record(export_path.get_full_path(offset), raw_file_name_without_extension,
+                                        source_hash, parameters_hash, bounding_box=bounding_box)
+
+        if writer is not None:
+            writer.flush()
+        return bounding_boxes, number_of_images, manifest
 
-                progress_bar.update(1 * staff_line_multiplier)
+    @staticmethod
+    def __keep_up_to_date_images(export_path: ExportPath, offsets: List[Optional[int]],
+                                 previous_manifest: BuildManifest, manifest: BuildManifest, source_hash: str,
+                                 parameters_hash: str, bounding_boxes: dict) -> List[Optional[int]]:
+        """
+        Takes the entries and bounding-boxes of all images that are still up to date from the previous manifest
 
-        progress_bar.close()
-        return bounding_boxes
+        :return: The staff-line offsets of the images, that have to be drawn again
+        """
+        outdated_offsets = []
+        for offset in offsets:
+            output_path = export_path.get_full_path(offset)
+            if not previous_manifest.is_up_to_date(output_path, source_hash, parameters_hash):
+                outdated_offsets.append(offset)
+                continue
+
+            entry = previous_manifest.get(output_path)
+            manifest.record(output_path, **entry)
+            if entry.get("bounding_box") is not None:
+                x, y, width, height = entry["bounding_box"]
+                bounding_boxes[export_path.get_class_name_and_file_path(offset)] = \
+                    Rectangle(Point2D(x, y), width, height)
+        return outdated_offsets
+
+    @staticmethod
+    def __get_source(symbol_file: str) -> str:
+        return os.path.splitext(os.path.basename(symbol_file))[0]
+
+    @staticmethod
+    def load_symbols(raw_data_directory: Union[str, ArchiveDataset]) -> List[HomusSymbol]:
+        """
+        Parses all symbols of the Homus Dataset, e.g. to render them with :meth:`render_to_array`
+
+        :param raw_data_directory: The directory, that contains the text-files that contain the textual representation
+                                    of the music symbols, or an ArchiveDataset of the downloaded archive
+        :return: The parsed symbols, sorted by the name of their text-file
+        """
+        symbols = []
+        for symbol_file in sorted(HomusImageGenerator.__get_symbol_files(raw_data_directory)):
+            if isinstance(raw_data_directory, ArchiveDataset):
+                content = raw_data_directory.read_text(symbol_file)
+            else:
+                with open(symbol_file) as file:
+                    content = file.read()
+            symbols.append(HomusSymbol.initialize_from_string(content))
+        return symbols
+
+    @staticmethod
+    def render_to_array(symbols: List[HomusSymbol],
+                        stroke_thicknesses: List[int],
+                        canvas_width: int,
+                        canvas_height: int,
+                        staff_line_spacing: int = 14,
+                        staff_line_vertical_offsets: List[int] = None,
+                        random_position_on_canvas: bool = False,
+                        seed: Optional[int] = None) -> Tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]:
+        """
+        Renders symbols in memory into grayscale images, instead of writing them to disk like :meth:`create_images`,
+        which saves encoding, writing and decoding PNG files, if the images are consumed right away, e.g. for
+        training. The images are the same as the ones created by :meth:`create_images`, but in grayscale.
+
+        For each symbol, one image is rendered per stroke thickness and staff-line offset in this order, e.g. for
+        two symbols, stroke thicknesses [2, 3] and offsets [70, 77] the images are (symbol 1, 2px, offset 70),
+        (symbol 1, 2px, offset 77), (symbol 1, 3px, offset 70), ..., (symbol 2, 3px, offset 77).
+
+        Examples
+        --------
+        >>> symbols = HomusImageGenerator.load_symbols("data/homus_raw")
+        >>> images, labels, bounding_boxes = HomusImageGenerator.render_to_array(symbols, [3], 96, 192)
+
+        :param symbols: The symbols that should be rendered, see :meth:`load_symbols`
+        :param stroke_thicknesses: The thickness of the pen, used for drawing the lines in pixels
+        :param canvas_width: The width of the canvas, that each symbol will be drawn upon
+        :param canvas_height: The height of the canvas, that each symbol will be drawn upon
+        :param staff_line_spacing: Number of pixels spacing between each of the five staff-lines
+        :param staff_line_vertical_offsets: List of vertical offsets, where the staff-lines will be superimposed over
+                                            the drawn images. If None is provided, no staff-lines will be drawn.
+        :param random_position_on_canvas: True, if the symbols should be randomly placed on the fixed canvas.
+                                          False, if the symbols should be centered in the fixed canvas.
+        :param seed: The seed for the random positions on the canvas. Each symbol uses its own generator that is
+                     seeded with this seed and the index of the symbol. If None is provided, the seed is drawn from
+                     the global random module.
+        :return: The images as uint8 array of shape (N, canvas_height, canvas_width), the symbol classes as array of
+                 shape (N,) and the bounding-boxes of the symbols as float32 array of shape (N, 4) with the
+                 columns left, top, right and bottom
+        """
+        if seed is None:
+            seed = random.randrange(2 ** 32)
+
+        images_per_symbol = len(stroke_thicknesses)
+        if staff_line_vertical_offsets is not None and staff_line_vertical_offsets:
+            images_per_symbol *= len(staff_line_vertical_offsets)
+
+        number_of_images = len(symbols) * images_per_symbol
+        images = numpy.empty((number_of_images, canvas_height, canvas_width), dtype=numpy.uint8)
+        labels = numpy.array([symbol.symbol_class for symbol in symbols for _ in range(images_per_symbol)],
+                             dtype=str)
+        bounding_boxes = numpy.empty((number_of_images, 4), dtype=numpy.float32)
+
+        index = 0
+        for symbol_index, symbol in enumerate(symbols):
+            random_generator = random.Random("{0}-{1}".format(seed, symbol_index))
+            for stroke_thickness in stroke_thicknesses:
+                rendered_images, bounding_box = symbol.render_onto_canvas(stroke_thickness, 0, canvas_width,
+                                                                          canvas_height, staff_line_spacing,
+                                                                          staff_line_vertical_offsets,
+                                                                          random_position_on_canvas,
+                                                                          random_generator, mode="L")
+                for image in rendered_images:
+                    images[index] = numpy.asarray(image)
+                    bounding_boxes[index] = (bounding_box.left, bounding_box.top, bounding_box.right,
+                                             bounding_box.bottom)
+                    image.close()
+                    index += 1
+
+        return images, labels, bounding_boxes
+
+    @staticmethod
+    def __get_symbol_files(raw_data_directory: Union[str, ArchiveDataset]) -> List[str]:
+        if isinstance(raw_data_directory, ArchiveDataset):
+            return raw_data_directory.glob("*.txt")
+        return [y for x in os.walk(raw_data_directory) for y in glob(os.path.join(x[0], '*.txt'))]
 
     @staticmethod
     def add_arguments_for_homus_image_generator(parser: argparse.ArgumentParser):
@@ -295,6 +671,22 @@ class HomusImageGenerator:
                                  "Note, that this flag only has an effect, if a fixed canvas size is used which gets "
                                  "disabled by the --disable_fixed_canvas_size flag.")
         parser.set_defaults(random_position_on_canvas=False)
+        parser.add_argument("--workers", default=1, type=int,
+                            help="Number of processes that render the symbols in parallel")
+        parser.add_argument("--seed", default=None, type=int,
+                            help="Optional seed for reproducible random positions on the canvas")
+        parser.add_argument("--image_mode", default="RGB", choices=["RGB", "L", "1"],
+                            help="Mode of the generated images: RGB (default), L for grayscale or 1 for "
+                                 "black-and-white images with one bit per pixel")
+        parser.add_argument("--compress_level", default=None, type=int, choices=range(10),
+                            help="Optional PNG compression level from 0 (fastest) to 9 (smallest files)")
+        parser.add_argument("--shard_directory", default=None,
+                            help="Optional directory, into which the images are written as tar-shards, instead of "
+                                 "writing one file per image into the image dataset directory")
+        parser.add_argument("--incremental", dest="incremental", action="store_true",
+                            help="Provide this flag, to only draw images whose symbol file or parameters changed "
+                                 "since the last run into the same image dataset directory")
+        parser.set_defaults(incremental=False)
 
 
 if __name__ == "__main__":
@@ -324,6 +716,10 @@ if __name__ == "__main__":
     if not flags.use_fixed_canvas:
         width, height = None, None
 
+    image_writer = None
+    if flags.shard_directory is not None:
+        image_writer = ShardedImageWriter(flags.shard_directory)
+
     HomusImageGenerator.create_images(flags.raw_dataset_directory,
                                       flags.image_dataset_directory,
                                       [int(s) for s in flags.stroke_thicknesses.split(',')],
@@ -331,4 +727,10 @@ if __name__ == "__main__":
                                       height,
                                       flags.staff_line_spacing,
                                       offsets,
-                                      flags.random_position_on_canvas)
+                                      flags.random_position_on_canvas,
+                                      flags.workers,
+                                      flags.seed,
+                                      flags.image_mode,
+                                      flags.compress_level,
+                                      image_writer,
+                                      flags.incremental)
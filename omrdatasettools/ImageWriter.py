@@ -0,0 +1,71 @@
+import io
+import os
+
+from PIL import Image
+
+
+class ImageWriter:
+    """ Writes generated images to disk. The image generators hand every image to a writer, instead of saving it
+        themselves, so the way the images are stored can be exchanged. This default writer saves each image
+        immediately as a separate file.
+
+        Writers might be copied into worker processes, where each copy writes the images of the shards that the
+        process renders and is flushed after each shard.
+    """
+
+    #: True, if every image is stored as a file at the given path, which incremental generation relies on
+    stores_individual_files = True
+
+    def write(self, image: Image.Image, path: str, metadata: dict = None, **save_options) -> None:
+        """ Writes an image to the given path. The format is determined by the file extension. The optional metadata
+            describes the symbol in the image, see :meth:`ExportPath.get_metadata`, and is ignored by writers that
+            store plain image files. Further options, e.g. the compress_level of PNG images, are passed to
+            :meth:`PIL.Image.Image.save` """
+        image.save(path, **save_options)
+
+    def flush(self) -> None:
+        """ Writes all images that might still be buffered """
+        pass
+
+    def take_pending(self) -> list:
+        """ Called on the copy of the writer in a worker process, when the worker finished a piece of work. Returns
+            the images that the writer in the main process should write with :meth:`write_pending`, instead of
+            writing them in the worker. By default, all images are written immediately and nothing is returned. """
+        self.flush()
+        return []
+
+    def write_pending(self, pending: list) -> None:
+        """ Writes the images that a copy of this writer in a worker process returned from :meth:`take_pending` """
+        pass
+
+
+class BatchedImageWriter(ImageWriter):
+    """ Encodes the images in memory and writes them to disk in batches, which keeps encoding and file system
+        operations apart and reduces the number of interleaved small writes, e.g. on network file systems.
+    """
+
+    def __init__(self, batch_size: int = 256) -> None:
+        """
+        :param batch_size: The number of encoded images that are kept in memory, before they are written to disk
+        """
+        super().__init__()
+        self.batch_size = batch_size
+        self.buffer = []  # The paths and encoded contents of the images, that were not written yet
+
+    def write(self, image: Image.Image, path: str, metadata: dict = None, **save_options) -> None:
+        encoded_image = io.BytesIO()
+        image.save(encoded_image, format=Image.registered_extensions()[os.path.splitext(path)[1].lower()],
+                   **save_options)
+        self.buffer.append((path, encoded_image.getvalue()))
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        for path, content in self.buffer:
+            with open(path, 'wb') as file:
+                file.write(content)
+        self.buffer = []
+
+    def __getstate__(self):
+        # Buffered images are never copied into worker processes
+        return {"batch_size": self.batch_size, "buffer": []}
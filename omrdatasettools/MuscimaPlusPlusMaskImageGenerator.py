@@ -1,8 +1,8 @@
 import argparse
 import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from enum import Enum
-from glob import glob
-from typing import List, Tuple
+from typing import List, Union, Iterable, Dict, Optional
 
 import numpy
 from PIL import Image
@@ -10,6 +10,8 @@ from mung.io import read_nodes_from_file, parse_node_classes
 from mung.node import Node
 from tqdm import tqdm
 
+from omrdatasettools.MuscimaPlusPlusPageIndex import MuscimaPlusPlusPageIndex
+
 
 class MaskType(Enum):
     """ The type of masks that should be generated """
@@ -32,7 +34,9 @@ class MuscimaPlusPlusMaskImageGenerator:
         self.path_of_this_file = os.path.dirname(os.path.realpath(__file__))
         self.class_to_color_mapping = dict()
 
-    def render_node_masks(self, raw_data_directory: str, destination_directory: str, mask_type: MaskType):
+    def render_node_masks(self, raw_data_directory: str, destination_directory: str,
+                          mask_type: Union[MaskType, Iterable[MaskType]], workers: int = 1,
+                          page_index_path: Optional[str] = None):
         """
         Extracts all symbols from the raw XML documents and generates individual symbols from the masks
 
@@ -40,6 +44,15 @@ class MuscimaPlusPlusMaskImageGenerator:
         :param destination_directory: The directory, in which the symbols should be generated into.
                                       Per file, one mask will be generated.
         :param mask_type: The type of masks that you want to generate, e.g., masks for each node or staff lines only.
+                          If multiple types are provided, all of them are generated from a single pass over the
+                          documents into one sub-folder per type, that is named after the type, e.g.
+                          'staff_lines_instance_segmentation'.
+        :param workers: The number of processes that parse the documents and render their masks. Each process
+                        renders whole pages and saves their masks as soon as they are finished.
+        :param page_index_path: The optional path of the :class:`MuscimaPlusPlusPageIndex`, from which the files and
+                                sizes of the pages are taken. The index is built on the first run and is stored in the
+                                cache directory, unless a different path is provided, so the raw data directory is
+                                never modified.
         """
         print("Extracting Masks from Muscima++ Dataset...")
 
@@ -48,35 +61,51 @@ class MuscimaPlusPlusMaskImageGenerator:
         for index, node_class in enumerate(node_classes):
             self.class_to_color_mapping[node_class.name] = index + 1
 
-        file_paths = self.__get_all_file_paths(raw_data_directory)
-        for xml_file, png_file in tqdm(file_paths, desc="Generating mask images"):
-            original_image = Image.open(png_file)  # type: Image.Image
-            nodes = read_nodes_from_file(xml_file)
-            destination_filename = os.path.basename(xml_file).replace(".xml", ".png")
-            if mask_type == MaskType.NODES_SEMANTIC_SEGMENTATION:
-                self.__render_masks_of_nodes_for_semantic_segmentation(nodes, destination_directory,
-                                                                       destination_filename,
-                                                                       original_image.width, original_image.height)
-            if mask_type == MaskType.STAFF_LINES_INSTANCE_SEGMENTATION:
-                self.__render_masks_of_staff_lines_for_instance_segmentation(nodes, destination_directory,
-                                                                             destination_filename,
-                                                                             original_image.width,
-                                                                             original_image.height)
-            if mask_type == MaskType.STAFF_BLOBS_INSTANCE_SEGMENTATION:
-                self.__render_masks_of_staff_blob_for_instance_segmentation(nodes, destination_directory,
-                                                                            destination_filename,
-                                                                            original_image.width, original_image.height)
-            original_image.close()
-
-    def __get_all_file_paths(self, raw_data_directory: str) -> List[Tuple[str, str]]:
-        """ Loads all XML-files that are located in the folder.
-        :param raw_data_directory: Path to the raw directory, where the MUSCIMA++ dataset was extracted to
+        if isinstance(mask_type, MaskType):
+            destination_directories = {mask_type: destination_directory}
+        else:
+            destination_directories = {single_mask_type: os.path.join(destination_directory,
+                                                                      single_mask_type.name.lower())
+                                       for single_mask_type in sorted(set(mask_type), key=lambda t: t.value)}
+
+        pages = []
+        for page in MuscimaPlusPlusPageIndex.load(raw_data_directory, index_path=page_index_path).get_pages():
+            if page["annotations"] is None or page["image"] is None:
+                print("Skipping {0}, because it has no image".format(page["document"]))
+            else:
+                pages.append(page)
+
+        if workers <= 1:
+            for page in tqdm(pages, desc="Generating mask images"):
+                self.render_masks_of_page(page, destination_directories)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(self.render_masks_of_page, page, destination_directories)
+                           for page in pages]
+                for future in tqdm(as_completed(futures), total=len(futures), desc="Generating mask images"):
+                    future.result()
+
+    def render_masks_of_page(self, page: dict, destination_directories: Dict[MaskType, str]) -> None:
+        """
+        Parses the document of a single page and renders all requested masks of it, see :meth:`render_node_masks`.
+        Runs in the worker processes, if multiple workers are used.
+
+        :param page: The entry of the page in the :class:`MuscimaPlusPlusPageIndex`
+        :param destination_directories: The directory, into which the mask of each type should be saved
         """
-        annotations_directory = os.path.join(raw_data_directory, "v2.0", "data", "annotations")
-        xml_files = sorted([y for x in os.walk(annotations_directory) for y in glob(os.path.join(x[0], '*.xml'))])
-        images_directory = os.path.join(raw_data_directory, "v2.0", "data", "images")
-        png_files = sorted([y for x in os.walk(images_directory) for y in glob(os.path.join(x[0], '*.png'))])
-        return list(zip(xml_files, png_files))
+        width, height = page["width"], page["height"]
+        nodes = read_nodes_from_file(page["annotations"])
+        destination_filename = page["document"] + ".png"
+        for single_mask_type, mask_directory in destination_directories.items():
+            if single_mask_type == MaskType.NODES_SEMANTIC_SEGMENTATION:
+                self.__render_masks_of_nodes_for_semantic_segmentation(nodes, mask_directory,
+                                                                       destination_filename, width, height)
+            if single_mask_type == MaskType.STAFF_LINES_INSTANCE_SEGMENTATION:
+                self.__render_masks_of_staff_lines_for_instance_segmentation(nodes, mask_directory,
+                                                                             destination_filename, width, height)
+            if single_mask_type == MaskType.STAFF_BLOBS_INSTANCE_SEGMENTATION:
+                self.__render_masks_of_staff_blob_for_instance_segmentation(nodes, mask_directory,
+                                                                            destination_filename, width, height)
 
     def __render_masks_of_nodes_for_semantic_segmentation(self, nodes: List[Node], destination_directory: str,
                                                           destination_filename: str,
@@ -89,10 +118,7 @@ class MuscimaPlusPlusMaskImageGenerator:
             try:
                 symbol_class = node.class_name
                 color_mask = node.mask * self.class_to_color_mapping[symbol_class]
-                for i in range(node.height):
-                    for j in range(node.width):
-                        if color_mask[i, j] != 0:
-                            image[node.top + i, node.left + j] = color_mask[i, j]
+                self.__draw_mask(image, node.top, node.left, node.height, node.width, color_mask)
             except Exception:
                 print("Error drawing node {0}".format(node.unique_id))
 
@@ -116,10 +142,7 @@ class MuscimaPlusPlusMaskImageGenerator:
             staff_line_index += 1
             try:
                 color_mask = node.mask * staff_index
-                for i in range(node.height):
-                    for j in range(node.width):
-                        if color_mask[i, j] != 0:
-                            image[node.top + i, node.left + j] = color_mask[i, j]
+                self.__draw_mask(image, node.top, node.left, node.height, node.width, color_mask)
             except Exception:
                 print("Error drawing node {0}".format(node.unique_id))
 
@@ -141,9 +164,14 @@ class MuscimaPlusPlusMaskImageGenerator:
 
             if staff_line_index == 4:
                 try:
-                    for i in range(first_staff_line_of_staff.top, node.bottom):
-                        for j in range(node.left, node.right):
-                            image[i, j] = staff_index
+                    top, bottom, left, right = first_staff_line_of_staff.top, node.bottom, node.left, node.right
+                    if 0 <= top and 0 <= left and bottom <= image.shape[0] and right <= image.shape[1]:
+                        image[top:bottom, left:right] = staff_index
+                    else:
+                        # Blobs that exceed the image are filled pixel by pixel up to the first pixel outside
+                        for i in range(top, bottom):
+                            for j in range(left, right):
+                                image[i, j] = staff_index
                 except Exception:
                     print("Error drawing node {0}".format(node.unique_id))
 
@@ -159,6 +187,24 @@ class MuscimaPlusPlusMaskImageGenerator:
         os.makedirs(destination_directory, exist_ok=True)
         image.save(os.path.join(destination_directory, destination_filename))
 
+    @staticmethod
+    def __draw_mask(image: numpy.ndarray, top: int, left: int, height: int, width: int,
+                    color_mask: numpy.ndarray) -> None:
+        """ Copies all non-zero pixels of the color mask onto the image at the given position """
+        if 0 <= top and 0 <= left and top + height <= image.shape[0] and left + width <= image.shape[1] \
+                and color_mask.shape[0] >= height and color_mask.shape[1] >= width:
+            color_mask = color_mask[:height, :width]
+            numpy.copyto(image[top:top + height, left:left + width], color_mask, casting="unsafe",
+                         where=color_mask != 0)
+            return
+
+        # Masks that exceed the image are copied pixel by pixel up to the first pixel outside of the image. Negative
+        # positions wrap around to the other side of the image, like they always did.
+        for i in range(height):
+            for j in range(width):
+                if color_mask[i, j] != 0:
+                    image[top + i, left + j] = color_mask[i, j]
+
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
@@ -176,7 +222,9 @@ if __name__ == "__main__":
         "--mask_type",
         type=str,
         default="nodes_semantic",
-        help="One of the following types to be generated: [nodes_semantic, staff_lines, staff_blob]. "
+        help="One or a comma-separated list of the following types to be generated: "
+             "[nodes_semantic, staff_lines, staff_blob]. Multiple types are generated in a single pass into one "
+             "sub-folder per type. "
              "Depending on the selected type, different mask images will be created: "
              "- nodes_semantic, creates mask images, where each type of node gets the same color mask "
              "  (for semantic segmentation). The classes staffLine, staff and staffSpace are ignored"
@@ -184,23 +232,32 @@ if __name__ == "__main__":
              "  segmentation. All five lines that form a staff will have the same color."
              "- staff_blob, creates mask images, where each staff will receive one big blob (filling the staff space "
              "  regions) per staff line for instance segmentation. So each staff will have a different color.")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="The number of processes, that parse the documents and render the masks")
+    parser.add_argument(
+        "--page_index_path",
+        type=str,
+        default=None,
+        help="Optional path of the page index, if it should not be stored in the cache directory")
 
     flags, unparsed = parser.parse_known_args()
 
-    if flags.mask_type not in ["nodes_semantic", "staff_lines", "staff_blob"]:
-        raise Exception(
-            "Invalid option for mask type selected. Must be one of [nodes_semantic, staff_lines, staff_blob], "
-            "but was " + flags.mask_type)
-
-    if flags.mask_type == "nodes_semantic":
-        mask_type = MaskType.NODES_SEMANTIC_SEGMENTATION
-    if flags.mask_type == "staff_lines":
-        mask_type = MaskType.STAFF_LINES_INSTANCE_SEGMENTATION
-    if flags.mask_type == "staff_blob":
-        mask_type = MaskType.STAFF_BLOBS_INSTANCE_SEGMENTATION
+    mask_types_by_name = {"nodes_semantic": MaskType.NODES_SEMANTIC_SEGMENTATION,
+                          "staff_lines": MaskType.STAFF_LINES_INSTANCE_SEGMENTATION,
+                          "staff_blob": MaskType.STAFF_BLOBS_INSTANCE_SEGMENTATION}
+    mask_types = []
+    for mask_type_name in flags.mask_type.split(","):
+        if mask_type_name not in mask_types_by_name:
+            raise Exception(
+                "Invalid option for mask type selected. Must be one of [nodes_semantic, staff_lines, staff_blob], "
+                "but was " + mask_type_name)
+        mask_types.append(mask_types_by_name[mask_type_name])
 
     mask_image_generator = MuscimaPlusPlusMaskImageGenerator()
-    # noinspection PyUnboundLocalVariable
     mask_image_generator.render_node_masks(flags.raw_dataset_directory,
                                            flags.image_dataset_directory,
-                                           mask_type)
+                                           mask_types[0] if len(mask_types) == 1 else mask_types,
+                                           flags.workers, flags.page_index_path)
@@ -0,0 +1,185 @@
+import hashlib
+import json
+import os
+from typing import Dict, List, Optional
+
+import numpy
+from PIL import Image, ImageMode
+from tqdm import tqdm
+
+from omrdatasettools.DatasetIndex import DatasetIndex
+
+
+class MuscimaPlusPlusPageIndex:
+    """ Remembers the files and the metadata of all pages of the MUSCIMA++ dataset, so the image generators neither
+        have to search the dataset directory for the xml-files and images, nor open every image just to learn its size.
+
+        Each page is identified by the name of its document, e.g. 'CVC-MUSCIMA_W-01_N-14_D-ideal', and stores the paths
+        of its annotations and its image relative to the dataset directory, the width, height, mode and numpy dtype
+        of the image and the number of nodes in the annotations. The index is built once, stored as a json-file, and
+        only updated for pages whose files changed since. Files that are added to the dataset later are only found when
+        the index is built again with rebuild=True. The dataset directory itself is never modified: by default, the
+        index is stored in the cache directory, which is taken from the environment variable OMR_DATASETS_CACHE or
+        defaults to ~/.cache/omrdatasettools, just like the :class:`ArchiveCache`, but it can be stored anywhere else by
+        providing an index_path.
+    """
+
+    def __init__(self, raw_data_directory: str, pages: Dict[str, dict] = None, index_path: Optional[str] = None) \
+            -> None:
+        """
+        :param raw_data_directory: The directory, where the MUSCIMA++ dataset was extracted to
+        :param pages: The entries of the pages, indexed by the name of their document
+        :param index_path: The optional path of the json-file of the index. Defaults to
+                           :meth:`get_default_index_path` of the raw data directory
+        """
+        super().__init__()
+        self.raw_data_directory = raw_data_directory
+        if index_path is None:
+            index_path = MuscimaPlusPlusPageIndex.get_default_index_path(raw_data_directory)
+        self.index_path = index_path
+        self.pages = pages if pages is not None else {}  # type: Dict[str, dict]
+
+    @staticmethod
+    def load(raw_data_directory: str, rebuild: bool = False, index_path: Optional[str] = None) \
+            -> 'MuscimaPlusPlusPageIndex':
+        """
+        Loads the index of the dataset directory and builds it, if there is none yet or some of its files changed
+
+        :param raw_data_directory: The directory, where the MUSCIMA++ dataset was extracted to
+        :param rebuild: True, if the dataset directory should be searched for all pages again, e.g. because files
+                        were added to the dataset
+        :param index_path: The optional path of the json-file of the index. Defaults to
+                           :meth:`get_default_index_path` of the raw data directory
+        """
+        index = MuscimaPlusPlusPageIndex(raw_data_directory, index_path=index_path)
+        refresh = rebuild
+        try:
+            with open(index.index_path) as index_file:
+                index.pages = json.load(index_file)["pages"]
+        except (OSError, ValueError, KeyError):
+            rebuild = True
+
+        if rebuild:
+            index.__update_pages(index.__find_pages(refresh), index.pages)
+        elif not index.is_up_to_date():
+            index.__update_pages({document: (page["annotations"], page["image"])
+                                  for document, page in index.pages.items()}, index.pages)
+        else:
+            return index
+
+        index.save()
+        return index
+
+    @staticmethod
+    def get_default_index_path(raw_data_directory: str) -> str:
+        """ Returns the path of the index of a dataset directory in the cache directory, which is named after the hash
+            of the absolute path of the dataset directory, e.g. ~/.cache/omrdatasettools/page-indices/3fa1....json """
+        cache_directory = os.environ.get("OMR_DATASETS_CACHE",
+                                         os.path.join(os.path.expanduser("~"), ".cache", "omrdatasettools"))
+        directory_hash = hashlib.sha256(os.path.realpath(raw_data_directory).encode("utf-8")).hexdigest()
+        return os.path.join(cache_directory, "page-indices", directory_hash + ".json")
+
+    def save(self) -> None:
+        index_path = self.index_path
+        try:
+            index_directory = os.path.dirname(index_path)
+            if index_directory:
+                os.makedirs(index_directory, exist_ok=True)
+            # Write into a temporary file first, so an interrupted run never leaves a truncated index behind
+            with open(index_path + ".tmp", "w") as index_file:
+                json.dump({"pages": self.pages}, index_file, sort_keys=True, indent=1)
+            os.replace(index_path + ".tmp", index_path)
+        except OSError:
+            print("Could not store the page index in {0}, it will be built again next time".format(index_path))
+
+    def is_up_to_date(self) -> bool:
+        """ Returns True, if none of the files of the indexed pages changed since the index was built """
+        return all(self.__get_file_status(page["annotations"]) == page["annotations_status"] and
+                   self.__get_file_status(page["image"]) == page["image_status"] for page in self.pages.values())
+
+    def get_pages(self) -> List[dict]:
+        """
+        :return: The entries of all pages, sorted by the name of their document, with the keys 'document',
+                 'annotations' and 'image' with the full paths of the files (None, if the file is missing), 'width',
+                 'height', 'mode' and 'dtype' of the image and 'number_of_nodes' in the annotations
+        """
+        pages = []
+        for document in sorted(self.pages.keys()):
+            page = self.pages[document]
+            pages.append({"document": document,
+                          "annotations": self.__get_full_path(page["annotations"]),
+                          "image": self.__get_full_path(page["image"]),
+                          "width": page["width"], "height": page["height"], "mode": page["mode"],
+                          "dtype": page["dtype"], "number_of_nodes": page["number_of_nodes"]})
+        return pages
+
+    def get_annotation_paths(self) -> List[str]:
+        """ Returns the full paths of the xml-files of all pages, sorted by the name of their document """
+        return [page["annotations"] for page in self.get_pages() if page["annotations"] is not None]
+
+    def __find_pages(self, refresh: bool) -> Dict[str, tuple]:
+        """ Searches the annotations and images directories of the dataset for the xml-files and images and pairs them
+            by the name of their document. Annotations without an image are indexed as well, because the symbols can
+            be extracted without it. Documents with multiple xml-files or images are not indexed at all, because it is
+            unknown which of them belong together. """
+        dataset_index = DatasetIndex.of(self.raw_data_directory, refresh)
+        pairs, orphans = dataset_index.pair([".xml", ".png"], ["v2.0/data/annotations", "v2.0/data/images"])
+        files_of_documents = {}
+        for xml_file, png_file in pairs:
+            document = os.path.splitext(os.path.basename(xml_file))[0]
+            files_of_documents[document] = (self.__get_relative_path(xml_file), self.__get_relative_path(png_file))
+
+        orphans_of_documents = {}  # type: Dict[str, List[str]]
+        for orphan in orphans:
+            orphans_of_documents.setdefault(os.path.splitext(os.path.basename(orphan))[0], []).append(orphan)
+        for document, orphans_of_document in sorted(orphans_of_documents.items()):
+            extensions = [os.path.splitext(orphan)[1] for orphan in orphans_of_document]
+            if len(extensions) != len(set(extensions)):
+                print("Skipping document {0}, because multiple files share its name: {1}".format(
+                    document, ", ".join(orphans_of_document)))
+            elif extensions == [".xml"]:
+                print("Indexing {0} without an image".format(orphans_of_document[0]))
+                files_of_documents[document] = (self.__get_relative_path(orphans_of_document[0]), None)
+            else:
+                print("Skipping {0}, because it has no annotations".format(", ".join(orphans_of_document)))
+        return files_of_documents
+
+    def __update_pages(self, files_of_documents: Dict[str, tuple], previous_pages: Dict[str, dict]) -> None:
+        """ Stores the pages with the given files and probes the metadata of all pages, whose files changed """
+        pages = {}
+        for document, (annotations, image) in tqdm(sorted(files_of_documents.items()), desc="Indexing pages"):
+            page = {"annotations": annotations, "annotations_status": self.__get_file_status(annotations),
+                    "image": image, "image_status": self.__get_file_status(image)}
+            previous_page = previous_pages.get(document)
+            if previous_page is not None and all(previous_page.get(key) == value for key, value in page.items()):
+                pages[document] = previous_page
+                continue
+
+            page.update(width=None, height=None, mode=None, dtype=None, number_of_nodes=None)
+            if page["image_status"] is not None:
+                # Opening the image only reads its header
+                with Image.open(self.__get_full_path(image)) as page_image:
+                    page.update(width=page_image.width, height=page_image.height, mode=page_image.mode,
+                                dtype=numpy.dtype(ImageMode.getmode(page_image.mode).typestr).name)
+            if page["annotations_status"] is not None:
+                # Counting the tags is much cheaper than parsing the nodes
+                with open(self.__get_full_path(annotations), "rb") as annotations_file:
+                    page["number_of_nodes"] = annotations_file.read().count(b"<Node>")
+            pages[document] = page
+        self.pages = pages
+
+    def __get_full_path(self, relative_path: Optional[str]) -> Optional[str]:
+        if relative_path is None:
+            return None
+        return os.path.join(self.raw_data_directory, relative_path)
+
+    def __get_relative_path(self, path: str) -> str:
+        return os.path.relpath(path, self.raw_data_directory).replace(os.sep, "/")
+
+    def __get_file_status(self, relative_path: Optional[str]) -> Optional[List[int]]:
+        """ Returns the size and the time of the last modification of the file or None, if it does not exist """
+        try:
+            status = os.stat(self.__get_full_path(relative_path))
+        except (OSError, TypeError):
+            return None
+        return [status.st_size, status.st_mtime_ns]
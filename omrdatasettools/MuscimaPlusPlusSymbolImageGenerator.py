@@ -1,14 +1,20 @@
 import argparse
 import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from glob import glob
-from typing import List
+from typing import List, Union, Optional, Tuple
 
 from PIL import Image
 from mung.io import read_nodes_from_file
 from mung.node import Node
 from tqdm import tqdm
 
+from omrdatasettools.ArchiveDataset import ArchiveDataset
+from omrdatasettools.BuildManifest import BuildManifest
 from omrdatasettools.ExportPath import ExportPath
+from omrdatasettools.ImageWriter import ImageWriter
+from omrdatasettools.ShardedImageWriter import ShardedImageWriter
 
 
 class MuscimaPlusPlusSymbolImageGenerator:
@@ -16,55 +22,242 @@ class MuscimaPlusPlusSymbolImageGenerator:
         super().__init__()
         self.path_of_this_file = os.path.dirname(os.path.realpath(__file__))
 
-    def extract_and_render_all_symbol_masks(self, raw_data_directory: str, destination_directory: str):
+    def extract_and_render_all_symbol_masks(self, raw_data_directory: Union[str, ArchiveDataset],
+                                            destination_directory: str, image_mode: Optional[str] = None,
+                                            compress_level: Optional[int] = None, writer: ImageWriter = None,
+                                            incremental: bool = False, workers: int = 1):
         """
         Extracts all symbols from the raw XML documents and generates individual symbols from the masks
 
-        :param raw_data_directory: The directory, that contains the xml-files and matching images
+        :param raw_data_directory: The directory, that contains the xml-files and matching images, or an
+                                   ArchiveDataset of the downloaded archive
         :param destination_directory: The directory, in which the symbols should be generated into. One sub-folder per
                                       symbol category will be generated automatically
+        :param image_mode: The optional mode of the generated images, e.g. '1' for black-and-white images with one bit
+                           per pixel. If None is provided, the images keep the mode of the grayscale masks
+        :param compress_level: The optional PNG compression level from 0 (fastest) to 9 (smallest files)
+        :param writer: The writer that stores the images, e.g. a ShardedImageWriter. Defaults to an ImageWriter that
+                       saves every image immediately
+        :param incremental: True, if only the xml-files that changed since the previous run with the same parameters
+                            should be loaded and rendered again. The sources and parameters of all images are stored
+                            in a :class:`BuildManifest` in the destination directory and images of previous runs that
+                            are not generated anymore are deleted. Requires a writer that stores individual files,
+                            e.g. no ShardedImageWriter, otherwise a ValueError is raised.
+        :param workers: The number of processes that load the xml-files and render their symbols. Each process renders
+                        whole xml-files into its own copy of the writer, so the images are written as soon as an
+                        xml-file is finished. A ShardedImageWriter only writes complete shards in the workers and
+                        hands the remaining images of each xml-file back to the main process, which continues
+                        filling its shards with them.
         """
+        if incremental:
+            BuildManifest.check_writer(writer)
         print("Extracting Symbols from MUSCIMA++ Dataset...")
 
         xml_files = self.get_all_xml_file_paths(raw_data_directory)
-        crop_objects = self.load_nodes_from_xml_files(xml_files)
-        self.render_masks_of_nodes_into_image(crop_objects, destination_directory)
+        archive_dataset = raw_data_directory if isinstance(raw_data_directory, ArchiveDataset) else None
+        if incremental:
+            self.__render_changed_xml_files(xml_files, archive_dataset, destination_directory, image_mode,
+                                            compress_level, writer, workers)
+            return
 
-    def get_all_xml_file_paths(self, raw_data_directory: str) -> List[str]:
+        if workers <= 1:
+            crop_objects = self.load_nodes_from_xml_files(xml_files, archive_dataset)
+            self.render_masks_of_nodes_into_image(crop_objects, destination_directory, image_mode, compress_level,
+                                                  writer)
+            return
+
+        self.__render_xml_files_in_parallel(xml_files, archive_dataset, destination_directory, image_mode,
+                                            compress_level, writer, workers)
+
+    def __render_changed_xml_files(self, xml_files: List[str], archive_dataset: Optional[ArchiveDataset],
+                                   destination_directory: str, image_mode: Optional[str],
+                                   compress_level: Optional[int], writer: Optional[ImageWriter], workers: int):
+        previous_manifest = BuildManifest.load(destination_directory)
+        manifest = BuildManifest(destination_directory)
+        parameters_hash = BuildManifest.hash_parameters(image_mode=image_mode, compress_level=compress_level)
+
+        sources = [os.path.basename(xml_file) for xml_file in xml_files]
+        changed_xml_files = []
+        for xml_file, source, previous_outputs in zip(xml_files, sources,
+                                                      previous_manifest.split([[source] for source in sources])):
+            if archive_dataset is not None:
+                source_hash = BuildManifest.hash_content(archive_dataset.read_text(xml_file))
+            else:
+                with open(xml_file, "rb") as file:
+                    source_hash = BuildManifest.hash_content(file.read())
+
+            output_paths = previous_outputs.get_outputs_of_sources([source])
+            if output_paths and all(previous_outputs.is_up_to_date(output_path, source_hash, parameters_hash)
+                                    for output_path in output_paths):
+                manifest.update(previous_outputs)
+            else:
+                changed_xml_files.append((xml_file, source, source_hash))
+
+        print("{0} of {1} xml-files changed since the previous run".format(len(changed_xml_files), len(xml_files)))
+        if workers <= 1:
+            nodes = []  # type: List[Node]
+            for xml_file, source, source_hash in tqdm(changed_xml_files, desc="Loading nodes from changed xml-files"):
+                nodes_of_file = self.load_nodes_from_xml_file(xml_file, archive_dataset)
+                for node in nodes_of_file:
+                    output_path = ExportPath(destination_directory, node.class_name, node.unique_id).get_full_path()
+                    manifest.record(output_path, source, source_hash, parameters_hash)
+                nodes.extend(nodes_of_file)
+            self.render_masks_of_nodes_into_image(nodes, destination_directory, image_mode, compress_level, writer)
+        else:
+            output_paths_of_files = self.__render_xml_files_in_parallel(
+                [xml_file for xml_file, source, source_hash in changed_xml_files], archive_dataset,
+                destination_directory, image_mode, compress_level, writer, workers)
+            for (xml_file, source, source_hash), output_paths in zip(changed_xml_files, output_paths_of_files):
+                for output_path in output_paths:
+                    manifest.record(output_path, source, source_hash, parameters_hash)
+
+        number_of_removed_images = manifest.remove_orphans(previous_manifest)
+        manifest.save()
+        print("Removed {0} images of previous runs, that are not generated anymore".format(number_of_removed_images))
+
+    def get_all_xml_file_paths(self, raw_data_directory: Union[str, ArchiveDataset]) -> List[str]:
         """ Loads all XML-files that are located in the folder.
-        :param raw_data_directory: Path to the raw directory, where the MUSCIMA++ dataset was extracted to
+        :param raw_data_directory: Path to the raw directory, where the MUSCIMA++ dataset was extracted to, or an
+                                   ArchiveDataset of the downloaded archive
         """
+        if isinstance(raw_data_directory, ArchiveDataset):
+            return raw_data_directory.glob("*v2.0/data/annotations/*.xml")
         raw_data_directory = os.path.join(raw_data_directory, "v2.0", "data", "annotations")
         xml_files = [y for x in os.walk(raw_data_directory) for y in glob(os.path.join(x[0], '*.xml'))]
-        return xml_files
+        return sorted(xml_files)
 
-    def load_nodes_from_xml_files(self, xml_files: List[str]) -> List[Node]:
-        nodes = []  # type: List[Node]
-        for xml_file in tqdm(xml_files, desc="Loading nodes from xml-files", smoothing=0.1):
-            nodes.extend(read_nodes_from_file(xml_file))
+    def load_nodes_from_xml_files(self, xml_files: List[str], archive_dataset: Optional[ArchiveDataset] = None,
+                                  workers: int = 1) -> List[Node]:
+        """
+        Loads the nodes of all xml-files in the order of the xml-files
+
+        :param workers: The number of processes that parse the xml-files
+        """
+        if workers <= 1:
+            nodes_of_files = [self.load_nodes_from_xml_file(xml_file, archive_dataset)
+                              for xml_file in tqdm(xml_files, desc="Loading nodes from xml-files", smoothing=0.1)]
+        else:
+            nodes_of_files = [None] * len(xml_files)  # type: List[Optional[List[Node]]]
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = {executor.submit(MuscimaPlusPlusSymbolImageGenerator.load_nodes_from_xml_file, xml_file,
+                                           None, xml_content): index
+                           for index, (xml_file, xml_content) in
+                           enumerate(self.__get_xml_files_with_content(xml_files, archive_dataset))}
+                for future in tqdm(as_completed(futures), total=len(futures), desc="Loading nodes from xml-files",
+                                   smoothing=0.1):
+                    nodes_of_files[futures[future]] = future.result()
 
+        nodes = [node for nodes_of_file in nodes_of_files for node in nodes_of_file]
         print("Loaded {0} nodes".format(len(nodes)))
         return nodes
 
-    def render_masks_of_nodes_into_image(self, nodes: List[Node], destination_directory: str):
+    @staticmethod
+    def load_nodes_from_xml_file(xml_file: str, archive_dataset: Optional[ArchiveDataset] = None,
+                                 xml_content: Optional[bytes] = None) -> List[Node]:
+        """
+        Loads the nodes of a single xml-file. Runs in the worker processes, if multiple workers are used.
+
+        :param xml_content: The optional content of the xml-file, if it was already read, e.g. from an archive
+        """
+        if archive_dataset is not None:
+            # mung can only read nodes from a path
+            with archive_dataset.materialize(xml_file) as materialized_xml_file:
+                return read_nodes_from_file(materialized_xml_file)
+        if xml_content is not None:
+            with tempfile.TemporaryDirectory() as temporary_directory:
+                materialized_xml_file = os.path.join(temporary_directory, os.path.basename(xml_file))
+                with open(materialized_xml_file, "wb") as file:
+                    file.write(xml_content)
+                return read_nodes_from_file(materialized_xml_file)
+        return read_nodes_from_file(xml_file)
+
+    @staticmethod
+    def render_xml_file(xml_file: str, xml_content: Optional[bytes], destination_directory: str,
+                        image_mode: Optional[str], compress_level: Optional[int], writer: ImageWriter) \
+            -> Tuple[List[str], list]:
+        """
+        Loads the nodes of a single xml-file and renders their masks, see :meth:`extract_and_render_all_symbol_masks`.
+        Runs in the worker processes, if multiple workers are used.
+
+        :param xml_content: The optional content of the xml-file, if it was already read, e.g. from an archive
+        :return: The paths of the generated images and the images that the writer of the main process has to write,
+                 see :meth:`ImageWriter.take_pending`, e.g. the images that did not fill a complete tar-shard
+        """
+        output_paths = []
+        for node in MuscimaPlusPlusSymbolImageGenerator.load_nodes_from_xml_file(xml_file, None, xml_content):
+            output_paths.append(MuscimaPlusPlusSymbolImageGenerator.__render_node_mask(
+                node, destination_directory, image_mode, compress_level, writer))
+        return output_paths, writer.take_pending()
+
+    def __render_xml_files_in_parallel(self, xml_files: List[str], archive_dataset: Optional[ArchiveDataset],
+                                       destination_directory: str, image_mode: Optional[str],
+                                       compress_level: Optional[int], writer: Optional[ImageWriter],
+                                       workers: int) -> List[List[str]]:
+        """ Renders the symbols of each xml-file in a worker process and returns the paths of the generated images of
+            each xml-file in the order of the xml-files """
+        if writer is None:
+            writer = ImageWriter()
+
+        output_paths_of_files = [None] * len(xml_files)  # type: List[Optional[List[str]]]
+        progress_bar = tqdm(total=len(xml_files), desc="Generating images from xml-files", smoothing=0.1)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(MuscimaPlusPlusSymbolImageGenerator.render_xml_file, xml_file, xml_content,
+                                       destination_directory, image_mode, compress_level, writer): index
+                       for index, (xml_file, xml_content) in
+                       enumerate(self.__get_xml_files_with_content(xml_files, archive_dataset))}
+            for future in as_completed(futures):
+                output_paths, pending = future.result()
+                output_paths_of_files[futures[future]] = output_paths
+                writer.write_pending(pending)
+                progress_bar.update()
+        progress_bar.close()
+        writer.flush()
+
+        print("Generated {0} images".format(sum(len(output_paths) for output_paths in output_paths_of_files)))
+        return output_paths_of_files
+
+    @staticmethod
+    def __get_xml_files_with_content(xml_files: List[str], archive_dataset: Optional[ArchiveDataset]) \
+            -> List[Tuple[str, Optional[bytes]]]:
+        # Archives can not be shared with other processes, so their content is read up front
+        if archive_dataset is not None:
+            return [(xml_file, archive_dataset.read_bytes(xml_file)) for xml_file in xml_files]
+        return [(xml_file, None) for xml_file in xml_files]
+
+    def render_masks_of_nodes_into_image(self, nodes: List[Node], destination_directory: str,
+                                         image_mode: Optional[str] = None, compress_level: Optional[int] = None,
+                                         writer: ImageWriter = None):
+        if writer is None:
+            writer = ImageWriter()
+
         for node in tqdm(nodes, desc="Generating images from node masks", smoothing=0.1):  # type: Node
-            symbol_class = node.class_name
-            # Make a copy of the mask to not temper with the original data
-            mask = node.mask.copy()
-            # We want to draw black symbols on white canvas. The mask encodes foreground pixels
-            # that we are interested in with a 1 and background pixels with a 0 and stores those values in
-            # an uint8 numpy array. To use Image.fromarray, we have to generate a greyscale mask, where
-            # white pixels have the value 255 and black pixels have the value 0. To achieve this, we simply
-            # subtract one from each uint, and by exploiting the underflow of the uint we get the following mapping:
-            # 0 (background) => 255 (white) and 1 (foreground) => 0 (black) which is exactly what we wanted.
-            mask -= 1
-            image = Image.fromarray(mask, mode="L")
+            self.__render_node_mask(node, destination_directory, image_mode, compress_level, writer)
 
-            target_directory = os.path.join(destination_directory, symbol_class)
-            os.makedirs(target_directory, exist_ok=True)
+        writer.flush()
 
-            export_path = ExportPath(destination_directory, symbol_class, node.unique_id)
-            image.save(export_path.get_full_path())
+    @staticmethod
+    def __render_node_mask(node: Node, destination_directory: str, image_mode: Optional[str],
+                           compress_level: Optional[int], writer: ImageWriter) -> str:
+        """ Renders the mask of a single node and returns the path of the image """
+        symbol_class = node.class_name
+        # Make a copy of the mask to not temper with the original data
+        mask = node.mask.copy()
+        # We want to draw black symbols on white canvas. The mask encodes foreground pixels
+        # that we are interested in with a 1 and background pixels with a 0 and stores those values in
+        # an uint8 numpy array. To use Image.fromarray, we have to generate a greyscale mask, where
+        # white pixels have the value 255 and black pixels have the value 0. To achieve this, we simply
+        # subtract one from each uint, and by exploiting the underflow of the uint we get the following mapping:
+        # 0 (background) => 255 (white) and 1 (foreground) => 0 (black) which is exactly what we wanted.
+        mask -= 1
+        image = Image.fromarray(mask, mode="L")
+
+        target_directory = os.path.join(destination_directory, symbol_class)
+        os.makedirs(target_directory, exist_ok=True)
+
+        export_path = ExportPath(destination_directory, symbol_class, node.unique_id, image_mode=image_mode,
+                                 compress_level=compress_level)
+        export_path.save(image, writer=writer)
+        return export_path.get_full_path()
 
 
 if __name__ == "__main__":
@@ -79,9 +272,29 @@ if __name__ == "__main__":
         type=str,
         default="../data/muscima_pp/symbols",
         help="The directory, where the generated bitmaps will be created")
+    parser.add_argument("--image_mode", default=None, choices=["RGB", "L", "1"],
+                        help="Optional mode of the generated images: RGB, L for grayscale or 1 for black-and-white "
+                             "images with one bit per pixel")
+    parser.add_argument("--compress_level", default=None, type=int, choices=range(10),
+                        help="Optional PNG compression level from 0 (fastest) to 9 (smallest files)")
+    parser.add_argument("--shard_directory", default=None,
+                        help="Optional directory, into which the images are written as tar-shards, instead of writing "
+                             "one file per image into the image dataset directory")
+    parser.add_argument("--incremental", dest="incremental", action="store_true",
+                        help="Provide this flag, to only render the symbols of xml-files that changed since the last "
+                             "run into the same image dataset directory")
+    parser.set_defaults(incremental=False)
+    parser.add_argument("--workers", default=1, type=int,
+                        help="The number of processes, that load the xml-files and render the symbols")
 
     flags, unparsed = parser.parse_known_args()
 
+    image_writer = None
+    if flags.shard_directory is not None:
+        image_writer = ShardedImageWriter(flags.shard_directory)
+
     muscima_pp_image_generator = MuscimaPlusPlusSymbolImageGenerator()
     muscima_pp_image_generator.extract_and_render_all_symbol_masks(flags.raw_dataset_directory,
-                                                                   flags.image_dataset_directory)
+                                                                   flags.image_dataset_directory,
+                                                                   flags.image_mode, flags.compress_level,
+                                                                   image_writer, flags.incremental, flags.workers)
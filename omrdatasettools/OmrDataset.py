@@ -1,5 +1,12 @@
 from enum import Enum, auto
-from typing import Dict
+from typing import Dict, NamedTuple
+from urllib.parse import urlsplit
+
+
+class ArchiveChecksum(NamedTuple):
+    """ The expected size in bytes and SHA-256 hex-digest of a downloaded dataset archive """
+    size: int
+    sha256: str
 
 
 class OmrDataset(Enum):
@@ -206,7 +213,8 @@ class OmrDataset(Enum):
         """ Returns the name of the downloaded zip file of a dataset.
             Example usage: OmrDataset.Fornes.get_dataset_filename() """
         dataset_url = self.get_dataset_download_url()
-        dataset_filename = dataset_url.split("/")[-1]
+        # Strip query strings like "?download=1", which are not part of the file name
+        dataset_filename = urlsplit(dataset_url).path.split("/")[-1]
         return dataset_filename
 
     def dataset_download_urls(self) -> Dict[str, str]:
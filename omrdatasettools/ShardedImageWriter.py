@@ -0,0 +1,186 @@
+import io
+import itertools
+import json
+import math
+import os
+import tarfile
+from glob import glob
+from pathlib import Path
+from typing import List, Tuple, Iterator
+
+from PIL import Image
+
+from omrdatasettools.ImageWriter import ImageWriter
+
+
+class ShardedImageWriter(ImageWriter):
+    """ Writes the generated images into a few large tar-files (shards) instead of one small file per image, which
+        is much friendlier to network file systems. The shards follow the layout of webdataset: every sample is stored
+        as an image, e.g. 'Quarter-Note/W-01_C-01_3.png', that is followed by its metadata in a json-file with the
+        same key, e.g. 'Quarter-Note/W-01_C-01_3.json'.
+
+        Next to each shard, an index 'shard-....index.json' is written that lists the key, symbol class, source id,
+        stroke thickness, staff-line offset and bounding-box of each sample, together with the position of the
+        image within the tar-file, so single samples can be read without unpacking the shard.
+
+        A shard is completed, whenever it contains the maximum number of samples or when the writer is flushed. The
+        name of each shard contains the id of the process that wrote it, so multiple workers can write into the same
+        directory at the same time. Workers hand the images that did not fill a shard back to the main process (see
+        :meth:`take_pending`), so only the last shard of a dataset is smaller than the maximum. Use an empty directory
+        for each dataset, because shards of previous runs are not removed.
+    """
+
+    stores_individual_files = False
+
+    __shard_counter = itertools.count()
+
+    def __init__(self, shard_directory: str, prefix: str = "shard", maximum_samples_per_shard: int = 10000) -> None:
+        """
+        :param shard_directory: The directory, into which the shards and their indices are written
+        :param prefix: The prefix of the file names of the shards
+        :param maximum_samples_per_shard: The number of images after which a shard is completed
+        """
+        super().__init__()
+        self.shard_directory = shard_directory
+        self.prefix = prefix
+        self.maximum_samples_per_shard = maximum_samples_per_shard
+        self.buffer = []  # type: List[Tuple[str, str, bytes, dict]]
+
+    def write(self, image: Image.Image, path: str, metadata: dict = None, **save_options) -> None:
+        """ Adds the image to the current shard. The key of the sample consists of the last directory, which is the
+            symbol class, and the name of the file of the given path, e.g. 'Quarter-Note/W-01_C-01_3' """
+        path_without_extension, extension = os.path.splitext(path)
+        key = "/".join(Path(path_without_extension).parts[-2:])
+        encoded_image = io.BytesIO()
+        image.save(encoded_image, format=Image.registered_extensions()[extension.lower()], **save_options)
+
+        if metadata is None:
+            metadata = {"class": Path(path).parent.name}
+        self.write_pending([(key, extension, encoded_image.getvalue(), metadata)])
+
+    def take_pending(self) -> List[Tuple[str, str, bytes, dict]]:
+        """ Returns the encoded images, that did not fill a shard yet, so they are added to the shards of the main
+            process instead of being written as a small shard by every worker """
+        pending, self.buffer = self.buffer, []
+        return pending
+
+    def write_pending(self, pending: List[Tuple[str, str, bytes, dict]]) -> None:
+        for sample in pending:
+            self.buffer.append(sample)
+            if len(self.buffer) >= self.maximum_samples_per_shard:
+                self.flush()
+
+    def flush(self) -> None:
+        """ Writes all buffered images into a new shard """
+        if not self.buffer:
+            return
+
+        os.makedirs(self.shard_directory, exist_ok=True)
+        shard_name = self.__get_unused_shard_name()
+        shard_path = os.path.join(self.shard_directory, shard_name + ".tar")
+        index = []
+
+        # Write into a temporary file first, so readers never see an incomplete shard
+        with tarfile.open(shard_path + ".tmp", "w") as shard:
+            for key, extension, content, metadata in self.buffer:
+                position = self.__add_member(shard, key + extension, content)
+                metadata_content = json.dumps(metadata, sort_keys=True).encode("utf-8")
+                self.__add_member(shard, key + ".json", metadata_content)
+                index.append(dict(metadata, key=key, image=key + extension, position=position,
+                                  size=len(content)))
+        os.replace(shard_path + ".tmp", shard_path)
+
+        with open(os.path.join(self.shard_directory, shard_name + ".index.json"), "w") as index_file:
+            json.dump({"shard": shard_name + ".tar", "samples": index}, index_file)
+        self.buffer = []
+
+    def __get_unused_shard_name(self) -> str:
+        while True:
+            shard_name = "{0}-{1}-{2:06d}".format(self.prefix, os.getpid(), next(ShardedImageWriter.__shard_counter))
+            if not os.path.exists(os.path.join(self.shard_directory, shard_name + ".tar")):
+                return shard_name
+
+    @staticmethod
+    def __add_member(shard: tarfile.TarFile, name: str, content: bytes) -> int:
+        """ Adds a file with the given content to the tar-file and returns the position of the content """
+        member = tarfile.TarInfo(name)
+        member.size = len(content)
+        shard.addfile(member, io.BytesIO(content))
+        # The content is followed by padding up to the next full block
+        return shard.offset - math.ceil(member.size / tarfile.BLOCKSIZE) * tarfile.BLOCKSIZE
+
+    def __getstate__(self):
+        # Buffered images are never copied into worker processes
+        state = self.__dict__.copy()
+        state["buffer"] = []
+        return state
+
+
+class ShardedImageReader:
+    """ Reads the samples that were written by a :class:`ShardedImageWriter`.
+
+        Examples
+        --------
+        >>> reader = ShardedImageReader("data/homus_shards")
+        >>> for image, metadata in reader:
+        >>>     print(metadata["class"], metadata["stroke_thickness"], image.size)
+    """
+
+    def __init__(self, shard_directory: str, prefix: str = "shard") -> None:
+        """
+        :param shard_directory: The directory, that contains the shards and their indices
+        :param prefix: The prefix of the file names of the shards
+        """
+        super().__init__()
+        self.shard_directory = shard_directory
+        self.shard_paths = sorted(glob(os.path.join(shard_directory, prefix + "-*.tar")))
+
+    def read_index(self) -> List[dict]:
+        """
+        :return: The index entries of all samples with the keys 'key', 'class', 'source_id', 'stroke_thickness',
+                 'offset', 'bounding_box', 'shard', 'image', 'position' and 'size', in the order of the shards
+        """
+        entries = []
+        for shard_path in self.shard_paths:
+            with open(shard_path[:-len(".tar")] + ".index.json") as index_file:
+                index = json.load(index_file)
+            entries.extend(dict(sample, shard=index["shard"]) for sample in index["samples"])
+        return entries
+
+    def read(self, entry: dict) -> Image.Image:
+        """ Reads the image of a single entry of :meth:`read_index` directly from its position within the shard """
+        with open(os.path.join(self.shard_directory, entry["shard"]), "rb") as shard:
+            shard.seek(entry["position"])
+            return self.__decode(shard.read(entry["size"]))
+
+    def __iter__(self) -> Iterator[Tuple[Image.Image, dict]]:
+        """ Streams all samples shard by shard, reading each shard sequentially from beginning to end. The members of a
+            sample are grouped by their key, so the image and its metadata may appear in any order within the shard. """
+        for shard_path in self.shard_paths:
+            with tarfile.open(shard_path, "r|") as shard:
+                incomplete_samples = {}  # Maps the key of a sample to the members that were read so far
+                for member in shard:
+                    key, extension = os.path.splitext(member.name)
+                    part = "metadata" if extension == ".json" else "image"
+                    sample = incomplete_samples.setdefault(key, {})
+                    if part in sample:
+                        raise Exception("Sample {0} in shard {1} contains more than one {2}"
+                                        .format(key, shard_path, part))
+                    sample[part] = shard.extractfile(member).read()
+                    if len(sample) == 2:
+                        del incomplete_samples[key]
+                        metadata = json.loads(sample["metadata"].decode("utf-8"))
+                        metadata["key"] = key
+                        yield self.__decode(sample["image"]), metadata
+                if incomplete_samples:
+                    raise Exception("Samples in shard {0} are incomplete, because they lack an image or metadata: {1}"
+                                    .format(shard_path, ", ".join(sorted(incomplete_samples))))
+
+    def __len__(self) -> int:
+        return len(self.read_index())
+
+    @staticmethod
+    def __decode(content: bytes) -> Image.Image:
+        image = Image.open(io.BytesIO(content))
+        image.load()
+        return image
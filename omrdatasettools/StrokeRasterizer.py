@@ -0,0 +1,222 @@
+from typing import List, Optional, Tuple
+
+import numpy
+
+
+class StrokeRasterizer:
+    """ Draws the strokes of handwritten symbols as polylines into a single-channel uint8 canvas. Instead of drawing
+        one line after another, the pixels of all segments of all strokes are computed in a single vectorized pass
+        and set at once.
+
+        Without anti-aliasing, the result is the same as drawing each segment with ``ImageDraw.line`` of the same
+        width: Thin lines are sampled once per pixel along their major axis and wide lines are filled row by row as
+        the same parallelograms, that Pillow fills. The emulation was checked against Pillow 12.3, the tests compare it
+        with images that were drawn by that version.
+    """
+
+    @staticmethod
+    def draw_strokes(canvas: numpy.ndarray, strokes: List[numpy.ndarray], stroke_thickness: int,
+                     anti_aliasing: bool = False, maximum_squared_segment_length: Optional[float] = None,
+                     value: int = 0) -> numpy.ndarray:
+        """
+        Draws lines that connect the consecutive points of each stroke into the canvas
+
+        :param canvas: The uint8 array of shape (height, width) that is drawn into
+        :param strokes: The strokes as arrays of shape (number_of_points, 2) with x and y in canvas coordinates
+        :param stroke_thickness: The thickness of the lines in pixels
+        :param anti_aliasing: True, if the edges of the lines should be blended with the canvas according to the
+                              fraction of each pixel that is covered by the line
+        :param maximum_squared_segment_length: Segments whose squared length exceeds this value are not drawn,
+                                               e.g. because the pen was lifted in between. If None is provided,
+                                               all segments are drawn
+        :param value: The intensity of the lines
+        :return: The canvas
+        """
+        starts, ends = StrokeRasterizer.get_segments(strokes, maximum_squared_segment_length)
+        if len(starts) == 0:
+            return canvas
+
+        height, width = canvas.shape
+        if anti_aliasing:
+            pixels, coverage = StrokeRasterizer.__rasterize_anti_aliased(starts, ends, stroke_thickness)
+        else:
+            # Like ImageDraw.line, the end points are truncated to whole pixels
+            pixels = StrokeRasterizer.__rasterize(numpy.trunc(starts), numpy.trunc(ends), stroke_thickness)
+            coverage = None
+
+        inside = (pixels[:, 0] >= 0) & (pixels[:, 0] < width) & (pixels[:, 1] >= 0) & (pixels[:, 1] < height)
+        pixels = pixels[inside]
+        if coverage is None:
+            canvas[pixels[:, 1], pixels[:, 0]] = value
+            return canvas
+
+        # A pixel that is covered by multiple segments takes the largest coverage
+        coverage_of_canvas = numpy.zeros(canvas.shape, dtype=numpy.float32)
+        numpy.maximum.at(coverage_of_canvas, (pixels[:, 1], pixels[:, 0]), coverage[inside])
+        blended = canvas + (float(value) - canvas) * coverage_of_canvas
+        canvas[...] = numpy.clip(numpy.floor(blended + 0.5), 0, 255).astype(numpy.uint8)
+        return canvas
+
+    @staticmethod
+    def get_segments(strokes: List[numpy.ndarray],
+                     maximum_squared_segment_length: Optional[float] = None) -> Tuple[numpy.ndarray, numpy.ndarray]:
+        """
+        Returns the start and end points of all segments of the strokes as two float64 arrays of shape
+        (number_of_segments, 2), without the segments that are longer than allowed
+        """
+        starts = [numpy.asarray(stroke, dtype=numpy.float64)[:-1] for stroke in strokes if len(stroke) > 1]
+        ends = [numpy.asarray(stroke, dtype=numpy.float64)[1:] for stroke in strokes if len(stroke) > 1]
+        if not starts:
+            return numpy.zeros((0, 2)), numpy.zeros((0, 2))
+
+        starts, ends = numpy.concatenate(starts), numpy.concatenate(ends)
+        if maximum_squared_segment_length is not None:
+            keep = numpy.sum(numpy.square(ends - starts), axis=1) <= maximum_squared_segment_length
+            starts, ends = starts[keep], ends[keep]
+        return starts, ends
+
+    @staticmethod
+    def __rasterize(starts: numpy.ndarray, ends: numpy.ndarray, stroke_thickness: int) -> numpy.ndarray:
+        if stroke_thickness <= 1:
+            return StrokeRasterizer.__rasterize_thin_lines(starts, ends)
+
+        # Like ImageDraw.line, a wide segment is filled as the parallelogram that is spanned by the segment and its
+        # normal, whose integer corners are placed (width - 1) / 2 pixels to either side of the segment, while
+        # a segment without length is drawn as a single point
+        directions = ends - starts
+        lengths = numpy.sqrt(numpy.sum(numpy.square(directions), axis=1))
+        points = lengths == 0
+        lengths[points] = 1
+        half_thickness = (stroke_thickness - 1) / 2
+        ratio_maximum = (numpy.floor(half_thickness + 0.5) / lengths)[:, numpy.newaxis]
+        ratio_minimum = (numpy.ceil(half_thickness - 0.5) / lengths)[:, numpy.newaxis]
+        minimum_offsets = StrokeRasterizer.__round_down(ratio_minimum * directions)
+        maximum_offsets = StrokeRasterizer.__round_down(ratio_maximum * directions)
+        first_corners = starts + numpy.stack([-minimum_offsets[:, 1], maximum_offsets[:, 0]], axis=1)
+        last_corners = starts + numpy.stack([maximum_offsets[:, 1], -minimum_offsets[:, 0]], axis=1)
+        corners = numpy.stack([first_corners, first_corners + directions, last_corners + directions, last_corners],
+                              axis=1)
+
+        return numpy.concatenate([StrokeRasterizer.__fill_parallelograms(corners[~points]),
+                                  starts[points].astype(numpy.int64)])
+
+    @staticmethod
+    def __rasterize_thin_lines(starts: numpy.ndarray, ends: numpy.ndarray) -> numpy.ndarray:
+        samples, segment_indices = StrokeRasterizer.__sample_segments(starts, ends)
+        # Like ImageDraw.line, samples half-way between two pixels are rounded towards the end of the segment
+        towards_end = (ends >= starts)[segment_indices]
+        return numpy.where(towards_end, numpy.floor(samples + 0.5), numpy.ceil(samples - 0.5)).astype(numpy.int64)
+
+    @staticmethod
+    def __fill_parallelograms(corners: numpy.ndarray) -> numpy.ndarray:
+        """
+        Returns the pixels of the parallelograms with the given integer corners of shape (number_of_polygons, 4, 2),
+        following the scan-line fill of ImageDraw: Each row between the top-most and bottom-most corner is filled
+        from the left-most to the right-most intersection with the edges, rounded to the nearest pixel with
+        half-way positions being filled
+        """
+        top, bottom = corners[..., 1].min(axis=1), corners[..., 1].max(axis=1)
+        number_of_rows = (bottom - top).astype(numpy.int64) + 1
+        rows = numpy.repeat(top, number_of_rows) + StrokeRasterizer.__get_positions_within_groups(number_of_rows)
+
+        # Like ImageDraw, the intersections of each edge are computed from its upper end in single precision,
+        # which decides about the half-way positions
+        edge_starts = corners.transpose((1, 0, 2)).astype(numpy.float32)
+        edge_ends = numpy.roll(edge_starts, -1, axis=0)
+        upper_ends = numpy.where((edge_starts[..., 1] <= edge_ends[..., 1])[..., numpy.newaxis], edge_starts, edge_ends)
+        heights = edge_ends[..., 1] - edge_starts[..., 1]
+        horizontal = heights == 0
+        slopes = (edge_ends[..., 0] - edge_starts[..., 0]) / numpy.where(horizontal, 1, heights)
+
+        # Each row of a parallelogram lies between both edges of each pair of opposite edges, unless these are
+        # horizontal, in which case the row spans from the left-most to the right-most corner
+        values_of_rows = numpy.repeat(numpy.concatenate([
+            upper_ends[..., 0], upper_ends[..., 1], slopes, horizontal[:2].astype(numpy.float32),
+            corners[numpy.newaxis, :, :, 0].min(axis=2), corners[numpy.newaxis, :, :, 0].max(axis=2)],
+            dtype=numpy.float32), number_of_rows, axis=1)
+        upper_x, upper_y, slopes_of_rows = values_of_rows[0:4], values_of_rows[4:8], values_of_rows[8:12]
+        intersections = (rows.astype(numpy.float32) - upper_y) * slopes_of_rows + upper_x
+        first_columns, last_columns = values_of_rows[14], values_of_rows[15]
+        for first_edge, second_edge in [(0, 2), (1, 3)]:
+            sloped = values_of_rows[12 + first_edge] == 0
+            first_columns = numpy.where(sloped, numpy.maximum(first_columns, numpy.minimum(
+                intersections[first_edge], intersections[second_edge])), first_columns)
+            last_columns = numpy.where(sloped, numpy.minimum(last_columns, numpy.maximum(
+                intersections[first_edge], intersections[second_edge])), last_columns)
+
+        first_columns = numpy.sign(first_columns) * numpy.floor(numpy.abs(first_columns) + 0.5)
+        last_columns = StrokeRasterizer.__round_down(last_columns)
+        filled = last_columns >= first_columns
+        return StrokeRasterizer.__expand_rows(rows[filled], first_columns[filled], last_columns[filled])[0]
+
+    @staticmethod
+    def __rasterize_anti_aliased(starts: numpy.ndarray, ends: numpy.ndarray,
+                                 stroke_thickness: int) -> Tuple[numpy.ndarray, numpy.ndarray]:
+        # Each pixel is covered by the line to the extent, that its center is closer to the segment than half the
+        # stroke thickness, which approximates the covered area of the pixel. The ends of the segments are round.
+        radius = stroke_thickness / 2
+        reach = radius + 0.5
+
+        # Each row of a segment is searched for covered pixels from the left-most to the right-most position of the
+        # segment within reach of the row, extended by the reach to both sides
+        top = numpy.floor(numpy.minimum(starts[:, 1], ends[:, 1]) - reach)
+        bottom = numpy.ceil(numpy.maximum(starts[:, 1], ends[:, 1]) + reach)
+        number_of_rows = (bottom - top).astype(numpy.int64) + 1
+        segment_indices = numpy.repeat(numpy.arange(len(starts)), number_of_rows)
+        rows = top[segment_indices] + StrokeRasterizer.__get_positions_within_groups(number_of_rows)
+
+        start, end = starts[segment_indices], ends[segment_indices]
+        vertical_distance = end[:, 1] - start[:, 1]
+        flat = vertical_distance == 0
+        vertical_distance[flat] = 1
+        first_fraction = numpy.clip((rows - reach - start[:, 1]) / vertical_distance, 0, 1)
+        last_fraction = numpy.clip((rows + reach - start[:, 1]) / vertical_distance, 0, 1)
+        first_fraction[flat], last_fraction[flat] = 0, 1
+        x_positions = start[:, 0, numpy.newaxis] + (end[:, 0] - start[:, 0])[:, numpy.newaxis] * numpy.stack(
+            [first_fraction, last_fraction], axis=1)
+        first_columns = numpy.floor(x_positions.min(axis=1) - reach)
+        last_columns = numpy.ceil(x_positions.max(axis=1) + reach)
+
+        pixels, row_indices = StrokeRasterizer.__expand_rows(rows, first_columns, last_columns)
+        segment_indices = segment_indices[row_indices]
+        distances = StrokeRasterizer.__distance_to_segments(pixels, starts[segment_indices], ends[segment_indices])
+        coverage = numpy.clip(radius + 0.5 - distances, 0, 1).astype(numpy.float32)
+        covered = coverage > 0
+        return pixels[covered], coverage[covered]
+
+    @staticmethod
+    def __sample_segments(starts: numpy.ndarray, ends: numpy.ndarray) -> Tuple[numpy.ndarray, numpy.ndarray]:
+        # One sample per pixel along the major axis of each segment, including both end points
+        steps = numpy.maximum(numpy.ceil(numpy.abs(ends - starts).max(axis=1)), 1).astype(numpy.int64)
+        segment_indices = numpy.repeat(numpy.arange(len(starts)), steps + 1)
+        fractions = StrokeRasterizer.__get_positions_within_groups(steps + 1) / steps[segment_indices]
+        samples = starts[segment_indices] + (ends - starts)[segment_indices] * fractions[:, numpy.newaxis]
+        return samples, segment_indices
+
+    @staticmethod
+    def __expand_rows(rows: numpy.ndarray, first_columns: numpy.ndarray,
+                      last_columns: numpy.ndarray) -> Tuple[numpy.ndarray, numpy.ndarray]:
+        """ Returns the pixels from the first to the last column of each row and the index of the row of each pixel """
+        lengths = (last_columns - first_columns).astype(numpy.int64) + 1
+        row_indices = numpy.repeat(numpy.arange(len(rows)), lengths)
+        columns = first_columns[row_indices] + StrokeRasterizer.__get_positions_within_groups(lengths)
+        return numpy.stack([columns, rows[row_indices]], axis=1).astype(numpy.int64), row_indices
+
+    @staticmethod
+    def __get_positions_within_groups(group_sizes: numpy.ndarray) -> numpy.ndarray:
+        """ Returns 0, 1, ..., group_sizes[0] - 1, 0, 1, ..., group_sizes[1] - 1, ... """
+        first_position_of_group = numpy.repeat(numpy.cumsum(group_sizes) - group_sizes, group_sizes)
+        return numpy.arange(len(first_position_of_group)) - first_position_of_group
+
+    @staticmethod
+    def __distance_to_segments(points: numpy.ndarray, starts: numpy.ndarray, ends: numpy.ndarray) -> numpy.ndarray:
+        directions = ends - starts
+        squared_lengths = numpy.maximum(numpy.sum(numpy.square(directions), axis=1), 1e-12)
+        projections = numpy.clip(numpy.sum((points - starts) * directions, axis=1) / squared_lengths, 0, 1)
+        closest_points = starts + directions * projections[:, numpy.newaxis]
+        return numpy.sqrt(numpy.sum(numpy.square(points - closest_points), axis=1))
+
+    @staticmethod
+    def __round_down(values: numpy.ndarray) -> numpy.ndarray:
+        # Rounds half-way values towards zero, like ImageDraw
+        return numpy.sign(values) * numpy.ceil(numpy.abs(values) - 0.5)
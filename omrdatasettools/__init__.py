@@ -1,13 +1,26 @@
 from ._version import __version__ as version
+from .ArchiveCache import ArchiveCache
+from .ArchiveDataset import ArchiveDataset
+from .BandwidthLimiter import BandwidthLimiter
+from .BuildManifest import BuildManifest
 from .AudiverisOmrImageGenerator import AudiverisOmrImageGenerator
 from .CapitanImageGenerator import CapitanImageGenerator
+from .DatasetIndex import DatasetIndex
+from .DatasetDownloadScheduler import DatasetDownloadScheduler, DatasetDownloadReport
 from .Downloader import Downloader
+from .HomusAugmentationStream import HomusAugmentationStream
 from .HomusImageGenerator import HomusImageGenerator
+from .ImageWriter import ImageWriter, BatchedImageWriter
 from .MeasureVisualizer import MeasureVisualizer
 from .MuscimaPlusPlusMaskImageGenerator import MuscimaPlusPlusMaskImageGenerator
+from .MuscimaPlusPlusPageIndex import MuscimaPlusPlusPageIndex
 from .MuscimaPlusPlusSymbolImageGenerator import MuscimaPlusPlusSymbolImageGenerator
-from .OmrDataset import OmrDataset
+from .OmrDataset import OmrDataset, ArchiveChecksum
+from .ShardedImageWriter import ShardedImageWriter, ShardedImageReader
 
 __version__ = version
-__all__ = ['Downloader', 'OmrDataset', 'AudiverisOmrImageGenerator', 'CapitanImageGenerator', 'HomusImageGenerator',
-           'MeasureVisualizer', 'MuscimaPlusPlusSymbolImageGenerator', 'MuscimaPlusPlusMaskImageGenerator']
+__all__ = ['Downloader', 'OmrDataset', 'ArchiveChecksum', 'ArchiveCache', 'ArchiveDataset', 'BandwidthLimiter',
+           'DatasetDownloadScheduler', 'DatasetDownloadReport', 'AudiverisOmrImageGenerator', 'CapitanImageGenerator',
+           'HomusImageGenerator', 'HomusAugmentationStream', 'MeasureVisualizer', 'MuscimaPlusPlusSymbolImageGenerator',
+           'MuscimaPlusPlusMaskImageGenerator', 'MuscimaPlusPlusPageIndex', 'ImageWriter', 'BatchedImageWriter',
+           'ShardedImageWriter', 'ShardedImageReader', 'BuildManifest', 'DatasetIndex']
@@ -0,0 +1,95 @@
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+
+class LocalHttpServer(ThreadingHTTPServer):
+    """ A small stand-in for the servers that host the datasets. Serves the bytes registered in ``files`` and
+        optionally supports HTTP range requests, so the downloader can be tested without network access.
+    """
+
+    daemon_threads = True
+
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), LocalHttpRequestHandler)
+        self.files = dict()  # The content of each path
+        self.supports_ranges = True
+        self.failures = dict()  # Number of times a path responds with 503 before succeeding
+        self.truncations = dict()  # Number of bytes of the body that are sent before closing
+        self.requests = []  # The method, path, range header and client port of each request
+        self.requests_lock = threading.Lock()
+
+    def url(self, path: str) -> str:
+        return "http://127.0.0.1:{0}/{1}".format(self.server_address[1], path.lstrip("/"))
+
+
+class LocalHttpRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_HEAD(self):
+        self.__respond(send_body=False)
+
+    def do_GET(self):
+        self.__respond(send_body=True)
+
+    def __respond(self, send_body: bool):
+        server = self.server  # type: LocalHttpServer
+        path = self.path.split("?")[0]
+        with server.requests_lock:
+            server.requests.append({"method": self.command, "path": path, "range": self.headers.get("Range"),
+                                    "client_port": self.client_address[1]})
+            failing = server.failures.get(path, 0) > 0
+            if failing:
+                server.failures[path] -= 1
+
+        if failing:
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        if path not in server.files:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        content = server.files[path]
+        range_header = self.headers.get("Range")
+        match = re.match(r"bytes=(\d+)-(\d*)", range_header or "")
+        if server.supports_ranges and match:
+            start = int(match.group(1))
+            end = int(match.group(2)) if match.group(2) else len(content) - 1
+            end = min(end, len(content) - 1)
+            body = content[start:end + 1]
+            self.send_response(206)
+            self.send_header("Content-Range", "bytes {0}-{1}/{2}".format(start, end, len(content)))
+        else:
+            body = content
+            self.send_response(200)
+
+        if server.supports_ranges:
+            self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if send_body and path in server.truncations:
+            # Announce the entire body, but close the connection early
+            self.wfile.write(body[:server.truncations.pop(path)])
+            self.close_connection = True
+        elif send_body:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Keep the test output clean
+
+
+@pytest.fixture
+def http_server():
+    server = LocalHttpServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
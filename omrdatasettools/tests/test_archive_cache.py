@@ -0,0 +1,184 @@
+import io
+import json
+import os
+from pathlib import Path
+from zipfile import ZipFile
+
+import pytest
+
+from omrdatasettools.ArchiveCache import ArchiveCache
+from omrdatasettools.Downloader import Downloader
+from omrdatasettools.OmrDataset import ArchiveChecksum
+
+
+def create_zip_archive(files: dict) -> bytes:
+    buffer = io.BytesIO()
+    with ZipFile(buffer, "w") as archive:
+        for name, content in files.items():
+            archive.writestr(name, content)
+    return buffer.getvalue()
+
+
+class TestArchiveCache:
+
+    def test_cached_archive_skips_the_network(self, http_server, tmp_path: Path):
+        # Arrange
+        http_server.files["/dataset.zip"] = create_zip_archive({"symbols/a.txt": "a"})
+        url = http_server.url("dataset.zip")
+        downloader = Downloader(ArchiveCache(tmp_path / "cache"))
+
+        # Act
+        downloader.download_and_extract_custom_dataset("dataset", url, "dataset.zip", tmp_path / "first", None)
+        number_of_requests_after_first_download = len(http_server.requests)
+        downloader.download_and_extract_custom_dataset("dataset", url, "dataset.zip", tmp_path / "second", None)
+
+        # Assert
+        assert number_of_requests_after_first_download == 1
+        assert len(http_server.requests) == 1
+        assert (tmp_path / "second" / "symbols" / "a.txt").read_text() == "a"
+
+    def test_expected_checksum_is_looked_up_by_content(self, http_server, tmp_path: Path):
+        # Arrange
+        content = create_zip_archive({"a.txt": "a"})
+        http_server.files["/dataset.zip"] = content
+        http_server.files["/mirror/dataset.zip"] = content
+        cache = ArchiveCache(tmp_path / "cache")
+        downloader = Downloader(cache)
+        downloader.download_archive(http_server.url("dataset.zip"), "dataset.zip")
+        checksum = ArchiveCache.compute_checksum(cache.lookup(http_server.url("dataset.zip")))
+
+        # Act
+        archive = downloader.download_archive(http_server.url("mirror/dataset.zip"), "dataset.zip",
+                                              expected_checksum=checksum)
+
+        # Assert
+        assert len(http_server.requests) == 1
+        assert archive.read_bytes() == content
+
+    def test_archive_without_known_checksum_is_not_reported_as_verified(self, http_server, tmp_path: Path, capsys):
+        # Arrange
+        content = create_zip_archive({"a.txt": "a"})
+        http_server.files["/dataset.zip"] = content
+        http_server.files["/verified/dataset.zip"] = content
+        cache = ArchiveCache(tmp_path / "cache")
+        downloader = Downloader(cache)
+
+        # Act
+        downloader.download_archive(http_server.url("dataset.zip"), "dataset.zip")
+        downloader.download_archive(http_server.url("dataset.zip"), "dataset.zip")
+        output = capsys.readouterr().out
+        checksum = ArchiveCache.compute_checksum(cache.lookup(http_server.url("dataset.zip")))
+        downloader.download_archive(http_server.url("verified/dataset.zip"), "dataset.zip", expected_checksum=checksum)
+        cache.lookup(http_server.url("dataset.zip")).unlink()
+        downloader.download_archive(http_server.url("verified/dataset.zip"), "dataset.zip", expected_checksum=checksum)
+
+        # Assert
+        assert "so its integrity could not be verified" in output
+        assert "which could not be verified" in output
+        assert not cache.is_verified(http_server.url("dataset.zip"))
+        assert cache.is_verified(http_server.url("verified/dataset.zip"))
+
+    def test_corrupted_archive_is_downloaded_again(self, http_server, tmp_path: Path):
+        # Arrange
+        content = create_zip_archive({"a.txt": "a"})
+        http_server.files["/dataset.zip"] = content
+        cache = ArchiveCache(tmp_path / "cache")
+        downloader = Downloader(cache)
+        archive = downloader.download_archive(http_server.url("dataset.zip"), "dataset.zip")
+        archive.write_bytes(content[:-10] + b"\0" * 10)  # Truncated and padded to the same size
+
+        # Act
+        lookup_of_corrupted_archive = cache.lookup(http_server.url("dataset.zip"))
+        archive = downloader.download_archive(http_server.url("dataset.zip"), "dataset.zip")
+
+        # Assert
+        assert lookup_of_corrupted_archive is None
+        assert len(http_server.requests) == 2
+        assert archive.read_bytes() == content
+        assert cache.lookup(http_server.url("dataset.zip")) == archive
+
+    def test_ambiguous_cache_object_is_not_used(self, http_server, tmp_path: Path):
+        # Arrange
+        http_server.files["/dataset.zip"] = create_zip_archive({"a.txt": "a"})
+        cache = ArchiveCache(tmp_path / "cache")
+        archive = Downloader(cache).download_archive(http_server.url("dataset.zip"), "dataset.zip")
+        archive.with_name("other.zip").write_bytes(archive.read_bytes())
+
+        # Act
+        cached_archive = cache.lookup(http_server.url("dataset.zip"))
+
+        # Assert
+        assert cached_archive is None
+
+    def test_checksum_mismatch_is_rejected(self, http_server, tmp_path: Path):
+        # Arrange
+        http_server.files["/dataset.zip"] = create_zip_archive({"a.txt": "a"})
+        cache = ArchiveCache(tmp_path / "cache")
+        downloader = Downloader(cache)
+        wrong_checksum = ArchiveChecksum(10, "0" * 64)
+
+        # Act & Assert
+        with pytest.raises(Exception, match="Integrity check"):
+            downloader.download_archive(http_server.url("dataset.zip"), "dataset.zip",
+                                        expected_checksum=wrong_checksum)
+        assert cache.lookup(http_server.url("dataset.zip")) is None
+
+    def test_hash_of_parallel_download_is_computed_while_streaming(self, http_server, tmp_path: Path):
+        # Arrange
+        content = os.urandom(100000)
+        http_server.files["/dataset.zip"] = content
+        cache = ArchiveCache(tmp_path / "cache")
+        downloader = Downloader(cache)
+        expected_checksum = ArchiveCache.compute_checksum(self.__write(tmp_path / "reference.zip", content))
+
+        # Act
+        archive = downloader.download_archive(http_server.url("dataset.zip"), "dataset.zip", number_of_connections=3,
+                                              expected_checksum=expected_checksum)
+
+        # Assert
+        assert archive.read_bytes() == content
+
+    def test_least_recently_used_archives_are_evicted(self, http_server, tmp_path: Path):
+        # Arrange
+        for name in ["a", "b", "c"]:
+            http_server.files["/{0}.zip".format(name)] = os.urandom(1000)
+        cache = ArchiveCache(tmp_path / "cache", maximum_size=2500)
+        downloader = Downloader(cache)
+
+        # Act
+        first = downloader.download_archive(http_server.url("a.zip"), "a.zip")
+        second = downloader.download_archive(http_server.url("b.zip"), "b.zip")
+        os.utime(second, (1, 1))  # Pretend that b has not been used for a long time
+        os.utime(first, (2, 2))
+        downloader.download_archive(http_server.url("c.zip"), "c.zip")
+
+        # Assert
+        assert cache.lookup(http_server.url("a.zip")) is not None
+        assert cache.lookup(http_server.url("b.zip")) is None
+        assert cache.lookup(http_server.url("c.zip")) is not None
+
+    def test_archives_in_use_are_not_evicted(self, http_server, tmp_path: Path):
+        # Arrange
+        for name in ["a", "b", "c"]:
+            http_server.files["/{0}.zip".format(name)] = os.urandom(1000)
+        cache = ArchiveCache(tmp_path / "cache", maximum_size=2500)
+        downloader = Downloader(cache)
+        first = downloader.download_archive(http_server.url("a.zip"), "a.zip")
+        second = downloader.download_archive(http_server.url("b.zip"), "b.zip")
+        os.utime(second, (1, 1))
+        os.utime(first, (2, 2))
+
+        # Act
+        with cache.use(second):
+            downloader.download_archive(http_server.url("c.zip"), "c.zip")
+
+        # Assert
+        assert second.exists()
+        assert not first.exists()
+        index = json.loads(cache.index_path.read_text())
+        assert sorted(index.keys()) == [http_server.url("b.zip"), http_server.url("c.zip")]
+
+    @staticmethod
+    def __write(path: Path, content: bytes) -> Path:
+        path.write_bytes(content)
+        return path
@@ -0,0 +1,111 @@
+import io
+import os
+import tarfile
+from glob import glob
+from pathlib import Path
+from zipfile import ZipFile
+
+import pytest
+from PIL import Image
+
+from omrdatasettools.ArchiveDataset import ArchiveDataset
+from omrdatasettools.CapitanImageGenerator import CapitanImageGenerator
+from omrdatasettools.HomusImageGenerator import HomusImageGenerator
+
+HOMUS_SYMBOLS = {
+    "HOMUS/W-01/1-1.txt": "Quarter-Note\n10,10;20,20;30,30;\n",
+    "HOMUS/W-01/1-2.txt": "Whole-Note\n10,10;15,25;20,10;\n",
+}
+
+
+def png_bytes() -> bytes:
+    buffer = io.BytesIO()
+    Image.new("L", (7, 5), 255).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def zip_archive(tmp_path: Path) -> Path:
+    archive_path = tmp_path / "HOMUS.zip"
+    with ZipFile(archive_path, "w") as archive:
+        for name, content in HOMUS_SYMBOLS.items():
+            archive.writestr(name, content)
+        archive.writestr("HOMUS/image.png", png_bytes())
+    return archive_path
+
+
+@pytest.fixture
+def tar_archive(tmp_path: Path) -> Path:
+    archive_path = tmp_path / "HOMUS.tar.gz"
+    with tarfile.open(archive_path, "w:gz") as archive:
+        for name, content in list(HOMUS_SYMBOLS.items()) + [("HOMUS/image.png", png_bytes())]:
+            content = content.encode("utf-8") if isinstance(content, str) else content
+            member = tarfile.TarInfo(name)
+            member.size = len(content)
+            archive.addfile(member, io.BytesIO(content))
+    return archive_path
+
+
+class TestArchiveDataset:
+
+    @pytest.mark.parametrize("archive_fixture", ["zip_archive", "tar_archive"])
+    def test_list_and_read_files(self, archive_fixture: str, request):
+        # Arrange
+        archive = request.getfixturevalue(archive_fixture)
+
+        # Act
+        with ArchiveDataset(archive) as dataset:
+            text_files = dataset.glob("*.txt")
+            content = dataset.read_text("HOMUS/W-01/1-2.txt")
+            image = dataset.load_image("HOMUS/image.png")
+
+        # Assert
+        assert text_files == ["HOMUS/W-01/1-1.txt", "HOMUS/W-01/1-2.txt"]
+        assert content == HOMUS_SYMBOLS["HOMUS/W-01/1-2.txt"]
+        assert image.size == (7, 5)
+
+    def test_tar_index_is_reused(self, tar_archive: Path, capsys):
+        # Arrange
+        ArchiveDataset(tar_archive).close()
+        capsys.readouterr()
+
+        # Act
+        with ArchiveDataset(tar_archive) as dataset:
+            content = dataset.read_text("HOMUS/W-01/1-1.txt")
+
+        # Assert
+        assert "Indexing" not in capsys.readouterr().out
+        assert (tar_archive.parent / "HOMUS.tar.gz.index.json").exists()
+        assert content == HOMUS_SYMBOLS["HOMUS/W-01/1-1.txt"]
+
+    def test_materialize_creates_temporary_file(self, zip_archive: Path):
+        # Act
+        with ArchiveDataset(zip_archive) as dataset:
+            with dataset.materialize("HOMUS/W-01/1-1.txt") as path:
+                content = Path(path).read_text()
+
+        # Assert
+        assert content == HOMUS_SYMBOLS["HOMUS/W-01/1-1.txt"]
+        assert not os.path.exists(path)
+
+    def test_homus_images_from_archive(self, zip_archive: Path, tmp_path: Path):
+        # Act
+        with ArchiveDataset(zip_archive) as dataset:
+            HomusImageGenerator.create_images(dataset, str(tmp_path / "images"), [3], 96, 96)
+
+        # Assert
+        all_image_files = [y for x in os.walk(tmp_path / "images") for y in glob(os.path.join(x[0], '*.png'))]
+        assert len(all_image_files) == 2
+
+    def test_capitan_symbols_from_archive(self, tmp_path: Path):
+        # Arrange
+        test_data = (Path(__file__).parent / "testdata" / "capitan_testdata.txt").read_text()
+        with ZipFile(tmp_path / "BimodalHandwrittenSymbols.zip", "w") as archive:
+            archive.writestr("BimodalHandwrittenSymbols/data", test_data)
+
+        # Act
+        with ArchiveDataset(tmp_path / "BimodalHandwrittenSymbols.zip") as dataset:
+            symbols = CapitanImageGenerator().load_capitan_symbols(dataset)
+
+        # Assert
+        assert len(symbols) == 3
@@ -0,0 +1,78 @@
+import io
+import tarfile
+from pathlib import Path
+from zipfile import ZipFile, ZIP_DEFLATED
+
+import pytest
+
+from omrdatasettools.ArchiveExtractor import ArchiveExtractor
+
+MEMBERS = {
+    "fulls/CVC-MUSCIMA_W-01_N-10_D-ideal.png": b"full 1" * 1000,
+    "fulls/CVC-MUSCIMA_W-01_N-14_D-ideal.png": b"full 2" * 1000,
+    "symbols/CVC-MUSCIMA_W-01_N-10_D-ideal.png": b"symbol 1" * 1000,
+    "annotations/CVC-MUSCIMA_W-01_N-10_D-ideal.xml": b"<Nodes/>",
+}
+
+
+@pytest.fixture
+def zip_archive(tmp_path: Path) -> Path:
+    archive_path = tmp_path / "archive.zip"
+    with ZipFile(archive_path, "w", ZIP_DEFLATED) as archive:
+        for name, content in MEMBERS.items():
+            archive.writestr(name, content)
+    return archive_path
+
+
+@pytest.fixture
+def tar_archive(tmp_path: Path) -> Path:
+    archive_path = tmp_path / "archive.tar.gz"
+    with tarfile.open(archive_path, "w:gz") as archive:
+        for name, content in MEMBERS.items():
+            member = tarfile.TarInfo(name)
+            member.size = len(content)
+            archive.addfile(member, io.BytesIO(content))
+    return archive_path
+
+
+def extracted_files(directory: Path):
+    return {path.relative_to(directory).as_posix(): path.read_bytes()
+            for path in directory.rglob("*") if path.is_file()}
+
+
+class TestArchiveExtractor:
+
+    @pytest.mark.parametrize("number_of_threads", [1, 4])
+    def test_extract_zip(self, zip_archive: Path, tmp_path: Path, number_of_threads: int):
+        # Act
+        ArchiveExtractor.extract(zip_archive, tmp_path / "output", number_of_threads)
+
+        # Assert
+        assert extracted_files(tmp_path / "output") == MEMBERS
+
+    def test_extract_zip_with_include_filter(self, zip_archive: Path, tmp_path: Path):
+        # Act
+        ArchiveExtractor.extract(zip_archive, tmp_path / "output", 4, include=["fulls/*"])
+
+        # Assert
+        assert sorted(extracted_files(tmp_path / "output")) == ["fulls/CVC-MUSCIMA_W-01_N-10_D-ideal.png",
+                                                                "fulls/CVC-MUSCIMA_W-01_N-14_D-ideal.png"]
+
+    def test_extract_zip_with_exclude_filter(self, zip_archive: Path, tmp_path: Path):
+        # Act
+        ArchiveExtractor.extract(zip_archive, tmp_path / "output", 1, exclude=["*.png"])
+
+        # Assert
+        assert list(extracted_files(tmp_path / "output")) == ["annotations/CVC-MUSCIMA_W-01_N-10_D-ideal.xml"]
+
+    def test_extract_tar_with_filters(self, tar_archive: Path, tmp_path: Path):
+        # Act
+        ArchiveExtractor.extract(tar_archive, tmp_path / "output", include=["*N-10*"], exclude=["symbols/*"])
+
+        # Assert
+        assert sorted(extracted_files(tmp_path / "output")) == ["annotations/CVC-MUSCIMA_W-01_N-10_D-ideal.xml",
+                                                                "fulls/CVC-MUSCIMA_W-01_N-10_D-ideal.png"]
+
+    def test_extract_unknown_archive_raises(self, tmp_path: Path):
+        with pytest.raises(Exception, match="Unrecognized dataset"):
+            ArchiveExtractor.extract(tmp_path / "archive.rar", tmp_path / "output")
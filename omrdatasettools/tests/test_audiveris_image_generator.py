@@ -2,6 +2,8 @@ import os
 import shutil
 from glob import glob
 
+from PIL import Image
+
 from omrdatasettools.AudiverisOmrImageGenerator import AudiverisOmrImageGenerator
 from omrdatasettools.Downloader import Downloader
 from omrdatasettools.OmrDataset import OmrDataset
@@ -26,3 +28,23 @@ class TestAudiverisOmrImageGenerator:
         # Cleanup
         os.remove("AudiverisOmrDataset.zip")
         shutil.rmtree("temp")
+
+    def test_images_without_annotations_do_not_shift_pairs(self, tmp_path):
+        # Arrange
+        raw_data_directory = tmp_path / "audiveris_omr_raw"
+        raw_data_directory.mkdir()
+        for page_name, page_width in [("mops-1", 40), ("mtest1-1", 60)]:
+            Image.new("L", (page_width, 30), "white").save(str(raw_data_directory / (page_name + ".png")))
+            (raw_data_directory / (page_name + ".xml")).write_text(
+                '<Annotations><Symbol shape="noteheadBlack"><Bounds x="2" y="3" w="{0}" h="10"/></Symbol>'
+                '</Annotations>'.format(page_width // 2))
+        # An image, whose name sorts before all others, but that has no annotations
+        Image.new("L", (10, 10), "white").save(str(raw_data_directory / "IMSLP06053p1.png"))
+
+        # Act
+        AudiverisOmrImageGenerator().extract_symbols(str(raw_data_directory), str(tmp_path / "symbols"))
+
+        # Assert
+        for page_name, page_width in [("mops-1", 40), ("mtest1-1", 60)]:
+            with Image.open(str(tmp_path / "symbols" / "noteheadBlack" / (page_name + "0.png"))) as symbol:
+                assert symbol.size == (page_width // 2 + 3, 13)
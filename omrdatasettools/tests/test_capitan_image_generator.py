@@ -3,7 +3,11 @@ import shutil
 from glob import glob
 from pathlib import Path
 
-from omrdatasettools.CapitanImageGenerator import CapitanImageGenerator
+import numpy
+from PIL import Image
+
+from omrdatasettools.CapitanImageGenerator import CapitanImageGenerator, CapitanSymbolArrays
+from omrdatasettools.ImageWriter import BatchedImageWriter
 
 
 class TestCapitanImageGenerator:
@@ -29,3 +33,90 @@ class TestCapitanImageGenerator:
 
         # Cleanup
         shutil.rmtree("temp", ignore_errors=True)
+
+    def test_load_capitan_arrays_matches_symbols(self, tmp_path):
+        # Arrange
+        image_generator = CapitanImageGenerator()
+        data_directory = tmp_path / "capitan_raw"
+        data_path = data_directory / "BimodalHandwrittenSymbols" / "data"
+        data_path.parent.mkdir(parents=True, exist_ok=True)
+        data_path.write_text((Path(__file__).parent / "testdata" / "capitan_testdata.txt").read_text())
+        symbols = image_generator.load_capitan_symbols(data_directory)
+
+        # Act
+        arrays = image_generator.load_capitan_arrays(data_directory, tmp_path / "cache")
+
+        # Assert
+        assert len(arrays) == 3
+        assert arrays.images.shape == (3, 30, 30)
+        assert isinstance(arrays.images, numpy.memmap)
+        assert arrays.labels.tolist() == [symbol.symbol_class for symbol in symbols]
+        for index, symbol in enumerate(symbols):
+            numpy.testing.assert_array_equal(arrays.images[index], symbol.image_data)
+            assert arrays.get_stroke(index).tolist() == [[point.x, point.y] for point in symbol.stroke]
+
+    def test_load_capitan_arrays_from_cache(self, tmp_path):
+        # Arrange
+        data = (Path(__file__).parent / "testdata" / "capitan_testdata.txt").read_text()
+        CapitanSymbolArrays.parse(data).save(tmp_path / "cache")
+
+        # Act
+        arrays = CapitanImageGenerator().load_capitan_arrays(tmp_path / "missing_raw_data", tmp_path / "cache")
+
+        # Assert
+        assert arrays.labels.tolist() == CapitanSymbolArrays.parse(data).labels.tolist()
+
+    def test_create_capitan_images_renders_strokes_and_scores_in_one_pass(self, tmp_path):
+        # Arrange
+        data_directory = tmp_path / "capitan_raw"
+        data_path = data_directory / "BimodalHandwrittenSymbols" / "data"
+        data_path.parent.mkdir(parents=True, exist_ok=True)
+        data_path.write_text((Path(__file__).parent / "testdata" / "capitan_testdata.txt").read_text())
+        image_generator = CapitanImageGenerator()
+        symbols = image_generator.load_capitan_symbols(data_directory)
+        image_generator.draw_capitan_stroke_images(symbols, str(tmp_path / "expected"), [1, 3])
+        image_generator.draw_capitan_score_images(symbols, str(tmp_path / "expected"))
+
+        # Act
+        image_generator.create_capitan_images(data_directory, str(tmp_path / "sequential"), [1, 3])
+        image_generator.create_capitan_images(data_directory, str(tmp_path / "parallel"), [1, 3], workers=2,
+                                              writer=BatchedImageWriter(batch_size=2))
+
+        # Assert
+        expected_images = sorted(path.relative_to(tmp_path / "expected")
+                                 for path in (tmp_path / "expected").rglob("*.png"))
+        assert len(expected_images) == 9
+        for output_directory in ["sequential", "parallel"]:
+            images = sorted(path.relative_to(tmp_path / output_directory)
+                            for path in (tmp_path / output_directory).rglob("*.png"))
+            assert images == expected_images
+            for image in images:
+                expected_bytes = (tmp_path / "expected" / image).read_bytes()
+                assert (tmp_path / output_directory / image).read_bytes() == expected_bytes
+
+    def test_create_capitan_images_in_black_and_white(self, tmp_path):
+        # Arrange
+        data_directory = tmp_path / "capitan_raw"
+        data_path = data_directory / "BimodalHandwrittenSymbols" / "data"
+        data_path.parent.mkdir(parents=True, exist_ok=True)
+        data_path.write_text((Path(__file__).parent / "testdata" / "capitan_testdata.txt").read_text())
+        image_generator = CapitanImageGenerator()
+        image_generator.create_capitan_images(data_directory, str(tmp_path / "rgb"), [3])
+
+        # Act
+        image_generator.create_capitan_images(data_directory, str(tmp_path / "bitonal"), [3], image_mode="1",
+                                              compress_level=9)
+
+        # Assert
+        stroke_images = sorted(path.relative_to(tmp_path / "rgb")
+                               for path in (tmp_path / "rgb").rglob("*-stroke_3.png"))
+        assert len(stroke_images) == 3
+        for image in stroke_images:
+            with Image.open(tmp_path / "rgb" / image) as expected_image, \
+                    Image.open(tmp_path / "bitonal" / image) as bitonal_image:
+                assert bitonal_image.mode == "1"
+                numpy.testing.assert_array_equal(numpy.asarray(bitonal_image),
+                                                 numpy.asarray(expected_image.convert("L")) > 127)
+        for score_image in (tmp_path / "bitonal").rglob("*-score.png"):
+            with Image.open(score_image) as image:
+                assert image.mode == "L"
@@ -0,0 +1,123 @@
+import io
+import time
+import zipfile
+from pathlib import Path
+
+import pytest
+
+from omrdatasettools.BandwidthLimiter import BandwidthLimiter
+from omrdatasettools.DatasetDownloadScheduler import DatasetDownloadScheduler, DiskSpaceReservation
+from omrdatasettools.OmrDataset import OmrDataset
+
+
+def create_zip_archive(files) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zip_file:
+        for name, content in files.items():
+            zip_file.writestr(name, content)
+    return buffer.getvalue()
+
+
+class TestDatasetDownloadScheduler:
+
+    @pytest.fixture
+    def datasets(self, http_server, monkeypatch):
+        datasets = [OmrDataset.Homus_V2, OmrDataset.Capitan, OmrDataset.Printed]
+        urls = dict()
+        for dataset in datasets:
+            http_server.files["/{0}.zip".format(dataset.name)] = create_zip_archive(
+                {"{0}/readme.txt".format(dataset.name): dataset.name,
+                 "{0}/data.bin".format(dataset.name): bytes(50000)})
+            urls[dataset.name] = http_server.url("{0}.zip".format(dataset.name))
+        monkeypatch.setattr(OmrDataset, "dataset_download_urls", lambda self: urls)
+        return datasets
+
+    def test_download_and_extract_datasets(self, datasets, tmp_path: Path):
+        # Arrange
+        scheduler = DatasetDownloadScheduler(maximum_concurrent_downloads=2)
+
+        # Act
+        reports = scheduler.download_and_extract_datasets(datasets, tmp_path / "data", tmp_path / "tmp")
+
+        # Assert
+        assert [report.dataset for report in reports] == ["Homus_V2", "Capitan", "Printed"]
+        assert all(report.error is None for report in reports)
+        assert all(report.downloaded_bytes > 50000 for report in reports)
+        assert (tmp_path / "data" / "Capitan" / "Capitan" / "readme.txt").read_text() == "Capitan"
+
+    def test_archives_that_are_present_are_not_downloaded_again(self, datasets, http_server, tmp_path: Path):
+        # Arrange
+        scheduler = DatasetDownloadScheduler()
+        scheduler.download_and_extract_datasets(datasets[:1], tmp_path / "data", tmp_path / "tmp")
+        http_server.requests.clear()
+
+        # Act
+        reports = scheduler.download_and_extract_datasets(datasets[:1], tmp_path / "data", tmp_path / "tmp")
+
+        # Assert
+        assert reports[0].downloaded_bytes == 0
+        assert http_server.requests == []
+
+    def test_bandwidth_limit_is_shared_by_all_downloads(self, datasets, tmp_path: Path):
+        # Arrange
+        total_size = 3 * 50000
+        scheduler = DatasetDownloadScheduler(maximum_concurrent_downloads=3, bandwidth_limit=total_size)
+
+        # Act
+        start_time = time.monotonic()
+        scheduler.download_and_extract_datasets(datasets, tmp_path / "data", tmp_path / "tmp")
+        elapsed_seconds = time.monotonic() - start_time
+
+        # Assert
+        assert elapsed_seconds > 0.5
+
+    def test_unknown_archive_size_does_not_stop_the_download(self, datasets, http_server, tmp_path: Path):
+        # Arrange
+        http_server.failures["/Capitan.zip"] = 1  # Only the request for the size of the archive fails
+        scheduler = DatasetDownloadScheduler()
+
+        # Act
+        reports = scheduler.download_and_extract_datasets(datasets, tmp_path / "data", tmp_path / "tmp")
+
+        # Assert
+        assert all(report.error is None for report in reports)
+        assert (tmp_path / "data" / "Capitan" / "Capitan" / "readme.txt").read_text() == "Capitan"
+
+    def test_datasets_that_exceed_the_disk_budget_are_reported(self, datasets, tmp_path: Path):
+        # Arrange
+        scheduler = DatasetDownloadScheduler(minimum_free_disk_space=2 ** 62)
+
+        # Act
+        reports = scheduler.download_and_extract_datasets(datasets[:1], tmp_path / "data", tmp_path / "tmp")
+
+        # Assert
+        assert "Not enough disk space" in reports[0].error
+        assert not (tmp_path / "tmp" / "Homus_V2.zip").exists()
+
+    def test_written_bytes_are_no_longer_reserved(self, tmp_path: Path):
+        # Arrange
+        reservation = DiskSpaceReservation(1000, BandwidthLimiter(None))
+        (tmp_path / "existing.txt").write_bytes(bytes(5000))
+
+        # Act
+        reservation.consume(600)
+        unwritten_bytes_after_download = reservation.get_unwritten_bytes()
+        reservation.start_extraction(tmp_path)
+        (tmp_path / "extracted.txt").write_bytes(bytes(300))
+        unwritten_bytes_after_extraction = reservation.get_unwritten_bytes()
+
+        # Assert
+        assert unwritten_bytes_after_download == 400
+        assert unwritten_bytes_after_extraction == 100
+
+    def test_failing_dataset_does_not_stop_the_others(self, datasets, http_server, tmp_path: Path):
+        # Arrange
+        del http_server.files["/Capitan.zip"]
+        scheduler = DatasetDownloadScheduler()
+
+        # Act
+        reports = scheduler.download_and_extract_datasets(datasets, tmp_path / "data", tmp_path / "tmp")
+
+        # Assert
+        assert [report.error is None for report in reports] == [True, False, True]
+        assert (tmp_path / "data" / "Printed" / "Printed" / "readme.txt").exists()
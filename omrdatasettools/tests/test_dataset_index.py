@@ -0,0 +1,97 @@
+import os
+import zipfile
+
+from omrdatasettools.ArchiveDataset import ArchiveDataset
+from omrdatasettools.DatasetIndex import DatasetIndex
+
+
+class TestDatasetIndex:
+    @staticmethod
+    def create_files(directory, relative_paths):
+        for relative_path in relative_paths:
+            path = directory.joinpath(*relative_path.split("/"))
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(relative_path)
+
+    def test_files_are_paired_by_document(self, tmp_path):
+        # Arrange
+        self.create_files(tmp_path, ["a.xml", "a.png", "b.xml", "c.xml", "c.png", "d.png", "e.xml", "e.png",
+                                     "other/e.png", "notes.txt"])
+
+        # Act
+        pairs, orphans = DatasetIndex.of(str(tmp_path)).pair([".xml", ".png"])
+
+        # Assert
+        assert pairs == [(os.path.join(str(tmp_path), "a.xml"), os.path.join(str(tmp_path), "a.png")),
+                         (os.path.join(str(tmp_path), "c.xml"), os.path.join(str(tmp_path), "c.png"))]
+        assert orphans == [os.path.join(str(tmp_path), "b.xml"), os.path.join(str(tmp_path), "d.png"),
+                           os.path.join(str(tmp_path), "e.xml"), os.path.join(str(tmp_path), "e.png"),
+                           os.path.join(str(tmp_path), "other", "e.png")]
+
+    def test_pairing_can_be_restricted_to_sub_directory(self, tmp_path):
+        # Arrange
+        self.create_files(tmp_path, ["v2.0/data/annotations/a.xml", "v2.0/data/images/a.png",
+                                     "v2.0/specifications/classes.xml"])
+
+        # Act
+        pairs, orphans = DatasetIndex.of(str(tmp_path)).pair([".xml", ".png"], "v2.0/data")
+
+        # Assert
+        assert pairs == [(os.path.join(str(tmp_path), "v2.0", "data", "annotations", "a.xml"),
+                          os.path.join(str(tmp_path), "v2.0", "data", "images", "a.png"))]
+        assert orphans == []
+
+    def test_directory_is_walked_only_once(self, tmp_path, monkeypatch):
+        # Arrange
+        self.create_files(tmp_path, ["a.xml", "a.png"])
+        expected_pairs = DatasetIndex.of(str(tmp_path)).pair([".xml", ".png"])
+
+        def fail(*args, **kwargs):
+            raise AssertionError("The directory should not be walked again")
+
+        monkeypatch.setattr(os, "walk", fail)
+
+        # Act
+        pairs = DatasetIndex.of(str(tmp_path)).pair([".xml", ".png"])
+
+        # Assert
+        assert pairs == expected_pairs
+
+    def test_added_files_are_found_after_refresh(self, tmp_path):
+        # Arrange
+        self.create_files(tmp_path, ["pages/a.xml", "pages/a.png"])
+        DatasetIndex.of(str(tmp_path))
+        self.create_files(tmp_path, ["pages/b.xml", "pages/b.png"])
+
+        # Act
+        pairs, _ = DatasetIndex.of(str(tmp_path), refresh=True).pair([".xml", ".png"])
+
+        # Assert
+        assert [os.path.basename(xml_file) for xml_file, _ in pairs] == ["a.xml", "b.xml"]
+
+    def test_files_added_to_sub_directory_are_found(self, tmp_path):
+        # Arrange
+        self.create_files(tmp_path, ["pages/a.xml", "pages/a.png"])
+        DatasetIndex.of(str(tmp_path))
+        self.create_files(tmp_path, ["pages/b.xml", "pages/b.png"])
+
+        # Act
+        pairs, _ = DatasetIndex.of(str(tmp_path)).pair([".xml", ".png"])
+
+        # Assert
+        assert [os.path.basename(xml_file) for xml_file, _ in pairs] == ["a.xml", "b.xml"]
+
+    def test_files_of_archive_are_paired(self, tmp_path):
+        # Arrange
+        archive = tmp_path / "dataset.zip"
+        with zipfile.ZipFile(archive, "w") as zip_file:
+            for name in ["dataset/a.xml", "dataset/a.png", "dataset/b.png"]:
+                zip_file.writestr(name, name)
+
+        # Act
+        with ArchiveDataset(archive) as dataset:
+            pairs, orphans = DatasetIndex.of(dataset).pair([".xml", ".png"])
+
+        # Assert
+        assert pairs == [("dataset/a.xml", "dataset/a.png")]
+        assert orphans == ["dataset/b.png"]
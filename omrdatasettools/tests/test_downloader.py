@@ -1,9 +1,14 @@
+import io
+import os
+import tarfile
+import zipfile
 from pathlib import Path
 
 import pytest
 
+from omrdatasettools.DownloadCheckpoint import DownloadCheckpoint
 from omrdatasettools.Downloader import Downloader
-from omrdatasettools.OmrDataset import OmrDataset
+from omrdatasettools.OmrDataset import OmrDataset, ArchiveChecksum
 
 LARGE_DATASET_REASON = "Downloads a large dataset"
 
@@ -13,6 +18,11 @@ SKIP_LARGE_TESTS = True
 
 class TestDownloader:
 
+    def test_filename_extraction_strips_query_string(self):
+        dataset = OmrDataset.DeepScores_V2_Complete
+        filename = dataset.get_dataset_filename()
+        assert filename == "ds2_complete.tar.gz"
+
     def test_download_correct_url_resolution(self):
         dataset = OmrDataset.Audiveris
         url = dataset.get_dataset_download_url()
@@ -91,3 +101,218 @@ class TestDownloader:
         actual_number_of_files = len(all_files)
         assert expected_number_of_samples == actual_number_of_files
         assert (download_path / dataset.get_dataset_filename()).exists()
+
+    def test_download_file_in_parallel_ranges(self, http_server, tmp_path: Path):
+        # Arrange
+        content = bytes(range(256)) * 1000
+        http_server.files["/dataset.zip"] = content
+        destination = tmp_path / "dataset.zip"
+
+        # Act
+        Downloader.download_file(http_server.url("dataset.zip"), destination, number_of_connections=4,
+                                 chunk_size=10000)
+
+        # Assert
+        assert destination.read_bytes() == content
+        range_requests = [r for r in http_server.requests if r["range"] and r["range"] != "bytes=0-0"]
+        assert len(range_requests) == 26
+
+    def test_download_file_falls_back_to_single_stream_without_range_support(self, http_server, tmp_path: Path):
+        # Arrange
+        content = bytes(range(256)) * 1000
+        http_server.files["/dataset.zip"] = content
+        http_server.supports_ranges = False
+        destination = tmp_path / "dataset.zip"
+
+        # Act
+        Downloader.download_file(http_server.url("dataset.zip"), destination, number_of_connections=4,
+                                 chunk_size=10000)
+
+        # Assert
+        assert destination.read_bytes() == content
+        assert len([r for r in http_server.requests if r["range"] is None]) == 1
+
+    def test_download_file_resumes_interrupted_single_stream(self, http_server, tmp_path: Path):
+        # Arrange
+        content = bytes(range(256)) * 1000
+        http_server.files["/dataset.zip"] = content
+        url = http_server.url("dataset.zip")
+        destination = tmp_path / "dataset.zip"
+        (tmp_path / "dataset.zip.part").write_bytes(content[:100000])
+        DownloadCheckpoint(tmp_path / "dataset.zip.part.json", url, len(content), [[0, 100000]]).save()
+
+        # Act
+        Downloader.download_file(url, destination)
+
+        # Assert
+        assert destination.read_bytes() == content
+        assert http_server.requests[-1]["range"] == "bytes=100000-"
+        assert not (tmp_path / "dataset.zip.part").exists()
+        assert not (tmp_path / "dataset.zip.part.json").exists()
+
+    def test_download_file_keeps_truncated_single_stream_for_resuming(self, http_server, tmp_path: Path):
+        # Arrange
+        content = bytes(range(256)) * 1000
+        http_server.files["/dataset.zip"] = content
+        http_server.truncations["/dataset.zip"] = 100000
+        url = http_server.url("dataset.zip")
+        destination = tmp_path / "dataset.zip"
+
+        # Act
+        with pytest.raises(Exception, match="Received 100000 bytes instead of 256000 bytes"):
+            Downloader.download_file(url, destination)
+        partial_content = (tmp_path / "dataset.zip.part").read_bytes()
+        Downloader.download_file(url, destination)
+
+        # Assert
+        assert partial_content == content[:100000]
+        assert destination.read_bytes() == content
+        assert http_server.requests[-1]["range"] == "bytes=100000-"
+        assert not (tmp_path / "dataset.zip.part.json").exists()
+
+    def test_failed_download_leaves_no_checkpoint_behind(self, http_server, tmp_path: Path):
+        # Arrange
+        url = http_server.url("missing.zip")
+        destination = tmp_path / "missing.zip"
+        DownloadCheckpoint(tmp_path / "missing.zip.part.json", url, 100, [[0, 50]]).save()
+
+        # Act
+        with pytest.raises(Exception):
+            Downloader.download_file(url, destination)
+
+        # Assert
+        assert list(tmp_path.iterdir()) == []
+
+    def test_download_file_resumes_interrupted_parallel_download(self, http_server, tmp_path: Path):
+        # Arrange
+        content = bytes(range(256)) * 1000
+        http_server.files["/dataset.zip"] = content
+        url = http_server.url("dataset.zip")
+        destination = tmp_path / "dataset.zip"
+        partial_content = content[:50000] + bytes(len(content) - 50000)
+        (tmp_path / "dataset.zip.part").write_bytes(partial_content)
+        DownloadCheckpoint(tmp_path / "dataset.zip.part.json", url, len(content), [[0, 50000]]).save()
+
+        # Act
+        Downloader.download_file(url, destination, number_of_connections=4, chunk_size=10000)
+
+        # Assert
+        assert destination.read_bytes() == content
+        range_requests = [r for r in http_server.requests if r["range"] and r["range"] != "bytes=0-0"]
+        assert len(range_requests) == 21
+
+    def test_download_file_restarts_if_server_ignores_range(self, http_server, tmp_path: Path):
+        # Arrange
+        content = bytes(range(256)) * 1000
+        http_server.files["/dataset.zip"] = content
+        http_server.supports_ranges = False
+        url = http_server.url("dataset.zip")
+        destination = tmp_path / "dataset.zip"
+        (tmp_path / "dataset.zip.part").write_bytes(b"garbage")
+        DownloadCheckpoint(tmp_path / "dataset.zip.part.json", url, len(content), [[0, 7]]).save()
+
+        # Act
+        Downloader.download_file(url, destination)
+
+        # Assert
+        assert destination.read_bytes() == content
+
+    def test_streaming_extraction_of_tar_archive(self, http_server, tmp_path: Path, monkeypatch):
+        # Arrange
+        monkeypatch.chdir(tmp_path)
+        http_server.files["/dataset.tar.gz"] = create_tar_gz_archive({"images/1.png": b"1", "images/2.png": b"22"})
+        downloader = Downloader()
+
+        # Act
+        downloader.download_and_extract_custom_dataset("dataset", http_server.url("dataset.tar.gz"),
+                                                       "dataset.tar.gz", tmp_path / "output", None, streaming=True)
+
+        # Assert
+        assert (tmp_path / "output" / "images" / "1.png").read_bytes() == b"1"
+        assert (tmp_path / "output" / "images" / "2.png").read_bytes() == b"22"
+        assert not (tmp_path / "dataset.tar.gz").exists()
+
+    def test_streaming_extraction_verifies_checksum(self, http_server, tmp_path: Path):
+        # Arrange
+        http_server.files["/dataset.tar.gz"] = create_tar_gz_archive({"a.txt": b"a"})
+        wrong_checksum = ArchiveChecksum(10, "0" * 64)
+
+        # Act & Assert
+        with pytest.raises(Exception, match="Integrity check"):
+            Downloader.download_and_extract_tar_archive_streaming(http_server.url("dataset.tar.gz"),
+                                                                  tmp_path / "output", wrong_checksum)
+
+    def test_copytree_copies_files_and_skips_up_to_date_files(self, tmp_path: Path):
+        # Arrange
+        (tmp_path / "source" / "nested").mkdir(parents=True)
+        (tmp_path / "source" / "1.png").write_bytes(b"1")
+        (tmp_path / "source" / "nested" / "2.png").write_bytes(b"2")
+
+        # Act
+        Downloader.copytree(tmp_path / "source", tmp_path / "destination")
+        Downloader.copytree(tmp_path / "source", tmp_path / "destination")
+        (tmp_path / "destination" / "1.png").write_bytes(b"modified")
+
+        # Assert
+        assert (tmp_path / "destination" / "nested" / "2.png").read_bytes() == b"2"
+        assert (tmp_path / "source" / "1.png").read_bytes() == b"1"
+
+    def test_copytree_links_files(self, tmp_path: Path):
+        # Arrange
+        (tmp_path / "source").mkdir()
+        (tmp_path / "source" / "1.png").write_bytes(b"1")
+
+        # Act
+        Downloader.copytree(tmp_path / "source", tmp_path / "destination", link=True)
+
+        # Assert
+        assert (tmp_path / "destination" / "1.png").read_bytes() == b"1"
+        assert (tmp_path / "source" / "1.png").exists()
+
+    def test_copytree_moves_files(self, tmp_path: Path):
+        # Arrange
+        (tmp_path / "source").mkdir()
+        (tmp_path / "source" / "1.png").write_bytes(b"1")
+
+        # Act
+        Downloader.copytree(tmp_path / "source", tmp_path / "destination", move=True)
+
+        # Assert
+        assert (tmp_path / "destination" / "1.png").read_bytes() == b"1"
+        assert not (tmp_path / "source" / "1.png").exists()
+
+    def test_muscima_pp_images_are_extracted_into_the_dataset(self, http_server, tmp_path: Path, monkeypatch):
+        # Arrange
+        http_server.files["/MUSCIMA-pp_v2.0.zip"] = create_zip_archive({"v2.0/data/annotations/1.xml": b"<xml/>"})
+        http_server.files["/CVC_MUSCIMA_PP_Annotated-Images.zip"] = create_zip_archive(
+            {"fulls/1.png": b"full", "symbols/1.png": b"symbol"})
+        urls = {OmrDataset.MuscimaPlusPlus_V2.name: http_server.url("MUSCIMA-pp_v2.0.zip"),
+                OmrDataset.MuscimaPlusPlus_Images.name: http_server.url("CVC_MUSCIMA_PP_Annotated-Images.zip")}
+        monkeypatch.setattr(OmrDataset, "dataset_download_urls", lambda self: urls)
+        monkeypatch.chdir(tmp_path)
+
+        # Act
+        Downloader().download_and_extract_dataset(OmrDataset.MuscimaPlusPlus_V2, tmp_path / "data")
+
+        # Assert
+        assert os.listdir(tmp_path / "data") == ["v2.0"]
+        assert os.listdir(tmp_path / "data" / "v2.0" / "data" / "images") == ["1.png"]
+        assert not (tmp_path / "MuscimaPpImages").exists()
+
+
+def create_zip_archive(files: dict) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for name, content in files.items():
+            archive.writestr(name, content)
+    return buffer.getvalue()
+
+
+def create_tar_gz_archive(files: dict) -> bytes:
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+        for name, content in files.items():
+            member = tarfile.TarInfo(name)
+            member.size = len(content)
+            archive.addfile(member, io.BytesIO(content))
+    return buffer.getvalue()
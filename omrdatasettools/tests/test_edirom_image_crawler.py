@@ -0,0 +1,87 @@
+from pathlib import Path
+
+import pytest
+
+from omrdatasettools.Downloader import Downloader
+from omrdatasettools.EdiromImageCrawler import EdiromImageCrawler
+from omrdatasettools.OmrDataset import OmrDataset
+
+MEI_ANNOTATION = """<?xml version="1.0" encoding="UTF-8"?>
+<mei xmlns="http://www.music-encoding.org/ns/mei">
+  <facsimile>
+    {0}
+  </facsimile>
+</mei>
+"""
+
+
+class TestEdiromImageCrawler:
+
+    def test_crawl_reuses_connections(self, http_server, tmp_path: Path):
+        # Arrange
+        downloads = []
+        for i in range(20):
+            http_server.files["/page{0}.jpg".format(i)] = "page {0}".format(i).encode()
+            downloads.append((http_server.url("page{0}.jpg".format(i)), tmp_path / "page{0}.jpg".format(i)))
+        crawler = EdiromImageCrawler(number_of_workers=4)
+
+        # Act
+        number_of_downloaded_files = crawler.crawl(downloads)
+
+        # Assert
+        assert number_of_downloaded_files == 20
+        assert (tmp_path / "page7.jpg").read_bytes() == b"page 7"
+        assert len({request["client_port"] for request in http_server.requests}) <= 4
+
+    def test_crawl_skips_existing_files(self, http_server, tmp_path: Path):
+        # Arrange
+        http_server.files["/page1.jpg"] = b"page 1"
+        (tmp_path / "page0.jpg").write_bytes(b"existing")
+        crawler = EdiromImageCrawler()
+
+        # Act
+        number_of_downloaded_files = crawler.crawl([(http_server.url("page0.jpg"), tmp_path / "page0.jpg"),
+                                                    (http_server.url("page1.jpg"), tmp_path / "page1.jpg")])
+
+        # Assert
+        assert number_of_downloaded_files == 1
+        assert [request["path"] for request in http_server.requests] == ["/page1.jpg"]
+
+    def test_crawl_retries_with_backoff(self, http_server, tmp_path: Path):
+        # Arrange
+        http_server.files["/page.jpg"] = b"page"
+        http_server.failures["/page.jpg"] = 2
+        crawler = EdiromImageCrawler(maximum_retries=3, backoff_factor=0.01)
+
+        # Act
+        crawler.crawl([(http_server.url("page.jpg"), tmp_path / "page.jpg")])
+
+        # Assert
+        assert (tmp_path / "page.jpg").read_bytes() == b"page"
+        assert len(http_server.requests) == 3
+
+    def test_crawl_gives_up_after_maximum_retries(self, http_server, tmp_path: Path):
+        # Arrange
+        http_server.files["/page.jpg"] = b"page"
+        http_server.failures["/page.jpg"] = 5
+        crawler = EdiromImageCrawler(maximum_retries=1, backoff_factor=0.01)
+
+        # Act & Assert
+        with pytest.raises(Exception, match="after 2 attempts"):
+            crawler.crawl([(http_server.url("page.jpg"), tmp_path / "page.jpg")])
+        assert not (tmp_path / "page.jpg").exists()
+
+    def test_download_images_from_mei_annotation(self, http_server, tmp_path: Path):
+        # Arrange
+        graphics = "\n".join('<graphic target="images/page{0}.jpg" width="100"/>'.format(i) for i in range(3))
+        (tmp_path / "Bargheer.xml").write_text(MEI_ANNOTATION.format(graphics))
+        for i in range(3):
+            http_server.files["/images/page{0}.jpg".format(i)] = b"page"
+
+        # Act
+        Downloader().download_images_from_mei_annotation(OmrDataset.Edirom_Bargheer, str(tmp_path),
+                                                         http_server.url(""), requests_per_second=100)
+
+        # Assert
+        assert sorted(path.name for path in (tmp_path / "Bargheer").iterdir()) == ["page0.jpg", "page1.jpg",
+                                                                                   "page2.jpg"]
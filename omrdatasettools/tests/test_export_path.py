@@ -1,5 +1,10 @@
+import os
+import tempfile
 import unittest
 
+import numpy
+from PIL import Image
+
 from omrdatasettools.ExportPath import ExportPath
 
 
@@ -59,6 +64,26 @@ class ExportPathTest(unittest.TestCase):
         full_path = full_path.replace('\\', '/')
         self.assertEqual("3-4-Time/1-13_3_offset_33.png", full_path)
 
+    def test_save_converts_into_image_mode(self):
+        with tempfile.TemporaryDirectory() as destination_directory:
+            # Arrange
+            os.makedirs(os.path.join(destination_directory, "3-4-Time"))
+            pixels = numpy.array([[0, 127], [128, 255]], dtype=numpy.uint8)
+            image = Image.fromarray(pixels).convert("RGB")
+
+            # Act
+            for image_mode in ["RGB", "L", "1"]:
+                export_path = ExportPath(destination_directory, "3-4-Time", image_mode, "png", 3, image_mode, 9)
+                export_path.save(image, 33)
+
+            # Assert
+            for image_mode in ["RGB", "L", "1"]:
+                file_path = os.path.join(destination_directory, "3-4-Time", image_mode + "_3_offset_33.png")
+                with Image.open(file_path) as saved_image:
+                    self.assertEqual(image_mode, saved_image.mode)
+            with Image.open(os.path.join(destination_directory, "3-4-Time", "1_3_offset_33.png")) as saved_image:
+                self.assertEqual([[False, False], [True, True]], numpy.asarray(saved_image).tolist())
+
 
 if __name__ == '__main__':
     unittest.main()
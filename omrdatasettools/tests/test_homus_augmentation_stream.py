@@ -0,0 +1,78 @@
+import numpy
+import pytest
+
+from omrdatasettools.HomusAugmentationStream import HomusAugmentationStream
+from omrdatasettools.HomusImageGenerator import HomusSymbol
+
+
+def create_symbols():
+    return [HomusSymbol.initialize_from_string("Quarter-Note\n10,10;12,40;\n20,20;30,25;"),
+            HomusSymbol.initialize_from_string("Whole-Note\n50,50;60,60;70,50;")]
+
+
+class TestHomusAugmentationStream:
+
+    def test_stream_is_reproducible_with_seed(self):
+        # Arrange
+        first_stream = HomusAugmentationStream(create_symbols(), 64, 96, staff_line_vertical_offsets=[10, 20, 30],
+                                               scale_range=(0.8, 1.2), rotation_range=(-15, 15), jitter=1.0, seed=3)
+        second_stream = HomusAugmentationStream(create_symbols(), 64, 96, staff_line_vertical_offsets=[10, 20, 30],
+                                                scale_range=(0.8, 1.2), rotation_range=(-15, 15), jitter=1.0, seed=3)
+
+        # Act
+        first_images, first_labels, first_bounding_boxes = first_stream.next_batch(20)
+        second_images, second_labels, second_bounding_boxes = second_stream.next_batch(20)
+
+        # Assert
+        assert first_images.shape == (20, 96, 64)
+        assert first_images.dtype == numpy.uint8
+        assert set(first_labels.tolist()) == {"Quarter-Note", "Whole-Note"}
+        numpy.testing.assert_array_equal(first_images, second_images)
+        numpy.testing.assert_array_equal(first_labels, second_labels)
+        numpy.testing.assert_array_equal(first_bounding_boxes, second_bounding_boxes)
+
+    def test_background_workers_are_reproducible_with_seed(self):
+        # Arrange
+        with HomusAugmentationStream(create_symbols(), 32, 32, seed=5, number_of_workers=2, prefetch=4) as first, \
+                HomusAugmentationStream(create_symbols(), 32, 32, seed=5, number_of_workers=2, prefetch=4) as second:
+            # Act
+            first_images, first_labels, _ = first.next_batch(10)
+            second_images, second_labels, _ = second.next_batch(10)
+
+        # Assert
+        numpy.testing.assert_array_equal(first_images, second_images)
+        numpy.testing.assert_array_equal(first_labels, second_labels)
+
+    def test_errors_of_background_workers_are_raised(self):
+        # Arrange
+        symbols = [None]
+
+        # Act & Assert
+        with HomusAugmentationStream(symbols, 32, 32, seed=5, number_of_workers=1) as stream:
+            with pytest.raises(Exception, match="worker of the augmentation stream failed"):
+                next(stream)
+
+    def test_stopped_background_workers_are_reported(self):
+        # Arrange
+        with HomusAugmentationStream(create_symbols(), 32, 32, seed=5, number_of_workers=1, prefetch=1) as stream:
+            stream.workers[0].terminate()
+            stream.workers[0].join()
+            while not stream.queues[0].empty():
+                stream.queues[0].get()
+
+            # Act & Assert
+            with pytest.raises(Exception, match="stopped unexpectedly"):
+                next(stream)
+
+    def test_augment_rotates_around_center(self):
+        # Arrange
+        symbol = HomusSymbol.initialize_from_string("Line\n0,0;10,0;")
+
+        # Act
+        rotated_symbol = HomusAugmentationStream.augment(symbol, numpy.random.default_rng(0), rotation_range=(90, 90))
+
+        # Assert
+        assert rotated_symbol.coordinates.tolist() == [[5, -5], [5, 5]]
+        assert rotated_symbol.stroke_offsets.tolist() == [0, 2]
+        assert rotated_symbol.dimensions.width == 1
+        assert rotated_symbol.dimensions.height == 11
@@ -1,8 +1,12 @@
 import os
 import shutil
+import tempfile
 import unittest
 from glob import glob
 
+import numpy
+from PIL import Image
+
 from omrdatasettools.Downloader import Downloader
 from omrdatasettools.HomusImageGenerator import HomusImageGenerator
 from omrdatasettools.OmrDataset import OmrDataset
@@ -26,6 +30,95 @@ class HomusImageGeneratorTest(unittest.TestCase):
         os.remove("HOMUS-2.0.zip")
         shutil.rmtree("temp")
 
+    def test_parallel_rendering_is_reproducible(self):
+        # Arrange
+        with tempfile.TemporaryDirectory() as temporary_directory:
+            raw_directory = os.path.join(temporary_directory, "raw")
+            os.makedirs(raw_directory)
+            for i in range(12):
+                with open(os.path.join(raw_directory, "1-{0}.txt".format(i)), "w") as symbol_file:
+                    symbol_file.write("Quarter-Note\n{0},10;{1},40;\n20,20;30,{2};".format(10 + i, 12 + i, 25 + i))
+
+            # Act
+            serial_bounding_boxes = HomusImageGenerator.create_images(
+                raw_directory, os.path.join(temporary_directory, "serial"), [1, 3], 96, 96,
+                staff_line_vertical_offsets=[20, 30], random_position_on_canvas=True, seed=42)
+            parallel_bounding_boxes = HomusImageGenerator.create_images(
+                raw_directory, os.path.join(temporary_directory, "parallel"), [1, 3], 96, 96,
+                staff_line_vertical_offsets=[20, 30], random_position_on_canvas=True, workers=3, seed=42)
+
+            # Assert
+            self.assertEqual(48, len(serial_bounding_boxes))
+            self.assertEqual(serial_bounding_boxes, parallel_bounding_boxes)
+            for file_name in glob(os.path.join(temporary_directory, "serial", "*", "*.png")):
+                with open(file_name, "rb") as serial_file, \
+                        open(file_name.replace("serial", "parallel"), "rb") as parallel_file:
+                    self.assertEqual(serial_file.read(), parallel_file.read())
+
+    def test_render_to_array_matches_created_images(self):
+        # Arrange
+        with tempfile.TemporaryDirectory() as temporary_directory:
+            raw_directory = os.path.join(temporary_directory, "raw")
+            os.makedirs(raw_directory)
+            for i, symbol_class in enumerate(["Quarter-Note", "Whole-Note"]):
+                with open(os.path.join(raw_directory, "1-{0}.txt".format(i)), "w") as symbol_file:
+                    symbol_file.write("{0}\n{1},10;{2},40;\n20,20;30,25;".format(symbol_class, 10 + i, 12 + i))
+            bounding_boxes = HomusImageGenerator.create_images(raw_directory, os.path.join(temporary_directory, "img"),
+                                                               [1, 3], 48, 64, 10, [5, 15])
+            symbols = HomusImageGenerator.load_symbols(raw_directory)
+
+            # Act
+            images, labels, boxes = HomusImageGenerator.render_to_array(symbols, [1, 3], 48, 64, 10, [5, 15])
+
+            # Assert
+            self.assertEqual((8, 64, 48), images.shape)
+            self.assertEqual(numpy.uint8, images.dtype)
+            self.assertEqual(["Quarter-Note"] * 4 + ["Whole-Note"] * 4, labels.tolist())
+            expected_image = Image.open(os.path.join(temporary_directory, "img", "Whole-Note", "1-1_3_offset_5.png"))
+            numpy.testing.assert_array_equal(numpy.asarray(expected_image.convert("L")), images[6])
+            expected_box = bounding_boxes[os.path.join("Whole-Note", "1-1_3_offset_5.png")]
+            self.assertEqual([expected_box.left, expected_box.top, expected_box.right, expected_box.bottom],
+                             boxes[6].tolist())
+
+    def test_incremental_rendering_only_draws_changed_images(self):
+        # Arrange
+        with tempfile.TemporaryDirectory() as temporary_directory:
+            raw_directory = os.path.join(temporary_directory, "raw")
+            os.makedirs(raw_directory)
+            for i in range(4):
+                with open(os.path.join(raw_directory, "1-{0}.txt".format(i)), "w") as symbol_file:
+                    symbol_file.write("Quarter-Note\n{0},10;{1},40;\n20,20;30,{2};".format(10 + i, 12 + i, 25 + i))
+            incremental_directory = os.path.join(temporary_directory, "incremental")
+            HomusImageGenerator.create_images(raw_directory, incremental_directory, [1, 3], 96, 96,
+                                              staff_line_vertical_offsets=[20, 30], random_position_on_canvas=True,
+                                              seed=42, incremental=True)
+            unchanged_image = os.path.join(incremental_directory, "Quarter-Note", "1-0_3_offset_20.png")
+            changed_image = os.path.join(incremental_directory, "Quarter-Note", "1-1_3_offset_20.png")
+            os.utime(unchanged_image, (0, 0))
+            os.utime(changed_image, (0, 0))
+            with open(os.path.join(raw_directory, "1-1.txt"), "w") as symbol_file:
+                symbol_file.write("Quarter-Note\n10,10;60,40;")
+
+            # Act
+            incremental_bounding_boxes = HomusImageGenerator.create_images(
+                raw_directory, incremental_directory, [1, 3, 5], 96, 96, staff_line_vertical_offsets=[20, 40],
+                random_position_on_canvas=True, seed=42, incremental=True)
+            expected_bounding_boxes = HomusImageGenerator.create_images(
+                raw_directory, os.path.join(temporary_directory, "expected"), [1, 3, 5], 96, 96,
+                staff_line_vertical_offsets=[20, 40], random_position_on_canvas=True, seed=42)
+
+            # Assert
+            self.assertEqual(0, os.path.getmtime(unchanged_image))
+            self.assertNotEqual(0, os.path.getmtime(changed_image))
+            self.assertEqual(expected_bounding_boxes, incremental_bounding_boxes)
+            incremental_images = sorted(os.path.relpath(file_name, incremental_directory)
+                                        for file_name in glob(os.path.join(incremental_directory, "*", "*.png")))
+            self.assertEqual(24, len(incremental_images))
+            for image in incremental_images:
+                with open(os.path.join(incremental_directory, image), "rb") as incremental_file, \
+                        open(os.path.join(temporary_directory, "expected", image), "rb") as expected_file:
+                    self.assertEqual(expected_file.read(), incremental_file.read())
+
 
 if __name__ == '__main__':
     unittest.main()
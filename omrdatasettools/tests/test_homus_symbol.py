@@ -1,6 +1,8 @@
 import os
 import unittest
 
+import numpy
+
 from omrdatasettools.Point2D import Point2D
 from omrdatasettools.ExportPath import ExportPath
 from omrdatasettools.HomusImageGenerator import HomusSymbol
@@ -33,6 +35,21 @@ class HomusSymbolTest(unittest.TestCase):
         self.assertEqual(strokes, symbol.strokes)
         self.assertEqual(dimensions, symbol.dimensions)
 
+    def test_initialize_stores_strokes_in_coordinate_array(self):
+        # Arrange
+        content = "test\r\n23,107;30,101;\r\n1,2;\r\n"
+
+        # Act
+        symbol = HomusSymbol.initialize_from_string(content)
+
+        # Assert
+        self.assertEqual("test", symbol.symbol_class)
+        self.assertEqual(numpy.int16, symbol.coordinates.dtype)
+        self.assertEqual([[23, 107], [30, 101], [1, 2]], symbol.coordinates.tolist())
+        self.assertEqual([0, 2, 3], symbol.stroke_offsets.tolist())
+        self.assertEqual([[Point2D(23, 107), Point2D(30, 101)], [Point2D(1, 2)]], symbol.strokes)
+        self.assertEqual(Rectangle(Point2D(1, 2), 30, 106), symbol.dimensions)
+
     def test_initialize_with_real_symbol(self):
         content = "12-8-Time\n28,107;30,107;30,110;25,121;19,131;13,139;10,144;9,145;10,145;10,145;\n35,115;35," \
                   "115;37,115;39,115;42,116;43,117;42,120;39,124;33,131;30,134;29,137;32,138;36,139;41,140;42,140;42," \
@@ -128,6 +145,16 @@ class HomusSymbolTest(unittest.TestCase):
         for offset in offsets:
             os.remove(export_path.get_full_path(offset))
 
+    def test_staff_line_overlay_is_cached(self):
+        # Act
+        overlay = HomusSymbol.get_staff_line_overlay(40, 80, 10, 1, 20)
+
+        # Assert
+        self.assertIs(overlay, HomusSymbol.get_staff_line_overlay(40, 80, 10, 1, 20))
+        self.assertFalse(overlay.flags.writeable)
+        self.assertEqual((80, 40), overlay.shape)
+        self.assertEqual([20, 30, 40, 50, 60], numpy.where(overlay[:, 0] == 0)[0].tolist())
+
 
 if __name__ == '__main__':
     unittest.main()
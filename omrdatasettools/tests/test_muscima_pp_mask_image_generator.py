@@ -1,8 +1,13 @@
 import os
 import shutil
+import tempfile
 import unittest
 from glob import glob
 
+import numpy
+from PIL import Image
+from mung.io import read_nodes_from_file
+
 from omrdatasettools.MuscimaPlusPlusMaskImageGenerator import \
     MuscimaPlusPlusMaskImageGenerator, MaskType
 
@@ -67,6 +72,97 @@ class MuscimaPlusPlusMaskImageGeneratorTest(unittest.TestCase):
         # Cleanup
         shutil.rmtree(os.path.join(dir_path, "temp"))
 
+    def test_rendered_masks_match_masks_that_are_copied_pixel_by_pixel(self):
+        with tempfile.TemporaryDirectory() as temporary_directory:
+            # Arrange
+            raw_data_directory = os.path.join(temporary_directory, "muscima-pp_v2")
+            shutil.copytree(os.path.join(dir_path, "testdata/muscima-pp_v2"), raw_data_directory)
+            xml_file = os.path.join(raw_data_directory, "v2.0", "data", "annotations",
+                                    "CVC-MUSCIMA_W-01_N-14_D-ideal.xml")
+            with Image.open(glob(os.path.join(raw_data_directory, "v2.0", "data", "images", "*.png"))[0]) as page:
+                width, height = page.size
+            # Move the first notehead partially outside of the page
+            with open(xml_file) as file:
+                annotations = file.read().replace("<Top>305</Top>", "<Top>{0}</Top>".format(height - 5), 1)
+            with open(xml_file, "w") as file:
+                file.write(annotations)
+            nodes = read_nodes_from_file(xml_file)
+            image_generator = MuscimaPlusPlusMaskImageGenerator()
+
+            for mask_type in [MaskType.NODES_SEMANTIC_SEGMENTATION, MaskType.STAFF_LINES_INSTANCE_SEGMENTATION]:
+                # Act
+                destination_directory = os.path.join(temporary_directory, mask_type.name)
+                image_generator.render_node_masks(raw_data_directory, destination_directory, mask_type)
+
+                # Assert
+                expected_mask = self.__copy_masks_pixel_by_pixel(nodes, mask_type, width, height,
+                                                                 image_generator.class_to_color_mapping)
+                with Image.open(os.path.join(destination_directory, "CVC-MUSCIMA_W-01_N-14_D-ideal.png")) as mask:
+                    numpy.testing.assert_array_equal(expected_mask, numpy.asarray(mask))
+
+    def test_render_multiple_mask_types_from_a_single_pass(self):
+        with tempfile.TemporaryDirectory() as temporary_directory:
+            # Arrange
+            image_generator = MuscimaPlusPlusMaskImageGenerator()
+            raw_data_directory = os.path.join(dir_path, "testdata/muscima-pp_v2")
+            mask_types = list(MaskType)
+            for mask_type in mask_types:
+                image_generator.render_node_masks(raw_data_directory, os.path.join(temporary_directory, "single",
+                                                                                   mask_type.name), mask_type)
+
+            # Act
+            image_generator.render_node_masks(raw_data_directory, os.path.join(temporary_directory, "multiple"),
+                                              mask_types)
+
+            # Assert
+            for mask_type in mask_types:
+                mask_name = "CVC-MUSCIMA_W-01_N-14_D-ideal.png"
+                with Image.open(os.path.join(temporary_directory, "single", mask_type.name, mask_name)) as expected, \
+                        Image.open(os.path.join(temporary_directory, "multiple", mask_type.name.lower(),
+                                                mask_name)) as actual:
+                    numpy.testing.assert_array_equal(numpy.asarray(expected), numpy.asarray(actual))
+
+    def test_masks_rendered_by_multiple_workers_match_sequential_rendering(self):
+        with tempfile.TemporaryDirectory() as temporary_directory:
+            # Arrange
+            image_generator = MuscimaPlusPlusMaskImageGenerator()
+            raw_data_directory = os.path.join(dir_path, "testdata/muscima-pp_v2")
+            image_generator.render_node_masks(raw_data_directory, os.path.join(temporary_directory, "sequential"),
+                                              list(MaskType))
+
+            # Act
+            image_generator.render_node_masks(raw_data_directory, os.path.join(temporary_directory, "parallel"),
+                                              list(MaskType), workers=2)
+
+            # Assert
+            for mask_type in MaskType:
+                mask_path = os.path.join(mask_type.name.lower(), "CVC-MUSCIMA_W-01_N-14_D-ideal.png")
+                with Image.open(os.path.join(temporary_directory, "sequential", mask_path)) as expected, \
+                        Image.open(os.path.join(temporary_directory, "parallel", mask_path)) as actual:
+                    numpy.testing.assert_array_equal(numpy.asarray(expected), numpy.asarray(actual))
+
+    @staticmethod
+    def __copy_masks_pixel_by_pixel(nodes, mask_type, width, height, class_to_color_mapping) -> numpy.ndarray:
+        """ The original implementation, that copied the masks of all nodes one pixel after the other """
+        image = numpy.zeros((height, width), dtype=numpy.uint8)
+        if mask_type == MaskType.NODES_SEMANTIC_SEGMENTATION:
+            nodes = [node for node in reversed(nodes) if node.class_name not in ["staffSpace", "staff", "staffLine"]]
+            colors = [class_to_color_mapping[node.class_name] for node in nodes]
+        else:
+            nodes = [node for node in nodes if node.class_name == "staffLine"]
+            colors = [index // 5 + 1 for index in range(len(nodes))]
+
+        for node, color in zip(nodes, colors):
+            try:
+                color_mask = node.mask * color
+                for i in range(node.height):
+                    for j in range(node.width):
+                        if color_mask[i, j] != 0:
+                            image[node.top + i, node.left + j] = color_mask[i, j]
+            except IndexError:
+                pass
+        return image
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,109 @@
+import os
+import shutil
+
+import pytest
+from PIL import Image
+from mung.io import read_nodes_from_file
+
+from omrdatasettools.MuscimaPlusPlusPageIndex import MuscimaPlusPlusPageIndex
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+
+
+class TestMuscimaPlusPlusPageIndex:
+    @pytest.fixture
+    def raw_data_directory(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("OMR_DATASETS_CACHE", str(tmp_path / "cache"))
+        raw_data_directory = str(tmp_path / "muscima-pp_v2")
+        shutil.copytree(os.path.join(dir_path, "testdata", "muscima-pp_v2"), raw_data_directory)
+        return raw_data_directory
+
+    def test_index_contains_metadata_of_pages(self, raw_data_directory):
+        # Act
+        pages = MuscimaPlusPlusPageIndex.load(raw_data_directory).get_pages()
+
+        # Assert
+        assert len(pages) == 1
+        page = pages[0]
+        assert page["document"] == "CVC-MUSCIMA_W-01_N-14_D-ideal"
+        assert page["annotations"] == os.path.join(raw_data_directory, "v2.0", "data", "annotations",
+                                                   "CVC-MUSCIMA_W-01_N-14_D-ideal.xml")
+        with Image.open(page["image"]) as image:
+            assert (page["width"], page["height"], page["mode"]) == (image.width, image.height, image.mode)
+        assert page["dtype"] == "bool"
+        assert page["number_of_nodes"] == len(read_nodes_from_file(page["annotations"]))
+        assert os.path.exists(MuscimaPlusPlusPageIndex.get_default_index_path(raw_data_directory))
+
+    def test_loading_stored_index_does_not_probe_images(self, raw_data_directory, monkeypatch):
+        # Arrange
+        expected_pages = MuscimaPlusPlusPageIndex.load(raw_data_directory).get_pages()
+
+        def fail(*args, **kwargs):
+            raise AssertionError("The dataset directory should not be searched or probed again")
+
+        monkeypatch.setattr(Image, "open", fail)
+        monkeypatch.setattr(os, "walk", fail)
+
+        # Act
+        pages = MuscimaPlusPlusPageIndex.load(raw_data_directory).get_pages()
+
+        # Assert
+        assert pages == expected_pages
+
+    def test_dataset_directory_is_not_modified(self, raw_data_directory):
+        # Arrange
+        files_before = sorted(os.listdir(raw_data_directory))
+
+        # Act
+        MuscimaPlusPlusPageIndex.load(raw_data_directory)
+
+        # Assert
+        assert sorted(os.listdir(raw_data_directory)) == files_before
+
+    def test_index_can_be_stored_anywhere(self, raw_data_directory, tmp_path):
+        # Arrange
+        index_path = str(tmp_path / "indices" / "muscima-pp.json")
+
+        # Act
+        expected_pages = MuscimaPlusPlusPageIndex.load(raw_data_directory, index_path=index_path).get_pages()
+        pages = MuscimaPlusPlusPageIndex.load(raw_data_directory, index_path=index_path).get_pages()
+
+        # Assert
+        assert pages == expected_pages
+        assert os.path.exists(index_path)
+
+    def test_documents_with_duplicate_names_are_reported(self, raw_data_directory, capsys):
+        # Arrange
+        data_directory = os.path.join(raw_data_directory, "v2.0", "data")
+        duplicate_directory = os.path.join(data_directory, "annotations", "duplicates")
+        os.makedirs(duplicate_directory)
+        shutil.copy(os.path.join(data_directory, "annotations", "CVC-MUSCIMA_W-01_N-14_D-ideal.xml"),
+                    duplicate_directory)
+        shutil.copy(os.path.join(data_directory, "annotations", "CVC-MUSCIMA_W-01_N-14_D-ideal.xml"),
+                    os.path.join(data_directory, "annotations", "unpaired.xml"))
+        # Images outside of the images directory are not paired with the annotations
+        shutil.copy(os.path.join(data_directory, "images", "CVC-MUSCIMA_W-01_N-14_D-ideal.png"),
+                    os.path.join(data_directory, "unpaired.png"))
+
+        # Act
+        pages = MuscimaPlusPlusPageIndex.load(raw_data_directory).get_pages()
+
+        # Assert
+        assert [(page["document"], page["image"]) for page in pages] == [("unpaired", None)]
+        assert "Skipping document CVC-MUSCIMA_W-01_N-14_D-ideal" in capsys.readouterr().out
+
+    def test_changed_annotations_are_indexed_again(self, raw_data_directory):
+        # Arrange
+        index = MuscimaPlusPlusPageIndex.load(raw_data_directory)
+        xml_file = index.get_annotation_paths()[0]
+        with open(xml_file) as file:
+            annotations = file.read()
+        first_node = annotations[annotations.index("    <Node>"):annotations.index("</Node>") + len("</Node>\n")]
+        with open(xml_file, "w") as file:
+            file.write(annotations.replace(first_node, "", 1))
+
+        # Act
+        page = MuscimaPlusPlusPageIndex.load(raw_data_directory).get_pages()[0]
+
+        # Assert
+        assert page["number_of_nodes"] == index.get_pages()[0]["number_of_nodes"] - 1
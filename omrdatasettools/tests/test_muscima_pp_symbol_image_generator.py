@@ -1,12 +1,16 @@
 import os
 import shutil
+import tempfile
 import unittest
 from glob import glob
 
+from omrdatasettools.BuildManifest import BuildManifest
 from omrdatasettools.Downloader import Downloader
 from omrdatasettools.MuscimaPlusPlusSymbolImageGenerator import MuscimaPlusPlusSymbolImageGenerator
 from omrdatasettools.OmrDataset import OmrDataset
 
+dir_path = os.path.dirname(os.path.realpath(__file__))
+
 
 class MuscimaPlusPlusSymbolImageGeneratorTest(unittest.TestCase):
     def test_download_extract_and_render_all_symbols(self):
@@ -28,6 +32,50 @@ class MuscimaPlusPlusSymbolImageGeneratorTest(unittest.TestCase):
         os.remove(OmrDataset.MuscimaPlusPlus_V2.get_dataset_filename())
         shutil.rmtree("temp")
 
+    def test_symbols_rendered_by_multiple_workers_match_sequential_rendering(self):
+        with tempfile.TemporaryDirectory() as temporary_directory:
+            # Arrange
+            raw_data_directory = os.path.join(temporary_directory, "muscima-pp_v2")
+            shutil.copytree(os.path.join(dir_path, "testdata", "muscima-pp_v2"), raw_data_directory)
+            image_generator = MuscimaPlusPlusSymbolImageGenerator()
+            sequential_directory = os.path.join(temporary_directory, "sequential")
+            image_generator.extract_and_render_all_symbol_masks(raw_data_directory, sequential_directory)
+
+            # Act
+            parallel_directory = os.path.join(temporary_directory, "parallel")
+            image_generator.extract_and_render_all_symbol_masks(raw_data_directory, parallel_directory, workers=2)
+            incremental_directory = os.path.join(temporary_directory, "incremental")
+            image_generator.extract_and_render_all_symbol_masks(raw_data_directory, incremental_directory,
+                                                                incremental=True, workers=2)
+
+            # Assert
+            sequential_images = self.__read_images(sequential_directory)
+            self.assertEqual(592, len(sequential_images))
+            self.assertEqual(sequential_images, self.__read_images(parallel_directory))
+            self.assertEqual(sequential_images, self.__read_images(incremental_directory))
+            manifest = BuildManifest.load(incremental_directory)
+            self.assertEqual(sorted(sequential_images.keys()), sorted(manifest.outputs.keys()))
+
+    def test_nodes_loaded_by_multiple_workers_keep_order_of_xml_files(self):
+        # Arrange
+        image_generator = MuscimaPlusPlusSymbolImageGenerator()
+        xml_files = image_generator.get_all_xml_file_paths(os.path.join(dir_path, "testdata", "muscima-pp_v2")) * 3
+
+        # Act
+        nodes = image_generator.load_nodes_from_xml_files(xml_files, workers=2)
+
+        # Assert
+        expected_ids = [node.unique_id for node in image_generator.load_nodes_from_xml_files(xml_files)]
+        self.assertEqual(expected_ids, [node.unique_id for node in nodes])
+
+    @staticmethod
+    def __read_images(directory):
+        images = {}
+        for image_file in glob(os.path.join(directory, "*", "*.png")):
+            with open(image_file, "rb") as file:
+                images[os.path.relpath(image_file, directory).replace(os.sep, "/")] = file.read()
+        return images
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,133 @@
+import io
+import shutil
+import tarfile
+from pathlib import Path
+
+import numpy
+import pytest
+from PIL import Image
+
+from omrdatasettools.CapitanImageGenerator import CapitanImageGenerator
+from omrdatasettools.HomusImageGenerator import HomusImageGenerator
+from omrdatasettools.MuscimaPlusPlusSymbolImageGenerator import MuscimaPlusPlusSymbolImageGenerator
+from omrdatasettools.ShardedImageWriter import ShardedImageWriter, ShardedImageReader
+
+
+class TestShardedImageWriter:
+    def test_sharded_images_match_individual_files(self, tmp_path):
+        # Arrange
+        data_directory = tmp_path / "capitan_raw"
+        data_path = data_directory / "BimodalHandwrittenSymbols" / "data"
+        data_path.parent.mkdir(parents=True, exist_ok=True)
+        data_path.write_text((Path(__file__).parent / "testdata" / "capitan_testdata.txt").read_text())
+        image_generator = CapitanImageGenerator()
+        image_generator.create_capitan_images(data_directory, str(tmp_path / "files"), [1, 3])
+
+        # Act
+        writer = ShardedImageWriter(str(tmp_path / "shards"), maximum_samples_per_shard=4)
+        image_generator.create_capitan_images(data_directory, str(tmp_path / "images"), [1, 3], writer=writer)
+        reader = ShardedImageReader(str(tmp_path / "shards"))
+        samples = list(reader)
+
+        # Assert
+        assert len(reader.shard_paths) == 3
+        assert len(samples) == len(reader) == 9
+        assert list(tmp_path.joinpath("images").rglob("*.png")) == []
+        for (image, metadata), entry in zip(samples, reader.read_index()):
+            assert metadata["key"] == entry["key"]
+            with Image.open(tmp_path / "files" / (metadata["key"] + ".png")) as expected_image:
+                numpy.testing.assert_array_equal(numpy.asarray(image), numpy.asarray(expected_image))
+                numpy.testing.assert_array_equal(numpy.asarray(reader.read(entry)), numpy.asarray(expected_image))
+                assert metadata["bounding_box"] == [0, 0, expected_image.width, expected_image.height]
+            assert metadata["class"] == metadata["key"].split("/")[0]
+            if metadata["key"].endswith("score"):
+                assert metadata["stroke_thickness"] is None
+            else:
+                assert metadata["stroke_thickness"] in [1, 3]
+
+    def test_workers_fill_shards_of_main_process(self, tmp_path):
+        # Arrange
+        raw_data_directory = tmp_path / "muscima-pp_v2"
+        shutil.copytree(str(Path(__file__).parent / "testdata" / "muscima-pp_v2"), str(raw_data_directory))
+        xml_file = raw_data_directory / "v2.0" / "data" / "annotations" / "CVC-MUSCIMA_W-01_N-14_D-ideal.xml"
+        for copy in range(2):
+            shutil.copy(str(xml_file), str(xml_file.with_name("copy-{0}.xml".format(copy))))
+        writer = ShardedImageWriter(str(tmp_path / "shards"), maximum_samples_per_shard=1000)
+
+        # Act
+        MuscimaPlusPlusSymbolImageGenerator().extract_and_render_all_symbol_masks(
+            str(raw_data_directory), str(tmp_path / "images"), writer=writer, workers=2)
+        reader = ShardedImageReader(str(tmp_path / "shards"))
+
+        # Assert
+        assert len(reader) == 3 * 592
+        assert len(reader.shard_paths) == 2
+
+    def test_incremental_generation_rejects_sharded_writer(self, tmp_path):
+        # Arrange
+        writer = ShardedImageWriter(str(tmp_path / "shards"))
+        destination_directory = str(tmp_path / "images")
+
+        # Act & Assert
+        with pytest.raises(ValueError, match="ShardedImageWriter"):
+            HomusImageGenerator.create_images(str(tmp_path), destination_directory, [3], seed=42, writer=writer,
+                                              incremental=True)
+        with pytest.raises(ValueError, match="ShardedImageWriter"):
+            CapitanImageGenerator().create_capitan_images(str(tmp_path), destination_directory, [3], writer=writer,
+                                                          incremental=True)
+        with pytest.raises(ValueError, match="ShardedImageWriter"):
+            MuscimaPlusPlusSymbolImageGenerator().extract_and_render_all_symbol_masks(
+                str(tmp_path), destination_directory, writer=writer, incremental=True)
+        assert not (tmp_path / "shards").exists()
+        assert not (tmp_path / "images").exists()
+
+    def test_shards_follow_webdataset_layout(self, tmp_path):
+        # Arrange
+        writer = ShardedImageWriter(str(tmp_path))
+        image = Image.new("L", (4, 3), "white")
+
+        # Act
+        writer.write(image, str(tmp_path / "images" / "Quarter-Note" / "1-13_3.png"))
+        writer.write(image, str(tmp_path / "images" / "Half-Note" / "1-14_3.png"))
+        writer.flush()
+
+        # Assert
+        with tarfile.open(ShardedImageReader(str(tmp_path)).shard_paths[0]) as shard:
+            assert shard.getnames() == ["Quarter-Note/1-13_3.png", "Quarter-Note/1-13_3.json",
+                                        "Half-Note/1-14_3.png", "Half-Note/1-14_3.json"]
+
+    def test_samples_are_grouped_by_key(self, tmp_path):
+        # Arrange
+        writer = ShardedImageWriter(str(tmp_path / "shards"))
+        writer.write(Image.new("L", (4, 3), "white"), str(tmp_path / "Quarter-Note" / "1-13_3.png"))
+        writer.write(Image.new("L", (5, 2), "black"), str(tmp_path / "Half-Note" / "1-14_3.png"))
+        writer.flush()
+        shard_path = ShardedImageReader(str(tmp_path / "shards")).shard_paths[0]
+        with tarfile.open(shard_path) as shard:
+            members = [(member, shard.extractfile(member).read()) for member in shard.getmembers()]
+        with tarfile.open(shard_path, "w") as shard:
+            for member, content in reversed(members):
+                shard.addfile(member, io.BytesIO(content))
+
+        # Act
+        samples = list(ShardedImageReader(str(tmp_path / "shards")))
+
+        # Assert
+        assert [metadata["key"] for image, metadata in samples] == ["Half-Note/1-14_3", "Quarter-Note/1-13_3"]
+        assert [image.size for image, metadata in samples] == [(5, 2), (4, 3)]
+
+    def test_incomplete_samples_are_rejected(self, tmp_path):
+        # Arrange
+        writer = ShardedImageWriter(str(tmp_path / "shards"))
+        writer.write(Image.new("L", (4, 3), "white"), str(tmp_path / "Quarter-Note" / "1-13_3.png"))
+        writer.flush()
+        shard_path = ShardedImageReader(str(tmp_path / "shards")).shard_paths[0]
+        with tarfile.open(shard_path) as shard:
+            metadata_member = shard.getmember("Quarter-Note/1-13_3.json")
+            metadata = shard.extractfile(metadata_member).read()
+        with tarfile.open(shard_path, "w") as shard:
+            shard.addfile(metadata_member, io.BytesIO(metadata))
+
+        # Act & Assert
+        with pytest.raises(Exception, match="Quarter-Note/1-13_3"):
+            list(ShardedImageReader(str(tmp_path / "shards")))
@@ -0,0 +1,58 @@
+from pathlib import Path
+
+import numpy
+import pytest
+
+from omrdatasettools.StrokeRasterizer import StrokeRasterizer
+
+
+def load_pillow_reference(name):
+    """ Loads an image that was drawn segment by segment with ImageDraw.line of Pillow 12.3, so the tests do not
+        depend on the rasterization of the installed Pillow version """
+    with numpy.load(Path(__file__).parent / "testdata" / "stroke_rasterizer_pillow_12.3.npz") as references:
+        return references[name]
+
+
+class TestStrokeRasterizer:
+    @pytest.mark.parametrize("stroke_thickness", [1, 2, 3, 4, 7])
+    def test_draw_strokes_matches_pillow_reference(self, stroke_thickness):
+        # Arrange
+        random_generator = numpy.random.default_rng(42)
+        strokes = [numpy.cumsum(random_generator.normal(0, 5, (30, 2)), axis=0) + 40 for _ in range(5)]
+        strokes.append(numpy.round(strokes[0]))
+        strokes.append(numpy.array([[10, 10], [10, 10], [30, 10]]))
+        expected_image = load_pillow_reference("stroke_thickness_{0}".format(stroke_thickness))
+        canvas = numpy.full((70, 80), 255, dtype=numpy.uint8)
+
+        # Act
+        StrokeRasterizer.draw_strokes(canvas, strokes, stroke_thickness)
+
+        # Assert
+        numpy.testing.assert_array_equal(canvas, expected_image)
+
+    def test_draw_strokes_skips_long_segments(self):
+        # Arrange
+        canvas = numpy.full((50, 50), 255, dtype=numpy.uint8)
+        stroke = numpy.array([[5.0, 5.0], [10.0, 5.0], [45.0, 45.0], [45.0, 40.0]])
+
+        # Act
+        StrokeRasterizer.draw_strokes(canvas, [stroke], 1, maximum_squared_segment_length=1600)
+
+        # Assert
+        assert numpy.all(canvas[5, 5:11] == 0)
+        assert numpy.all(canvas[40:46, 45] == 0)
+        assert numpy.count_nonzero(canvas == 0) == 12
+
+    def test_draw_strokes_with_anti_aliasing(self):
+        # Arrange
+        canvas = numpy.full((40, 40), 255, dtype=numpy.uint8)
+        stroke = numpy.array([[5.0, 5.0], [35.0, 20.0]])
+        expected_image = load_pillow_reference("anti_aliasing")
+
+        # Act
+        StrokeRasterizer.draw_strokes(canvas, [stroke], 3, anti_aliasing=True)
+
+        # Assert
+        partially_covered = (canvas > 0) & (canvas < 255)
+        assert numpy.count_nonzero(partially_covered) > 0
+        assert numpy.abs(canvas.astype(int) - expected_image).mean() < 10